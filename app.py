@@ -1,11 +1,20 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for
 from google.cloud import bigquery
 from google.cloud import firestore
-import requests
+import os
+import queue
+import threading
 import time
-import io
+import datetime
+import json
 import logging
 
+from bq_results import fetch_latest_rows
+from job_status import JobStatusHub, TERMINAL_STATUSES
+from result_cache import ResultCache
+from schema_registry import SchemaRegistry
+from upload_forwarder import forward_files, make_session
+
 app = Flask(__name__)
 
 # ==== CONFIG ====
@@ -19,6 +28,25 @@ TABLES = {
 }
 
 UPLOAD_API_URL = "https://pitch-deck-uploader-225085788448.us-central1.run.app"
+# Direct-to-bucket uploads: the same service deployed with the create_upload_urls / complete_upload entry points
+SIGNED_UPLOAD_API_URL = os.environ.get(
+    "SIGNED_UPLOAD_API_URL", "https://create-upload-urls-225085788448.us-central1.run.app"
+)
+UPLOAD_COMPLETE_API_URL = os.environ.get(
+    "UPLOAD_COMPLETE_API_URL", "https://complete-upload-225085788448.us-central1.run.app"
+)
+upload_session = make_session()
+
+# Server-Sent Events: heartbeat keeps proxies from closing idle streams,
+# max duration bounds a stream (the browser's EventSource reconnects on its own)
+SSE_HEARTBEAT_SECONDS = 15
+SSE_MAX_STREAM_SECONDS = 300
+# Each open stream holds a gunicorn thread; past this many per process the browser
+# gets a 503 and falls back to polling /jobs/<id>/status
+SSE_MAX_STREAMS = max(
+    1, int(os.environ.get("GUNICORN_THREADS", "16")) - int(os.environ.get("SSE_RESERVED_THREADS", "8"))
+)
+sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,6 +54,24 @@ logging.basicConfig(level=logging.INFO)
 # BigQuery & Firestore clients
 bq_client = bigquery.Client(project=PROJECT_ID)
 db = firestore.Client(project=PROJECT_ID, database="ai-evaluation-firestore")
+schema_registry = SchemaRegistry(bq_client)
+
+# Rendered results and deal notes, keyed by startup_id (== job_id)
+result_cache = ResultCache()
+
+# One Firestore listener per process shared by every waiting browser
+job_hub = JobStatusHub(db)
+
+
+def _invalidate_on_completion(job_id, status, previous):
+    # The refiner has just written fresh rows for this startup; this also runs
+    # when an already completed job is merged again (straggler parts, reprocess)
+    if status == "completed":
+        result_cache.invalidate(job_id)
+
+
+job_hub.add_listener(_invalidate_on_completion)
+job_hub.start()
 
 # ===== ROUTES =====
 
@@ -34,6 +80,23 @@ def index():
     return render_template("index.html")
 
 
+def mime_type_for(filename):
+    filename_lower = filename.lower()
+    if filename_lower.endswith(".pdf"):
+        return "application/pdf"
+    elif filename_lower.endswith(".ppt"):
+        return "application/vnd.ms-powerpoint"
+    elif filename_lower.endswith(".pptx"):
+        return "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+    elif filename_lower.endswith(".mp3"):
+        return "audio/mpeg"
+    elif filename_lower.endswith(".wav"):
+        return "audio/wav"
+    elif filename_lower.endswith(".m4a"):
+        return "audio/mp4"
+    return "application/octet-stream"
+
+
 @app.route("/submit-assessment", methods=["POST"])
 def submit_assessment():
     company_name = request.form.get("company_name")
@@ -48,40 +111,26 @@ def submit_assessment():
         all_files = uploaded_files + uploaded_audio
         job_id = None  # Will store the first valid job_id
 
+        uploads = []
         for f in all_files:
-            filename_lower = f.filename.lower()
-            if filename_lower.endswith(".pdf"):
-                mime_type = "application/pdf"
-            elif filename_lower.endswith(".ppt"):
-                mime_type = "application/vnd.ms-powerpoint"
-            elif filename_lower.endswith(".pptx"):
-                mime_type = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
-            elif filename_lower.endswith(".mp3"):
-                mime_type = "audio/mpeg"
-            elif filename_lower.endswith(".wav"):
-                mime_type = "audio/wav"
-            elif filename_lower.endswith(".m4a"):
-                mime_type = "audio/mp4"
-            else:
-                mime_type = "application/octet-stream"
-
+            mime_type = mime_type_for(f.filename)
             logging.info(f"Preparing to upload file: {f.filename} (MIME: {mime_type})")
+            uploads.append((f.filename, f.stream, mime_type))
 
-            # Convert FileStorage to BytesIO
-            f.seek(0)
-            file_bytes = io.BytesIO(f.read())
-            logging.info(f"File size: {len(file_bytes.getvalue())} bytes")
+        # Every file goes in its own request, so tell the uploader the whole submission up front:
+        # one timestamp gives all files the same job_id, and the full file list lets the first
+        # request register the job's expected outputs before any sibling file is published.
+        submission = {
+            "submission_timestamp": datetime.datetime.now().strftime("%Y%m%d_%H%M%S"),
+            "submission_files": json.dumps([f.filename for f in all_files]),
+        }
 
-            files = {"file": (f.filename, file_bytes, mime_type)}
-            data = {"company_name": company_name}
+        # Stream every file to the uploader API concurrently, straight from the request's spooled files
+        logging.info(f"Sending {len(uploads)} file(s) to uploader API...")
+        responses = forward_files(upload_session, UPLOAD_API_URL, company_name, uploads, fields=submission)
 
-            logging.info(f"Sending file {f.filename} to uploader API...")
-            resp = requests.post(UPLOAD_API_URL, files=files, data=data)
-            logging.info(f"Uploader API response status code: {resp.status_code}")
-            resp.raise_for_status()
-
-            resp_json = resp.json()
-            logging.info(f"Uploader API response JSON: {resp_json}")
+        for f, resp_json in zip(all_files, responses):
+            logging.info(f"Uploader API response JSON for {f.filename}: {resp_json}")
 
             if "files" not in resp_json:
                 return jsonify({"success": False, "message": f"Unexpected response: {resp_json}"})
@@ -101,71 +150,167 @@ def submit_assessment():
             logging.error("No job_id returned from uploader API")
             return jsonify({"success": False, "message": "No job_id returned from uploader API"})
 
-        # Poll Firestore until status is completed
-        logging.info(f"Waiting for assessment to complete in Firestore for Job ID: {job_id}")
-        while True:
-            doc = db.collection("jobs").document(job_id).get()
-            if not doc.exists:
-                logging.info(f"Firestore document for job_id={job_id} does not exist yet. Retrying in 5s...")
-                time.sleep(5)
-                continue
+        # The refiner flips the Firestore job document; the browser follows it via /jobs/<job_id>/events
+        logging.info(f"Files uploaded. Returning Job ID: {job_id}")
+        return jsonify({"success": True, "message": "Files uploaded. Assessment is running...", "job_id": job_id})
+
+    except Exception as e:
+        logging.exception(f"Exception occurred: {e}")
+        return jsonify({"success": False, "message": f"Error: {e}"})
+
 
-            status = doc.to_dict().get("status")
-            logging.info(f"Firestore job_id={job_id} status: {status}")
 
-            if status == "completed":
-                logging.info(f"Assessment completed for Job ID: {job_id}")
-                break
-            elif status == "failed":
-                logging.error(f"Assessment failed for Job ID: {job_id}")
-                return jsonify({"success": False, "message": f"Assessment failed for Job ID: {job_id}"})
-            else:
-                logging.info(f"Assessment still in progress for Job ID: {job_id}. Waiting 5s...")
-                time.sleep(5)
+@app.route("/uploads/sign", methods=["POST"])
+def sign_uploads():
+    """Ask the uploader for signed resumable URLs so the browser can upload straight to GCS."""
+    payload = request.get_json(silent=True) or {}
+    company_name = payload.get("company_name")
+    filenames = payload.get("filenames") or []
+    if not company_name or not filenames:
+        return jsonify({"success": False, "message": "Provide company name and upload files."})
 
-        logging.info(f"Returning success for Job ID: {job_id}")
-        return jsonify({"success": True, "message": "Assessment completed successfully!", "job_id": job_id})
+    try:
+        files = [{"filename": name, "content_type": mime_type_for(name)} for name in filenames]
+        resp = upload_session.post(
+            SIGNED_UPLOAD_API_URL, json={"company_name": company_name, "files": files}, timeout=30
+        )
+        resp.raise_for_status()
+        resp_json = resp.json()
+        return jsonify({"success": True, "upload_id": resp_json["upload_id"], "files": resp_json["files"]})
 
     except Exception as e:
-        logging.exception(f"Exception occurred: {e}")
+        logging.exception(f"Failed to get signed upload URLs: {e}")
         return jsonify({"success": False, "message": f"Error: {e}"})
 
 
+@app.route("/uploads/complete", methods=["POST"])
+def complete_uploads():
+    """Record direct uploads with the uploader, which publishes them to the processing pipelines."""
+    payload = request.get_json(silent=True) or {}
+    company_name = payload.get("company_name")
+    upload_id = payload.get("upload_id")
+    paths = payload.get("paths") or []
+    if not company_name or not upload_id or not paths:
+        return jsonify({"success": False, "message": "Provide company name, upload_id and uploaded paths."})
 
-@app.route("/complete-results")
-def complete_results():
-    # For now, fixed startup_id for testing
-    startup_id = request.args.get("job_id") or "ST002"
+    try:
+        resp = upload_session.post(
+            UPLOAD_COMPLETE_API_URL,
+            json={"company_name": company_name, "upload_id": upload_id, "files": [{"path": path} for path in paths]},
+            timeout=30,
+        )
+        resp.raise_for_status()
+        resp_json = resp.json()
+        logging.info(f"Upload completion response JSON: {resp_json}")
+
+        job_id = None
+        for file_resp in resp_json.get("files", []):
+            job_id = file_resp.get("job_id") or job_id
+        if not job_id:
+            return jsonify({"success": False, "message": f"Unexpected response: {resp_json}"})
+
+        return jsonify({"success": True, "message": "Files uploaded. Assessment is running...", "job_id": job_id})
+
+    except Exception as e:
+        logging.exception(f"Failed to complete direct uploads: {e}")
+        return jsonify({"success": False, "message": f"Error: {e}"})
+
+
+@app.route("/jobs/<job_id>/status")
+def job_status(job_id):
+    status = job_hub.get_status(job_id)
+    return jsonify({"job_id": job_id, "status": status, "done": status in TERMINAL_STATUSES})
+
+
+def _sse_event(job_id, status):
+    payload = {"job_id": job_id, "status": status, "done": status in TERMINAL_STATUSES}
+    return f"event: status\ndata: {json.dumps(payload)}\n\n"
+
+
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    """Server-Sent Events stream of status changes for one job."""
+    if not sse_slots.acquire(blocking=False):
+        return Response("Too many status streams", status=503, headers={"Retry-After": "5"})
+
+    def stream():
+        # Subscribe before reading the current status so no change can slip in between
+        updates = job_hub.subscribe(job_id)
+        try:
+            status = job_hub.get_status(job_id)
+            yield _sse_event(job_id, status)
+
+            deadline = time.monotonic() + SSE_MAX_STREAM_SECONDS
+            while status not in TERMINAL_STATUSES and time.monotonic() < deadline:
+                try:
+                    status = updates.get(timeout=SSE_HEARTBEAT_SECONDS)
+                    yield _sse_event(job_id, status)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            job_hub.unsubscribe(job_id, updates)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    response = Response(stream(), mimetype="text/event-stream", headers=headers)
+    # Runs when the server closes the response, even if the stream never started
+    response.call_on_close(sse_slots.release)
+    return response
+
+
+def load_results_data(startup_id):
+    """Build the results-page tabs for startup_id; None when no table has a row."""
     results_data = {}
 
-    for tab_name, table_name in TABLES.items():
-        table_ref = f"{PROJECT_ID}.{DATASET}.{table_name}"
-        table = bq_client.get_table(table_ref)
-        schema_info = {field.name: field.description for field in table.schema}
-
-        query = f"""
-            SELECT * FROM `{table_ref}`
-            WHERE startup_id = @startup_id
-            LIMIT 1
-        """
-        job_config = bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("startup_id", "STRING", startup_id)]
-        )
+    table_refs = {tab_name: f"{PROJECT_ID}.{DATASET}.{table_name}" for tab_name, table_name in TABLES.items()}
+    rows, descriptions = fetch_latest_rows(bq_client, schema_registry, table_refs.values(), startup_id)
+    if not any(rows.values()):
+        return None
 
-        query_result = list(bq_client.query(query, job_config=job_config).result())
-        if not query_result:
+    for tab_name, table_ref in table_refs.items():
+        row = rows[table_ref]
+        if not row:
             results_data[tab_name] = []
             continue
 
-        row = query_result[0]
+        schema_info = descriptions[table_ref]
         tab_rows = []
-        for field in row.keys():
+        for field, value in row.items():
             if field == "startup_id":
                 continue
-            tab_rows.append({"desc": schema_info.get(field, field), "value": row[field]})
+            tab_rows.append({"desc": schema_info.get(field, field), "value": value})
 
         results_data[tab_name] = tab_rows
 
+    return results_data
+
+
+def load_deal_note(startup_id):
+    """Return the deal note summary for startup_id, or None if there is none yet."""
+    table_ref = f"{PROJECT_ID}.{DATASET}.final_deal_note"
+    query = f"""
+        SELECT summary FROM `{table_ref}`
+        WHERE startup_id = @startup_id
+        LIMIT 1
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ScalarQueryParameter("startup_id", "STRING", startup_id)]
+    )
+
+    query_result = list(bq_client.query(query, job_config=job_config).result())
+    if query_result and query_result[0]['summary']:
+        return query_result[0]['summary']
+    return None
+
+
+@app.route("/complete-results")
+def complete_results():
+    # For now, fixed startup_id for testing
+    startup_id = request.args.get("job_id") or "ST002"
+
+    results_data = result_cache.get_or_load("results", startup_id, lambda: load_results_data(startup_id))
+    if results_data is None:
+        results_data = {tab_name: [] for tab_name in TABLES}
+
     return render_template("results.html", job_id=startup_id, results_data=results_data)
 
 
@@ -179,19 +324,9 @@ def deal_note():
     deal_note_content = "No deal note found for this startup."
 
     try:
-        table_ref = f"{PROJECT_ID}.{DATASET}.final_deal_note"
-        query = f"""
-            SELECT summary FROM `{table_ref}`
-            WHERE startup_id = @startup_id
-            LIMIT 1
-        """
-        job_config = bigquery.QueryJobConfig(
-            query_parameters=[bigquery.ScalarQueryParameter("startup_id", "STRING", startup_id)]
-        )
-
-        query_result = list(bq_client.query(query, job_config=job_config).result())
-        if query_result and query_result[0]['summary']:
-            deal_note_content = query_result[0]['summary']
+        summary = result_cache.get_or_load("deal_note", startup_id, lambda: load_deal_note(startup_id))
+        if summary:
+            deal_note_content = summary
 
     except Exception as e:
         logging.error(f"Error fetching deal note for {startup_id}: {e}")
@@ -200,7 +335,11 @@ def deal_note():
     return render_template("deal_note.html", job_id=startup_id, deal_note=deal_note_content)
 
 
+@app.route("/metrics")
+def metrics():
+    return jsonify({"result_cache": result_cache.stats()})
+
+
 if __name__ == "__main__":
-    import os
     port = int(os.environ.get("PORT", 8080))
     app.run(host="0.0.0.0", port=port, debug=False)
@@ -0,0 +1,163 @@
+"""
+Latency benchmark for the /complete-results BigQuery reads.
+
+Compares the old per-table loop (get_table + query per table) with the batched
+fetch_latest_rows path against a fake BigQuery client that sleeps once per
+network round trip and counts them. Rows include INT64, NUMERIC, TIMESTAMP,
+DATE and REPEATED columns, so the batched path must also return the same
+Python values as the per-table Row reads.
+
+Usage: python benchmark_results_query.py [round_trip_ms]
+"""
+
+import base64
+import datetime
+import decimal
+import json
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+from google.cloud import bigquery
+
+import bq_results
+from schema_registry import SchemaRegistry
+
+PROJECT_ID = "bench-project"
+DATASET = "financial_analysis"
+TABLES = ["market_metrics", "founder_metrics", "company_metrics", "product_tech_metrics"]
+
+
+class FakeBigQueryClient:
+    """Serves canned rows; every get_table and query job costs one simulated round trip."""
+
+    def __init__(self, rows_by_table, round_trip_seconds):
+        self.rows_by_table = rows_by_table
+        self.round_trip_seconds = round_trip_seconds
+        self.round_trips = 0
+
+    def _round_trip(self):
+        self.round_trips += 1
+        time.sleep(self.round_trip_seconds)
+
+    def get_table(self, table_ref):
+        self._round_trip()
+        return SimpleNamespace(schema=table_schema(table_ref.split(".")[-1]))
+
+    def query(self, query, job_config=None):
+        table_names = [ref.split(".")[-1] for ref in re.findall(r"FROM `([^`]+)`", query)]
+        if "TO_JSON_STRING" in query:
+            result = [
+                {"table_index": i, "row_json": to_json_string(self.rows_by_table[name])}
+                for i, name in enumerate(table_names)
+            ]
+        else:
+            result = [self.rows_by_table[table_names[0]]]
+        client = self
+
+        class Job:
+            def result(self):
+                client._round_trip()
+                return result
+
+        return Job()
+
+
+def table_schema(table_name):
+    return [
+        bigquery.SchemaField("startup_id", "STRING", description="startup_id description"),
+        bigquery.SchemaField(f"{table_name}_score", "INTEGER", description="score description"),
+        bigquery.SchemaField(f"{table_name}_notes", "STRING", description="notes description"),
+        bigquery.SchemaField("valuation", "NUMERIC", description="valuation description"),
+        bigquery.SchemaField("revenue_ids", "INTEGER", mode="REPEATED", description="ids description"),
+        bigquery.SchemaField("updated_at", "TIMESTAMP", description="updated_at description"),
+        bigquery.SchemaField("founded_on", "DATE", description="founded_on description"),
+    ]
+
+
+def to_json_string(row):
+    """What BigQuery's TO_JSON_STRING makes of a row of Python values."""
+    def encode(value):
+        if isinstance(value, list):
+            return [encode(item) for item in value]
+        if isinstance(value, int) and not isinstance(value, bool) and abs(value) > 2 ** 53:
+            return str(value)  # outside the JSON-safe integer range
+        if isinstance(value, decimal.Decimal):
+            return float(value) if value == decimal.Decimal(repr(float(value))) else str(value)
+        if isinstance(value, datetime.datetime):
+            return value.astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, bytes):
+            return base64.b64encode(value).decode("ascii")
+        return value
+    return json.dumps({name: encode(value) for name, value in row.items()})
+
+
+def legacy_fetch(client, startup_id):
+    """The previous complete_results loop: two round trips per table."""
+    results = {}
+    for table_name in TABLES:
+        table_ref = f"{PROJECT_ID}.{DATASET}.{table_name}"
+        table = client.get_table(table_ref)
+        schema_info = {field.name: field.description for field in table.schema}
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter("startup_id", "STRING", startup_id)]
+        )
+        query = f"SELECT * FROM `{table_ref}` WHERE startup_id = @startup_id LIMIT 1"
+        row = list(client.query(query, job_config=job_config).result())[0]
+        results[table_name] = [{"desc": schema_info.get(k, k), "value": row[k]} for k in row.keys()]
+    return results
+
+
+def batched_fetch(client, startup_id):
+    table_refs = [f"{PROJECT_ID}.{DATASET}.{t}" for t in TABLES]
+    rows, descriptions = bq_results.fetch_latest_rows(client, client.schemas, table_refs, startup_id)
+    return {
+        ref.split(".")[-1]: [{"desc": descriptions[ref].get(k, k), "value": v} for k, v in rows[ref].items()]
+        for ref in table_refs
+    }
+
+
+def measure(name, fn, client, runs=5):
+    client.round_trips = 0
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = fn(client, "ST002")
+    elapsed_ms = (time.perf_counter() - start) * 1000 / runs
+    round_trips = client.round_trips / runs
+    print(f"{name:<22} {elapsed_ms:8.1f} ms/page  {round_trips:4.1f} round trips/page")
+    return result, elapsed_ms, round_trips
+
+
+def main():
+    round_trip_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 40.0
+    rows_by_table = {
+        t: {
+            "startup_id": "ST002",
+            f"{t}_score": 7,
+            f"{t}_notes": "ok",
+            "valuation": decimal.Decimal("12500000.25"),
+            "revenue_ids": [1, 2 ** 60],
+            "updated_at": datetime.datetime(2024, 5, 1, 10, 0, 0, 123456, tzinfo=datetime.timezone.utc),
+            "founded_on": datetime.date(2019, 3, 14),
+        }
+        for t in TABLES
+    }
+    client = FakeBigQueryClient(rows_by_table, round_trip_ms / 1000)
+
+    legacy, legacy_ms, legacy_trips = measure("per-table loop", legacy_fetch, client)
+    client.schemas = SchemaRegistry(client)
+    batched_fetch(client, "ST002")  # warm the schema-description cache
+    batched, batched_ms, batched_trips = measure("batched (warm cache)", batched_fetch, client)
+
+    # Same Python values (and so the same rendering) as the per-table Row reads
+    assert legacy == batched, "batched path must return the same rows and descriptions"
+    assert legacy_trips == 2 * len(TABLES)
+    assert batched_trips == 1
+    print(f"speedup: {legacy_ms / batched_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Memory benchmark for forwarding submissions to the uploader API.
+
+Writes large synthetic files to disk, wraps them in werkzeug FileStorage objects
+(as Flask hands them to submit_assessment) and forwards them with
+upload_forwarder.forward_files to a local stand-in uploader that discards the
+bytes it receives. Asserts that peak RSS grows by far less than the payload.
+
+Usage: python benchmark_upload_memory.py [file_mb] [file_count] [--legacy]
+       --legacy additionally runs the old BytesIO + requests.post(files=...) path
+"""
+
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from werkzeug.datastructures import FileStorage
+
+import upload_forwarder
+
+RSS_BUDGET_MB = 64
+
+
+class StandInUploader(BaseHTTPRequestHandler):
+    """Reads the request body in chunks, discards it and answers like pitch-deck-uploader."""
+
+    def do_POST(self):
+        remaining = int(self.headers.get("Content-Length", 0))
+        received = 0
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            received += len(chunk)
+            remaining -= len(chunk)
+        body = json.dumps({"files": [{"job_id": f"bench_{received}", "message": "file uploaded"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_files(directory, file_mb, file_count):
+    paths = []
+    block = os.urandom(1024 * 1024)
+    for i in range(file_count):
+        path = os.path.join(directory, f"pitch_{i}.wav")
+        with open(path, "wb") as f:
+            for _ in range(file_mb):
+                f.write(block)
+        paths.append(path)
+    return paths
+
+
+def legacy_forward(url, company_name, storages):
+    import io
+    for fs in storages:
+        fs.seek(0)
+        file_bytes = io.BytesIO(fs.read())
+        requests.post(url, files={"file": (fs.filename, file_bytes, "audio/wav")}, data={"company_name": company_name})
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    file_mb = int(args[0]) if args else 200
+    file_count = int(args[1]) if len(args) > 1 else 3
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInUploader)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_files(tmp, file_mb, file_count)
+        storages = [FileStorage(stream=open(p, "rb"), filename=os.path.basename(p)) for p in paths]
+
+        session = upload_forwarder.make_session()
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        responses = upload_forwarder.forward_files(
+            session, url, "BenchCo", [(fs.filename, fs.stream, "audio/wav") for fs in storages]
+        )
+        elapsed = time.perf_counter() - start
+        growth = peak_rss_mb() - baseline
+
+        expected = [os.path.getsize(p) for p in paths]
+        received = [int(r["files"][0]["job_id"].split("_")[1]) for r in responses]
+        assert all(r > e for r, e in zip(received, expected)), "stand-in must receive every byte"
+
+        total_mb = file_mb * file_count
+        print(f"streaming: {total_mb} MB in {elapsed:.2f}s, peak RSS growth {growth:.1f} MB")
+        assert growth < RSS_BUDGET_MB, f"peak RSS grew {growth:.1f} MB (budget {RSS_BUDGET_MB} MB)"
+
+        if "--legacy" in sys.argv:
+            baseline = peak_rss_mb()
+            start = time.perf_counter()
+            legacy_forward(url, "BenchCo", storages)
+            print(f"legacy:    {total_mb} MB in {time.perf_counter() - start:.2f}s, "
+                  f"peak RSS growth {peak_rss_mb() - baseline:.1f} MB")
+
+        for fs in storages:
+            fs.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Batched BigQuery reads for the results page.
+
+All metric tables for a startup are read with one UNION ALL query job instead of
+one job per table, and column descriptions come from the shared SchemaRegistry
+so the page does not call get_table() on every view.
+
+TO_JSON_STRING turns some types into strings (TIMESTAMP, DATE, BYTES, INT64
+outside the JSON-safe range), so each value is converted back with the
+column's type from the registry. The page then renders the same Python values
+a plain ``SELECT *`` Row would have given it.
+"""
+
+import base64
+import datetime
+import decimal
+import json
+
+from google.cloud import bigquery
+
+
+def build_latest_rows_query(table_refs):
+    """One query returning at most one row per table, tagged with the table's index."""
+    selects = [
+        f"""
+            SELECT {index} AS table_index, TO_JSON_STRING(t) AS row_json
+            FROM (SELECT * FROM `{table_ref}` WHERE startup_id = @startup_id LIMIT 1) AS t"""
+        for index, table_ref in enumerate(table_refs)
+    ]
+    return "\n            UNION ALL".join(selects)
+
+
+def _scalar_from_json(value, field_type):
+    if field_type in ("INTEGER", "INT64"):
+        return int(value)
+    if field_type in ("FLOAT", "FLOAT64"):
+        return float(value)  # also "NaN", "Infinity", "-Infinity"
+    if field_type in ("NUMERIC", "BIGNUMERIC"):
+        return decimal.Decimal(str(value))
+    if field_type == "BYTES":
+        return base64.b64decode(value)
+    if field_type == "TIMESTAMP":
+        # e.g. "2024-05-01T10:00:00.123456Z"
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if field_type == "DATETIME":
+        return datetime.datetime.fromisoformat(value)
+    if field_type == "DATE":
+        return datetime.date.fromisoformat(value)
+    if field_type == "TIME":
+        return datetime.time.fromisoformat(value)
+    if field_type == "JSON":
+        return _plain(value)
+    return value  # STRING, BOOL, GEOGRAPHY, ... come back as they were
+
+
+def _plain(value):
+    # Undo parse_float=Decimal where no NUMERIC column asked for it
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {name: _plain(item) for name, item in value.items()}
+    return value
+
+
+def value_from_json(value, field):
+    """Convert one TO_JSON_STRING value back to the Python type of SchemaField field."""
+    if value is None:
+        return None
+    if field.mode == "REPEATED":
+        return [value_from_json(item, _item_field(field)) for item in value]
+    if field.field_type in ("RECORD", "STRUCT"):
+        subfields = {sub.name: sub for sub in field.fields}
+        return {
+            name: value_from_json(item, subfields[name]) if name in subfields else _plain(item)
+            for name, item in value.items()
+        }
+    return _scalar_from_json(value, field.field_type)
+
+
+def _item_field(field):
+    # The element type of a REPEATED column
+    return bigquery.SchemaField(field.name, field.field_type, mode="NULLABLE", fields=field.fields)
+
+
+def row_from_json(row_json, fields):
+    """Parse a TO_JSON_STRING row and restore column types from a name -> SchemaField map."""
+    # Decimal keeps NUMERIC precision; FLOAT columns are converted back to float
+    row = json.loads(row_json, parse_float=decimal.Decimal)
+    return {
+        name: value_from_json(value, fields[name]) if name in fields else _plain(value)
+        for name, value in row.items()
+    }
+
+
+def fetch_latest_rows(client, schemas, table_refs, startup_id):
+    """
+    Fetch one row per table for startup_id in a single query job;
+    schemas is the SchemaRegistry used for column descriptions and types.
+    Returns (rows, descriptions), both keyed by table_ref; missing rows are None.
+    """
+    table_refs = list(table_refs)
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ScalarQueryParameter("startup_id", "STRING", startup_id)]
+    )
+    # Submit first so any cold schema lookups overlap with the running query
+    job = client.query(build_latest_rows_query(table_refs), job_config=job_config)
+    table_schemas = {table_ref: schemas.get(table_ref) for table_ref in table_refs}
+    descriptions = {table_ref: schema.descriptions for table_ref, schema in table_schemas.items()}
+
+    rows = {table_ref: None for table_ref in table_refs}
+    for result_row in job.result():
+        # TO_JSON_STRING keeps the table's column order, and json.loads preserves it
+        table_ref = table_refs[result_row["table_index"]]
+        rows[table_ref] = row_from_json(result_row["row_json"], table_schemas[table_ref].fields)
+    return rows, descriptions
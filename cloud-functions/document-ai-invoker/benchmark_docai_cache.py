@@ -0,0 +1,92 @@
+"""
+Document AI call count with the content-hash cache.
+
+A fake DocumentProcessorServiceClient counts calls. The same 60-page deck is
+processed twice, the second time under a new filename. The cache lives in a
+temp DOCAI_CACHE_DIR. The first run makes one Document AI call per part and
+the re-upload makes none. A third deck with one changed page only re-runs the
+part holding that page.
+
+Usage: python benchmark_docai_cache.py
+"""
+
+import io
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from PyPDF2 import PdfWriter
+from PyPDF2.generic import DecodedStreamObject, NameObject
+
+
+class FakeDocAIClient:
+    latency = 0.2
+
+    def __init__(self, *args, **kwargs):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def processor_path(self, project, location, processor):
+        return f"projects/{project}/locations/{location}/processors/{processor}"
+
+    def process_document(self, request):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        size = str(len(request["raw_document"].content))
+        entity = SimpleNamespace(type_="part_size", mention_text=size, normalized_value=None, properties=[])
+        return SimpleNamespace(document=SimpleNamespace(entities=[entity]))
+
+
+def make_pdf(pages, changed_page=None):
+    writer = PdfWriter()
+    for i in range(pages):
+        writer.add_blank_page(width=612, height=792)
+        page = writer.pages[-1]  # add_blank_page returns a detached copy
+        text = b"revised" if i == changed_page else b"page %d" % i
+        stream = DecodedStreamObject()
+        stream.set_data(b"BT /F1 12 Tf 72 720 Td (" + text + b") Tj ET")
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def run(invoker, deck, filename):
+    before = invoker.docai_client.calls
+    start = time.perf_counter()
+    parts = invoker.split_pdf_if_needed(deck, filename, max_pages=invoker.MAX_PAGES)
+    results = invoker.process_parts(parts, job_id=filename)
+    return results, invoker.docai_client.calls - before, time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        with mock.patch.dict(os.environ, {"DOCAI_CACHE_DIR": cache_dir}), \
+                mock.patch("google.cloud.documentai_v1.DocumentProcessorServiceClient", FakeDocAIClient), \
+                mock.patch("google.cloud.storage.Client"), \
+                mock.patch("google.cloud.pubsub_v1.PublisherClient"), \
+                mock.patch("google.cloud.firestore.Client"):
+            import main as invoker
+
+        deck = make_pdf(60)
+        first, first_calls, first_s = run(invoker, deck, "deck.pdf")
+        again, again_calls, again_s = run(invoker, deck, "deck_final_v2.pdf")
+        edited, edited_calls, edited_s = run(invoker, make_pdf(60, changed_page=40), "deck_edited.pdf")
+
+    print(f"first upload:  {first_calls} Document AI calls, {first_s:.2f}s")
+    print(f"re-upload:     {again_calls} Document AI calls, {again_s:.2f}s")
+    print(f"one page edit: {edited_calls} Document AI calls, {edited_s:.2f}s")
+
+    assert first_calls == len(first) == 4
+    assert again_calls == 0, "an identical deck must be served from the cache"
+    assert [r["schema_fields"] for r in again] == [r["schema_fields"] for r in first]
+    assert [r["part_filename"] for r in again][0] == "deck_final_v2.pdf_part_1.pdf"
+    assert edited_calls == 1, "only the part holding the edited page should reach Document AI"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Memory profile of splitting a large deck in memory.
+
+Builds a synthetic 300-page PDF, then runs split_pdf_if_needed on its bytes under
+tracemalloc. Asserts that no temp files are written and that the peak traced
+allocation stays within a small multiple of the deck size. The old pipeline
+held the deck on disk, wrote every part to /tmp and read each part back, which
+is about three copies in RAM-backed /tmp.
+
+Usage: python benchmark_pdf_split_memory.py [pages] [bytes_per_page]
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+from PyPDF2 import PdfWriter
+from PyPDF2.generic import DecodedStreamObject, NameObject
+
+PEAK_BUDGET_MULTIPLE = 4
+
+
+def make_pdf(pages, bytes_per_page):
+    writer = PdfWriter()
+    filler = b"x" * bytes_per_page
+    for i in range(pages):
+        writer.add_blank_page(width=612, height=792)
+        page = writer.pages[-1]  # add_blank_page returns a detached copy
+        stream = DecodedStreamObject()
+        stream.set_data(b"BT /F1 12 Tf 72 720 Td (page %d " % i + filler + b") Tj ET")
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    bytes_per_page = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+
+    with mock.patch("google.cloud.documentai_v1.DocumentProcessorServiceClient"), \
+            mock.patch("google.cloud.storage.Client"), \
+            mock.patch("google.cloud.pubsub_v1.PublisherClient"), \
+            mock.patch("google.cloud.firestore.Client"):
+        import main as invoker
+
+    deck = make_pdf(pages, bytes_per_page)
+    tmp_before = set(os.listdir(tempfile.gettempdir()))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    parts = invoker.split_pdf_if_needed(deck, "deck.pdf", max_pages=invoker.MAX_PAGES)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    new_tmp_files = set(os.listdir(tempfile.gettempdir())) - tmp_before
+    deck_mb = len(deck) / 1024 / 1024
+    parts_mb = sum(len(content) for _, content in parts) / 1024 / 1024
+    print(f"deck: {pages} pages, {deck_mb:.1f} MB -> {len(parts)} parts ({parts_mb:.1f} MB) in {elapsed:.2f}s")
+    print(f"peak traced allocation: {peak / 1024 / 1024:.1f} MB")
+
+    assert len(parts) == -(-pages // invoker.MAX_PAGES)
+    assert all(isinstance(content, bytes) for _, content in parts), "parts must stay in memory"
+    assert not new_tmp_files, f"unexpected temp files: {new_tmp_files}"
+    assert peak < PEAK_BUDGET_MULTIPLE * len(deck), \
+        f"peak {peak / 1024 / 1024:.1f} MB exceeds {PEAK_BUDGET_MULTIPLE}x deck size"
+
+
+if __name__ == "__main__":
+    main()
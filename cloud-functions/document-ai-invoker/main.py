@@ -1,13 +1,19 @@
 import os
 import json
 import base64
+import hashlib
+import io
+import random
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import requests
 import functions_framework
 from PyPDF2 import PdfReader, PdfWriter
-from google.cloud import pubsub_v1
+from google.cloud import pubsub_v1, firestore
 
+from google.api_core import exceptions as gcp_exceptions
 from google.cloud import storage
 from google.cloud import documentai_v1 as documentai
 publisher = pubsub_v1.PublisherClient()
@@ -19,9 +25,42 @@ DOC_AI_LOCATION = "us"                      # <-- region where your DocAI proces
 PROCESSOR_ID = "6ecdc4f42d2cf133"          # <-- your Document AI processor ID
 OUTPUT_BUCKET = "agents_output_collection"  # <-- bucket where JSON output will be uploaded
 MAX_PAGES = 15                              # <-- max pages per split for PDF
+# Decks up to this size are downloaded and split in memory; larger ones fall back to temp files
+IN_MEMORY_PDF_MAX_BYTES = int(os.environ.get("IN_MEMORY_PDF_MAX_MB", "64")) * 1024 * 1024
+
+# Split parts are sent to Document AI in parallel, bounded by the processor quota
+DOCAI_MAX_CONCURRENCY = int(os.environ.get("DOCAI_MAX_CONCURRENCY", "4"))
+DOCAI_MAX_RETRIES = int(os.environ.get("DOCAI_MAX_RETRIES", "5"))
+DOCAI_RETRY_BASE_SECONDS = float(os.environ.get("DOCAI_RETRY_BASE_SECONDS", "1.0"))
+DOCAI_RETRY_MAX_SECONDS = float(os.environ.get("DOCAI_RETRY_MAX_SECONDS", "30.0"))
+
+# Content-addressed cache of extract_entities output, keyed by a SHA-256 of each
+# part's bytes plus the processor, so re-uploaded decks skip Document AI.
+# Entries live in DOCAI_CACHE_BUCKET under DOCAI_CACHE_PREFIX, or in DOCAI_CACHE_DIR
+# when that is set (local runs). Pin PROCESSOR_VERSION so entries are not reused
+# across a change of the processor's default version.
+DOCAI_CACHE_ENABLED = os.environ.get("DOCAI_CACHE_ENABLED", "true").lower() == "true"
+DOCAI_CACHE_BUCKET = os.environ.get("DOCAI_CACHE_BUCKET", OUTPUT_BUCKET)
+DOCAI_CACHE_PREFIX = os.environ.get("DOCAI_CACHE_PREFIX", "_docai_cache")
+DOCAI_CACHE_DIR = os.environ.get("DOCAI_CACHE_DIR")
+PROCESSOR_VERSION = os.environ.get("PROCESSOR_VERSION", "")
+DOCAI_CACHE_FORMAT = "1"  # bump when extract_entities output changes shape
+
+# Quota (429) and transient server errors are retried; anything else fails the part
+RETRYABLE_DOCAI_ERRORS = (
+    gcp_exceptions.ResourceExhausted,
+    gcp_exceptions.ServiceUnavailable,
+    gcp_exceptions.DeadlineExceeded,
+    gcp_exceptions.InternalServerError,
+)
+
+# Per-job fan-in manifest read by refiner-agent (expected count is set by the uploader)
+FIRESTORE_DB = "ai-evaluation-firestore"
+JOB_MANIFEST_COLLECTION = os.environ.get("JOB_MANIFEST_COLLECTION", "job_manifests")
 
 # Clients
 storage_client = storage.Client(project=PROJECT_ID)
+firestore_client = firestore.Client(project=PROJECT_ID, database=FIRESTORE_DB)
 docai_client = documentai.DocumentProcessorServiceClient()
 
 
@@ -32,11 +71,45 @@ def download_from_gcs(bucket_name: str, blob_name: str, destination_file: str):
     print(f"Downloaded gs://{bucket_name}/{blob_name} -> {destination_file}")
 
 
-def upload_to_gcs(bucket_name: str, destination_blob_name: str, source_file_name: str):
+def upload_json_to_gcs(bucket_name: str, destination_blob_name: str, data: dict):
     bucket = storage_client.bucket(bucket_name)
     blob = bucket.blob(destination_blob_name)
-    blob.upload_from_filename(source_file_name)
-    print(f"Uploaded {source_file_name} -> gs://{bucket_name}/{destination_blob_name}")
+    blob.upload_from_string(
+        json.dumps(data, indent=2, ensure_ascii=False),
+        content_type="application/json"
+    )
+    print(f"Uploaded JSON -> gs://{bucket_name}/{destination_blob_name}")
+
+
+def remove_temp_files(source, parts):
+    """Delete the deck and part files written by the large-deck fallback."""
+    paths = {content for _, content in parts if isinstance(content, str)}
+    if isinstance(source, str):
+        paths.add(source)
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def record_arrival(job_id: str, source_path: str, output_path: str = None):
+    """
+    Mark one document of job_id as finished in its fan-in manifest. Arrivals are
+    keyed by source object so a redelivered message is not counted twice; a failed
+    document (output_path None) still counts so the refiner does not wait on it.
+    """
+    update = {"arrived": firestore.ArrayUnion([source_path]), "updated_at": firestore.SERVER_TIMESTAMP}
+    if output_path:
+        update["outputs"] = firestore.ArrayUnion([output_path])
+        update["bucket"] = OUTPUT_BUCKET
+    else:
+        update["failed"] = firestore.ArrayUnion([source_path])
+    try:
+        firestore_client.collection(JOB_MANIFEST_COLLECTION).document(job_id).set(update, merge=True)
+    except Exception as e:
+        print(f"Failed to update job manifest {job_id}: {e}")
+
 
 def call_linkedin_scraper(company_name, company_domain=None):
     """Invoke Cloud Run linkedin_scraper function."""
@@ -60,13 +133,40 @@ def call_linkedin_scraper(company_name, company_domain=None):
         return None
 
 
-def split_pdf_if_needed(input_pdf_path: str, max_pages: int = MAX_PAGES):
-    reader = PdfReader(input_pdf_path)
+def download_pdf(bucket_name: str, blob_name: str, filename: str):
+    """
+    Fetch the deck into memory, or to a temp file when it is larger than
+    IN_MEMORY_PDF_MAX_BYTES. Returns bytes or a local path accordingly.
+    """
+    bucket = storage_client.bucket(bucket_name)
+    blob = bucket.get_blob(blob_name)
+    if blob is None:
+        raise FileNotFoundError(f"gs://{bucket_name}/{blob_name} not found")
+
+    if blob.size is not None and blob.size <= IN_MEMORY_PDF_MAX_BYTES:
+        content = blob.download_as_bytes()
+        print(f"Downloaded gs://{bucket_name}/{blob_name} into memory ({len(content)} bytes)")
+        return content
+
+    local_pdf = os.path.join(tempfile.gettempdir(), filename)
+    download_from_gcs(bucket_name, blob_name, local_pdf)
+    return local_pdf
+
+
+def split_pdf_if_needed(source, filename: str, max_pages: int = MAX_PAGES):
+    """
+    Split a PDF into parts of at most max_pages pages.
+    source is the PDF as bytes (parts are returned as in-memory bytes) or a local
+    path (large-deck fallback; parts are written next to it as temp files).
+    Returns a list of (part_filename, bytes_or_path) in page order.
+    """
+    in_memory = isinstance(source, (bytes, bytearray))
+    reader = PdfReader(io.BytesIO(source) if in_memory else source)
     total_pages = len(reader.pages)
     parts = []
 
     if total_pages <= max_pages:
-        parts.append(input_pdf_path)
+        parts.append((filename, source))
         return parts
 
     for i in range(0, total_pages, max_pages):
@@ -74,18 +174,29 @@ def split_pdf_if_needed(input_pdf_path: str, max_pages: int = MAX_PAGES):
         for j in range(i, min(i + max_pages, total_pages)):
             writer.add_page(reader.pages[j])
 
-        part_filename = os.path.join(
-            tempfile.gettempdir(),
-            f"{os.path.basename(input_pdf_path)}_part_{(i//max_pages)+1}.pdf"
-        )
-        with open(part_filename, "wb") as f:
-            writer.write(f)
-        parts.append(part_filename)
+        part_filename = f"{filename}_part_{(i//max_pages)+1}.pdf"
+        if in_memory:
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            parts.append((part_filename, buffer.getvalue()))
+        else:
+            part_path = os.path.join(tempfile.gettempdir(), part_filename)
+            with open(part_path, "wb") as f:
+                writer.write(f)
+            parts.append((part_filename, part_path))
         print(f"Created split part: {part_filename}")
 
     return parts
 
 
+def read_part(content) -> bytes:
+    """Bytes of a split part, whether it is held in memory or in a temp file."""
+    if isinstance(content, (bytes, bytearray)):
+        return bytes(content)
+    with open(content, "rb") as f:
+        return f.read()
+
+
 def extract_entities(entities):
     """Recursively extract schema-defined entities into dict."""
     data = {}
@@ -103,17 +214,110 @@ def extract_entities(entities):
     return data
 
 
-def process_document_with_docai(file_path: str) -> dict:
-    """Process one PDF file with Document AI and return schema-only dict."""
-    name = docai_client.processor_path(PROJECT_ID, DOC_AI_LOCATION, PROCESSOR_ID)
-    with open(file_path, "rb") as f:
-        content = f.read()
+def process_document_with_docai(content: bytes) -> dict:
+    """Process one PDF (raw bytes) with Document AI and return schema-only dict."""
+    if PROCESSOR_VERSION:
+        name = docai_client.processor_version_path(PROJECT_ID, DOC_AI_LOCATION, PROCESSOR_ID, PROCESSOR_VERSION)
+    else:
+        name = docai_client.processor_path(PROJECT_ID, DOC_AI_LOCATION, PROCESSOR_ID)
     raw_document = documentai.RawDocument(content=content, mime_type="application/pdf")
     request = {"name": name, "raw_document": raw_document}
     result = docai_client.process_document(request=request)
     return extract_entities(result.document.entities)
 
 
+def process_document_with_retry(part_filename: str, content: bytes) -> dict:
+    """process_document_with_docai with exponential backoff and full jitter on quota/transient errors."""
+    for attempt in range(DOCAI_MAX_RETRIES + 1):
+        try:
+            return process_document_with_docai(content)
+        except RETRYABLE_DOCAI_ERRORS as e:
+            if attempt == DOCAI_MAX_RETRIES:
+                raise
+            delay = random.uniform(0, min(DOCAI_RETRY_MAX_SECONDS, DOCAI_RETRY_BASE_SECONDS * 2 ** attempt))
+            print(f"Document AI call for {part_filename} failed ({e.__class__.__name__}); "
+                  f"retry {attempt + 1}/{DOCAI_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def docai_cache_key(content: bytes) -> str:
+    """SHA-256 over the processor identity and the part's bytes."""
+    digest = hashlib.sha256()
+    processor = f"{PROJECT_ID}/{DOC_AI_LOCATION}/{PROCESSOR_ID}/{PROCESSOR_VERSION or 'default'}/{DOCAI_CACHE_FORMAT}"
+    digest.update(processor.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(content)
+    return digest.hexdigest()
+
+
+def load_cached_result(key: str):
+    """Cached extract_entities output for key, or None. Cache errors count as misses."""
+    try:
+        if DOCAI_CACHE_DIR:
+            path = os.path.join(DOCAI_CACHE_DIR, f"{key}.json")
+            if not os.path.exists(path):
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        blob = storage_client.bucket(DOCAI_CACHE_BUCKET).blob(f"{DOCAI_CACHE_PREFIX}/{key}.json")
+        return json.loads(blob.download_as_bytes())
+    except gcp_exceptions.NotFound:
+        return None
+    except Exception as e:
+        print(f"Document AI cache read failed for {key}: {e}")
+        return None
+
+
+def store_cached_result(key: str, data: dict):
+    """Best-effort write of a cache entry; failures are logged, never raised."""
+    try:
+        payload = json.dumps(data, ensure_ascii=False)
+        if DOCAI_CACHE_DIR:
+            os.makedirs(DOCAI_CACHE_DIR, exist_ok=True)
+            tmp_path = os.path.join(DOCAI_CACHE_DIR, f"{key}.json.tmp.{os.getpid()}")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, os.path.join(DOCAI_CACHE_DIR, f"{key}.json"))
+            return
+        blob = storage_client.bucket(DOCAI_CACHE_BUCKET).blob(f"{DOCAI_CACHE_PREFIX}/{key}.json")
+        # Entries are immutable; if another job wrote this key first, keep its copy
+        blob.upload_from_string(payload, content_type="application/json", if_generation_match=0)
+    except gcp_exceptions.PreconditionFailed:
+        pass
+    except Exception as e:
+        print(f"Document AI cache write failed for {key}: {e}")
+
+
+def process_parts(parts, max_concurrency: int = DOCAI_MAX_CONCURRENCY, job_id=None) -> list:
+    """
+    Process (part_filename, bytes_or_path) parts concurrently; results are returned in page order.
+    Parts whose bytes were processed before are served from the Document AI cache.
+    """
+    def process_part(part):
+        part_filename, content = part
+        content = read_part(content)
+        key = docai_cache_key(content) if DOCAI_CACHE_ENABLED else None
+        schema_fields = load_cached_result(key) if key else None
+        cached = schema_fields is not None
+        if cached:
+            print(f"Document AI cache hit for part {part_filename} ({key[:12]})")
+        else:
+            print(f"Processing part {part_filename} with Document AI...")
+            schema_fields = process_document_with_retry(part_filename, content)
+            if key:
+                store_cached_result(key, schema_fields)
+        return {"part_filename": part_filename, "schema_fields": schema_fields}, cached
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(parts)))) as executor:
+        processed = list(executor.map(process_part, parts))
+
+    hits = sum(1 for _, cached in processed if cached)
+    if DOCAI_CACHE_ENABLED and parts:
+        print(f"Document AI cache for job {job_id}: {hits}/{len(parts)} parts hit "
+              f"({hits / len(parts):.0%}), {hits} Document AI calls saved, {len(parts) - hits} made")
+    return [result for result, _ in processed]
+
+
 @functions_framework.cloud_event
 def process_pitchdeck(cloud_event):
     """
@@ -127,6 +331,7 @@ def process_pitchdeck(cloud_event):
     }
     """
     job_id = None
+    blob_path = None
     try:
         # --- Decode Pub/Sub message ---
         message_data = cloud_event.data.get("message", {}).get("data")
@@ -149,22 +354,17 @@ def process_pitchdeck(cloud_event):
 
         print(f"Received job {job_id}. Bucket: {bucket_name}, blob: {blob_path}, company: {company_name}")
 
-        # --- Download PDF ---
-        local_pdf = os.path.join(tempfile.gettempdir(), filename)
-        download_from_gcs(bucket_name, blob_path, local_pdf)
+        # --- Download PDF (into memory unless it is very large) ---
+        source = download_pdf(bucket_name, blob_path, filename)
 
         # --- Split if needed ---
-        parts = split_pdf_if_needed(local_pdf, max_pages=MAX_PAGES)
-
-        # --- Process each part with Document AI ---
-        all_results = []
-        for p in parts:
-            print(f"Processing part {p} with Document AI...")
-            schema_fields = process_document_with_docai(p)
-            all_results.append({
-                "part_filename": os.path.basename(p),
-                "schema_fields": schema_fields
-            })
+        parts = split_pdf_if_needed(source, filename, max_pages=MAX_PAGES)
+
+        # --- Process the parts with Document AI in parallel ---
+        try:
+            all_results = process_parts(parts, job_id=job_id)
+        finally:
+            remove_temp_files(source, parts)
 
         # --- Save output JSON ---
         output = {
@@ -177,12 +377,11 @@ def process_pitchdeck(cloud_event):
             "parts_count": len(parts),
             "results": all_results
         }
-        local_output = os.path.join(tempfile.gettempdir(), f"{job_id}_document_ai_output.json")
-        with open(local_output, "w", encoding="utf-8") as f:
-            json.dump(output, f, indent=2, ensure_ascii=False)
-
-        gcs_output_path = f"{company_name}/document_ai_output_{job_id}.json"
-        upload_to_gcs(OUTPUT_BUCKET, gcs_output_path, local_output)
+        # One output per source deck: the decks of a submission share job_id
+        source_stem = os.path.splitext(os.path.basename(blob_path))[0]
+        gcs_output_path = f"{company_name}/{source_stem}_document_ai_output_{job_id}.json"
+        upload_json_to_gcs(OUTPUT_BUCKET, gcs_output_path, output)
+        record_arrival(job_id, blob_path, gcs_output_path)
 
         print(f"Job {job_id} completed successfully")
         # --- Call LinkedIn Scraper ---
@@ -199,7 +398,9 @@ def process_pitchdeck(cloud_event):
             "path": blob_path,
             "filename": filename,
             "timestamp": datetime.utcnow().isoformat(),
-            "job_type": "DOCUMENT"
+            "job_type": "DOCUMENT",
+            "output_bucket": OUTPUT_BUCKET,
+            "output_path": gcs_output_path
         }
         publisher.publish(
             REFINER_TOPIC,
@@ -209,6 +410,8 @@ def process_pitchdeck(cloud_event):
 
     except Exception as e:
         print(f"Error processing job {job_id if job_id else 'unknown'}: {e}")
+        if job_id and blob_path:
+            record_arrival(job_id, blob_path)
 
     return ("", 200)  # Always return 200 for Pub/Sub ack
 
@@ -0,0 +1,175 @@
+"""
+Two decks submitted together reach the refiner's merge as one job.
+
+The web app forwards each file of a submission in its own uploader request. This
+test sends two decks that way, with the deck B request running first. It feeds
+the published messages to process_pitchdeck and then runs the refiner's fan-in
+over the same job manifest. It checks that:
+- the job is not complete while deck A has not arrived,
+- each deck gets its own output object,
+- both decks' results end up in the merged output.
+
+pitch-deck-uploader, document-ai-invoker and refiner-agent are loaded from their
+directories with their Google clients mocked. The job manifest and the output
+bucket are kept in dicts.
+
+Usage: python -m pytest test_multi_deck_job.py  (or python test_multi_deck_job.py)
+"""
+
+import base64
+import importlib.util
+import io
+import json
+import os
+import sys
+from concurrent.futures import Future
+from types import SimpleNamespace
+from unittest import mock
+
+from flask import Flask, request
+from google.cloud import firestore
+from werkzeug.datastructures import FileStorage
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FUNCTIONS_DIR = os.path.dirname(HERE)
+
+
+class RecordingPublisher:
+    def __init__(self, *args, **kwargs):
+        self.messages = []
+
+    def publish(self, topic, data):
+        self.messages.append((topic, json.loads(data)))
+        future = Future()
+        future.set_result("message-id")
+        return future
+
+
+class MemoryDocument:
+    """A Firestore document applying the transforms the pipeline writes."""
+
+    def __init__(self, docs, key):
+        self.docs = docs
+        self.key = key
+
+    def set(self, data, merge=False):
+        doc = dict(self.docs.get(self.key, {})) if merge else {}
+        for field, value in data.items():
+            if isinstance(value, firestore.ArrayUnion):
+                doc[field] = doc.get(field, []) + [v for v in value.values if v not in doc.get(field, [])]
+            elif isinstance(value, firestore.Increment):
+                doc[field] = doc.get(field, 0) + value.value
+            elif value is firestore.SERVER_TIMESTAMP:
+                doc[field] = "now"
+            else:
+                doc[field] = value
+        self.docs[self.key] = doc
+
+    def get(self, transaction=None):
+        data = self.docs.get(self.key)
+        return SimpleNamespace(exists=data is not None, to_dict=lambda: dict(data or {}))
+
+
+class MemoryFirestore:
+    def __init__(self, *args, **kwargs):
+        self.docs = {}
+
+    def collection(self, name):
+        return SimpleNamespace(document=lambda doc_id: MemoryDocument(self.docs, (name, doc_id)))
+
+    def batch(self):
+        writes = []
+        return SimpleNamespace(
+            set=lambda ref, data, merge=False: writes.append((ref, data, merge)),
+            commit=lambda: [ref.set(data, merge=merge) for ref, data, merge in writes],
+        )
+
+    def transaction(self):
+        return SimpleNamespace(update=lambda ref, data: ref.set(data, merge=True))
+
+
+def load(name, directory, db):
+    """Import directory/main.py as name with its Google clients mocked."""
+    patches = [
+        mock.patch("google.cloud.pubsub_v1.PublisherClient", RecordingPublisher),
+        mock.patch("google.cloud.firestore.Client", lambda *args, **kwargs: db),
+        mock.patch("google.cloud.storage.Client"),
+        mock.patch("google.cloud.bigquery.Client"),
+        mock.patch("google.cloud.documentai_v1.DocumentProcessorServiceClient"),
+    ]
+    path = os.path.join(FUNCTIONS_DIR, directory)
+    sys.path.insert(0, path)  # for the function's sibling modules
+    for patch in patches:
+        patch.start()
+    try:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(path, "main.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        for patch in patches:
+            patch.stop()
+        sys.path.remove(path)
+    return module
+
+
+def forward(uploader, app, filename, fields):
+    """One uploader request the way upload_forwarder.forward_file sends it."""
+    data = {"company_name": "DeckCo", **fields, "file": FileStorage(io.BytesIO(b"%PDF"), filename)}
+    with app.test_request_context(method="POST", data=data):
+        response, status = uploader.upload_pitchdeck(request)
+    assert status == 200, response.get_json()
+    return response.get_json()["files"][0]
+
+
+def invoke(invoker, message):
+    """Run process_pitchdeck on one uploader message; each deck yields one result."""
+    event = SimpleNamespace(data={"message": {"data": base64.b64encode(json.dumps(message).encode()).decode()}})
+    results = [{"part_filename": message["filename"], "schema_fields": {"deck": message["filename"]}}]
+    with mock.patch.object(invoker, "download_pdf"), \
+            mock.patch.object(invoker, "split_pdf_if_needed", return_value=[message["filename"]]), \
+            mock.patch.object(invoker, "process_parts", return_value=results), \
+            mock.patch.object(invoker, "remove_temp_files"), \
+            mock.patch.object(invoker, "call_linkedin_scraper"):
+        invoker.process_pitchdeck(event)
+
+
+def test_two_decks_reach_one_merge():
+    db = MemoryFirestore()
+    uploader = load("pitch_deck_uploader", "pitch-deck-uploader", db)
+    invoker = load("document_ai_invoker", "document-ai-invoker", db)
+    refiner = load("refiner_agent", "refiner-agent", db)
+
+    outputs = {}
+    invoker.upload_json_to_gcs = lambda bucket, path, data: outputs.__setitem__(path, json.loads(json.dumps(data)))
+    refiner.download_and_load_json = lambda bucket, path: outputs[path]
+    claim_merge = refiner._claim_merge.to_wrap
+    refiner._claim_merge = lambda transaction, ref, force: claim_merge(transaction, ref, force)
+
+    app = Flask(__name__)
+    fields = {"submission_timestamp": "20250101_120000", "submission_files": json.dumps(["A.pdf", "B.pdf"])}
+    with mock.patch.object(uploader, "_upload_file"):
+        deck_b = forward(uploader, app, "B.pdf", fields)
+        invoke(invoker, uploader.publisher.messages[-1][1])
+
+        job_id = deck_b["job_id"]
+        manifest = db.docs[(refiner.JOB_MANIFEST_COLLECTION, job_id)]
+        assert manifest["expected"] == 2
+        assert not refiner._manifest_complete(manifest)
+
+        deck_a = forward(uploader, app, "A.pdf", fields)
+        invoke(invoker, uploader.publisher.messages[-1][1])
+    assert deck_a["job_id"] == job_id
+
+    matches = refiner.wait_for_job_outputs(job_id)
+    assert sorted(matches) == [
+        f"DeckCo/20250101_120000_a_document_ai_output_{job_id}.json",
+        f"DeckCo/20250101_120000_b_document_ai_output_{job_id}.json",
+    ]
+    merged = refiner.merge_agent_outputs(refiner.download_agent_outputs(refiner.AGENTS_BUCKET, matches))
+    assert sorted(r["schema_fields"]["deck"] for r in merged["results"]) == ["a.pdf", "b.pdf"]
+    assert refiner.wait_for_job_outputs(job_id) == []  # merged once
+
+
+if __name__ == "__main__":
+    test_two_decks_reach_one_merge()
+    print("ok")
@@ -0,0 +1,98 @@
+"""
+End-to-end timing of upload_pitchdeck against local fake GCS and Pub/Sub clients.
+
+The fake blob "uploads" at a fixed bandwidth and the fake publisher resolves
+each publish future after a fixed latency. A 10-file submission is timed with
+serial uploads (UPLOAD_WORKERS=1) and with the concurrent default; the
+concurrent run must take about as long as the largest file, not the sum.
+
+Usage: python benchmark_parallel_upload.py [mb_per_second]
+"""
+
+import io
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from unittest import mock
+
+from flask import Flask
+
+PUBLISH_LATENCY_SECONDS = 0.05
+
+
+class FakeBlob:
+    def __init__(self, name, bandwidth):
+        self.name = name
+        self.bandwidth = bandwidth
+
+    def upload_from_file(self, stream, size=None, content_type=None, retry=None):
+        data = stream.read()
+        assert size == len(data), "upload size must be known up front"
+        time.sleep(len(data) / self.bandwidth)
+
+
+class FakeBucket:
+    def __init__(self, bandwidth):
+        self.bandwidth = bandwidth
+
+    def blob(self, name, chunk_size=None):
+        return FakeBlob(name, self.bandwidth)
+
+
+class FakeStorageClient:
+    bandwidth = 50 * 1024 * 1024
+
+    def bucket(self, name):
+        return FakeBucket(self.bandwidth)
+
+
+class FakePublisher:
+    def __init__(self, *args, **kwargs):
+        self.published = []
+
+    def publish(self, topic, data):
+        self.published.append((topic, data))
+        future = Future()
+        threading.Timer(PUBLISH_LATENCY_SECONDS, future.set_result, args=("message-id",)).start()
+        return future
+
+
+def run_submission(main, sizes_mb):
+    app = Flask(__name__)
+    files = [(io.BytesIO(b"\0" * int(mb * 1024 * 1024)), f"part_{i}.pdf") for i, mb in enumerate(sizes_mb)]
+    with app.test_request_context(method="POST", data={"company_name": "BenchCo", "file": files}):
+        from flask import request
+        start = time.perf_counter()
+        response, status = main.upload_pitchdeck(request)
+        elapsed = time.perf_counter() - start
+    assert status == 200, response.get_json()
+    assert len(response.get_json()["files"]) == len(sizes_mb)
+    return elapsed
+
+
+def main():
+    mb_per_second = float(sys.argv[1]) if len(sys.argv) > 1 else 50.0
+    FakeStorageClient.bandwidth = mb_per_second * 1024 * 1024
+    with mock.patch("google.cloud.storage.Client", FakeStorageClient), \
+            mock.patch("google.cloud.pubsub_v1.PublisherClient", FakePublisher), \
+            mock.patch("google.cloud.firestore.Client"):
+        import main as uploader
+
+    sizes_mb = [1, 2, 2, 3, 5, 5, 8, 10, 15, 25]
+    largest = max(sizes_mb) / mb_per_second
+    total = sum(sizes_mb) / mb_per_second
+
+    uploader.UPLOAD_WORKERS = 1
+    serial = run_submission(uploader, sizes_mb)
+    uploader.UPLOAD_WORKERS = 10
+    parallel = run_submission(uploader, sizes_mb)
+
+    print(f"largest file alone: {largest:.2f}s, sum of files: {total:.2f}s")
+    print(f"serial uploads:     {serial:.2f}s")
+    print(f"parallel uploads:   {parallel:.2f}s")
+    assert parallel < largest + 0.5 * (total - largest), "parallel time should track the largest file"
+
+
+if __name__ == "__main__":
+    main()
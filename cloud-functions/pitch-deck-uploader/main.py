@@ -1,24 +1,382 @@
 import functions_framework
-from google.cloud import storage, pubsub_v1
+import google.auth.transport.requests
+from google.cloud import storage, pubsub_v1, firestore
+from google.cloud.storage.retry import DEFAULT_RETRY
+from google.oauth2 import service_account
 from flask import request, jsonify
+from concurrent import futures
+import collections
 import datetime
 import json
+import os
+import secrets
+import urllib.parse
 
 # ==== CONFIG ====
 BUCKET_NAME = "company-data-ai-hackathon"
 TOPIC_DOC = "projects/molten-enigma-472206-i4/topics/gcs-upload-docuement-ai"
 TOPIC_AUDIO = "projects/molten-enigma-472206-i4/topics/gcs-upload-audio-ai"
 
+AUDIO_EXT = (".mp3", ".wav", ".m4a", ".mp4")
+
+# Files of one request are uploaded concurrently; set UPLOAD_WORKERS=1 for serial uploads
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", "10"))
+# Files above one chunk go through a resumable session sent chunk by chunk, so a
+# failed chunk is retried on its own instead of restarting the whole file.
+# Must be a multiple of 256 KB.
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE_MB", "8")) * 1024 * 1024
+
+# Direct browser -> bucket uploads (create_upload_urls / complete_upload)
+SIGNED_URL_EXPIRATION_MINUTES = int(os.environ.get("SIGNED_URL_EXPIRATION_MINUTES", "30"))
+# Set when running against a local GCS emulator (e.g. fake-gcs-server); URLs are then unsigned
+STORAGE_EMULATOR_HOST = os.environ.get("STORAGE_EMULATOR_HOST")
+
+# complete_upload only publishes paths create_upload_urls issued, recorded per
+# upload_id; a record can be completed once, within the window below
+UPLOAD_ISSUANCE_COLLECTION = os.environ.get("UPLOAD_ISSUANCE_COLLECTION", "upload_issuances")
+UPLOAD_COMPLETE_WINDOW_HOURS = int(os.environ.get("UPLOAD_COMPLETE_WINDOW_HOURS", "24"))
+
+# Per-job fan-in manifests: the uploader records how many Document AI outputs the
+# refiner should wait for, document-ai-invoker records each arrival
+FIRESTORE_DB = "ai-evaluation-firestore"
+JOB_MANIFEST_COLLECTION = os.environ.get("JOB_MANIFEST_COLLECTION", "job_manifests")
+
 # Initialize clients
 storage_client = storage.Client()
-publisher = pubsub_v1.PublisherClient()
+firestore_client = firestore.Client(database=FIRESTORE_DB)
+publisher = pubsub_v1.PublisherClient(
+    batch_settings=pubsub_v1.types.BatchSettings(
+        max_messages=100,
+        max_bytes=1024 * 1024,
+        max_latency=0.05,  # seconds to wait for more messages before sending a batch
+    )
+)
+
+
+def _route(filename):
+    """Return (topic_path, job_type) for an uploaded filename."""
+    if filename.endswith(AUDIO_EXT):
+        return TOPIC_AUDIO, "AUDIO"
+    return TOPIC_DOC, "DOCUMENT"
+
+
+def _stream_size(stream):
+    """Size of a seekable upload stream, or None if it cannot be determined."""
+    try:
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+
+def _expect_outputs(company_name, uploads, submission_files=None):
+    """
+    Add the DOCUMENT files of this request to their job manifests before anything
+    is published, so the refiner never sees a job as complete while a sibling file
+    is still uploading. uploads: iterable of (filename, timestamp).
+    submission_files lists every file of a submission whose files arrive in
+    separate, concurrent requests sharing one timestamp (the web app's forwarder).
+    The manifest's expected count is then set to the submission's full DOCUMENT
+    count by whichever request gets there first; every request writes the same
+    value, so the order they run in does not matter.
+    Manifest errors are logged only; the refiner then falls back to a timed wait.
+    """
+    if submission_files is not None:
+        total = sum(1 for filename in submission_files if _route(filename.lower())[1] == "DOCUMENT")
+        expected = {f"{company_name}_{timestamp}": total for _, timestamp in uploads}
+        expected = {job_id: count for job_id, count in expected.items() if count}
+    else:
+        expected = collections.Counter(
+            f"{company_name}_{timestamp}"
+            for filename, timestamp in uploads
+            if _route(filename)[1] == "DOCUMENT"
+        )
+    if not expected:
+        return
+    try:
+        batch = firestore_client.batch()
+        for job_id, count in expected.items():
+            batch.set(
+                firestore_client.collection(JOB_MANIFEST_COLLECTION).document(job_id),
+                {
+                    "job_id": job_id,
+                    "company_name": company_name,
+                    "expected": count if submission_files is not None else firestore.Increment(count),
+                    "updated_at": firestore.SERVER_TIMESTAMP,
+                },
+                merge=True,
+            )
+        batch.commit()
+    except Exception as e:
+        print(f"Failed to update job manifests {list(expected)}: {e}")
+
+
+def _upload_file(file, blob_name):
+    bucket = storage_client.bucket(BUCKET_NAME)
+    blob = bucket.blob(blob_name, chunk_size=UPLOAD_CHUNK_SIZE)
+    blob.upload_from_file(
+        file.stream,
+        size=_stream_size(file.stream),
+        content_type=file.content_type,
+        retry=DEFAULT_RETRY,
+    )
+
+
+def _publish_upload(company_name, filename, blob_name, timestamp):
+    """
+    Publish the pipeline message for an object already in BUCKET_NAME.
+    Returns (publish_future, response_entry); the future is not waited on here.
+    """
+    job_id = f"{company_name}_{timestamp}"
+
+    # Route based on file type
+    topic_path, job_type = _route(filename)
+
+    # Pub/Sub message
+    message = {
+        "job_id": job_id,
+        "bucket": BUCKET_NAME,
+        "path": blob_name,
+        "filename": filename,
+        "company_name": company_name,
+        "timestamp": timestamp,
+        "job_type": job_type,
+    }
+
+    future = publisher.publish(
+        topic_path,
+        data=json.dumps(message).encode("utf-8")
+    )
+
+    response = {
+        "job_id": job_id,
+        "job_type": job_type,
+        "message": f"{filename} uploaded and published to {job_type} pipeline",
+        "path": blob_name
+    }
+    return future, response
+
+
+def _upload_and_publish(company_name, file, filename, blob_name, timestamp):
+    _upload_file(file, blob_name)
+    return _publish_upload(company_name, filename, blob_name, timestamp)
+
+
+def _signing_kwargs():
+    """
+    Extra generate_signed_url arguments for the runtime credentials.
+    Key-file service accounts sign locally; Cloud Run/Functions credentials have
+    no private key, so the signature goes through IAM signBlob with an access token.
+    """
+    credentials = storage_client._credentials
+    if isinstance(credentials, service_account.Credentials):
+        return {}
+    if not credentials.valid:
+        credentials.refresh(google.auth.transport.requests.Request())
+    return {
+        "service_account_email": credentials.service_account_email,
+        "access_token": credentials.token,
+    }
+
+
+def _resumable_upload_url(blob_name, content_type):
+    """
+    URL the browser POSTs to with 'x-goog-resumable: start' to open a resumable
+    session; the session URI comes back in the Location header.
+    """
+    if STORAGE_EMULATOR_HOST:
+        query = urllib.parse.urlencode({"uploadType": "resumable", "name": blob_name})
+        return f"{STORAGE_EMULATOR_HOST.rstrip('/')}/upload/storage/v1/b/{BUCKET_NAME}/o?{query}"
+
+    blob = storage_client.bucket(BUCKET_NAME).blob(blob_name)
+    return blob.generate_signed_url(
+        version="v4",
+        expiration=datetime.timedelta(minutes=SIGNED_URL_EXPIRATION_MINUTES),
+        method="POST",
+        content_type=content_type,
+        headers={"x-goog-resumable": "start"},
+        **_signing_kwargs(),
+    )
+
+
+class UploadIssuances:
+    """
+    Firestore record of the object paths create_upload_urls handed out, so that
+    complete_upload cannot be pointed at arbitrary objects in the bucket.
+    One document per upload_id: {company_name, paths, expires_at, completed}.
+    """
+
+    def __init__(self, client, collection=UPLOAD_ISSUANCE_COLLECTION):
+        self.client = client
+        self.collection = collection
+
+    def record(self, company_name, paths):
+        """Store a new issuance and return its upload_id."""
+        upload_id = secrets.token_urlsafe(24)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self._put(upload_id, {
+            "company_name": company_name,
+            "paths": list(paths),
+            "expires_at": now + datetime.timedelta(hours=UPLOAD_COMPLETE_WINDOW_HOURS),
+            "completed": False,
+        })
+        return upload_id
+
+    def check(self, upload_id, company_name, paths):
+        """Return why paths may not be completed under upload_id, or None if they may."""
+        issued = self._get(upload_id) if upload_id else None
+        if issued is None or issued.get("company_name") != company_name:
+            return "unknown upload_id"
+        if issued.get("completed"):
+            return "upload already completed"
+        if issued["expires_at"] <= datetime.datetime.now(datetime.timezone.utc):
+            return "upload_id expired"
+        unissued = sorted(set(paths) - set(issued.get("paths", ())))
+        if unissued:
+            return f"paths were not issued for this upload: {unissued}"
+        return None
+
+    def complete(self, upload_id):
+        """Mark upload_id completed; False if another call already did."""
+        return self._mark_completed(upload_id)
+
+    # Firestore access
+
+    def _ref(self, upload_id):
+        return self.client.collection(self.collection).document(upload_id)
+
+    def _get(self, upload_id):
+        snapshot = self._ref(upload_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def _put(self, upload_id, data):
+        self._ref(upload_id).set({**data, "created_at": firestore.SERVER_TIMESTAMP})
+
+    def _mark_completed(self, upload_id):
+        @firestore.transactional
+        def mark(transaction, ref):
+            snapshot = ref.get(transaction=transaction)
+            if not snapshot.exists or (snapshot.to_dict() or {}).get("completed"):
+                return False
+            transaction.update(ref, {"completed": True, "completed_at": firestore.SERVER_TIMESTAMP})
+            return True
+
+        return mark(self.client.transaction(), self._ref(upload_id))
+
+
+upload_issuances = UploadIssuances(firestore_client)
+
+
+@functions_framework.http
+def create_upload_urls(request):
+    """
+    HTTP Cloud Function issuing V4 signed resumable upload URLs so the browser can
+    upload straight to BUCKET_NAME. Expects JSON:
+    {"company_name": "Acme", "files": [{"filename": "deck.pdf", "content_type": "application/pdf"}]}
+    Returns {"upload_id": ..., "files": [...]}; complete_upload needs the upload_id.
+    The bucket's CORS policy must allow POST/PUT from the web app origin and expose
+    the Location header.
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        company_name = payload.get("company_name")
+        if not company_name:
+            return jsonify({"error": "company_name is required"}), 400
+        if not payload.get("files"):
+            return jsonify({"error": "file(s) required"}), 400
+
+        # One timestamp per request: the files of a submission form one job
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        targets = []
+        for entry in payload["files"]:
+            filename = entry.get("filename", "").lower()
+            if not filename:
+                return jsonify({"error": "filename is required for every file"}), 400
+            content_type = entry.get("content_type") or "application/octet-stream"
+            blob_name = f"{company_name}/{timestamp}_{filename}"
+            targets.append({
+                "filename": filename,
+                "path": blob_name,
+                "content_type": content_type,
+                "upload_url": _resumable_upload_url(blob_name, content_type),
+            })
+
+        upload_id = upload_issuances.record(company_name, [target["path"] for target in targets])
+        return jsonify({"upload_id": upload_id, "files": targets}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@functions_framework.http
+def complete_upload(request):
+    """
+    HTTP Cloud Function called after the browser finished its direct uploads.
+    Expects JSON:
+    {"company_name": "Acme", "upload_id": "...", "files": [{"path": "Acme/20250101_120000_deck.pdf"}]}
+    Checks the paths were issued under upload_id by create_upload_urls and that
+    each object exists, then publishes them exactly like upload_pitchdeck.
+    An upload_id can be completed once.
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        company_name = payload.get("company_name")
+        if not company_name:
+            return jsonify({"error": "company_name is required"}), 400
+        if not payload.get("files"):
+            return jsonify({"error": "file(s) required"}), 400
+
+        paths = [entry.get("path", "") for entry in payload["files"]]
+        issuance_error = upload_issuances.check(payload.get("upload_id"), company_name, paths)
+        if issuance_error:
+            return jsonify({"error": issuance_error}), 403
+
+        bucket = storage_client.bucket(BUCKET_NAME)
+        uploads = []
+        for entry in payload["files"]:
+            blob_name = entry.get("path", "")
+            prefix = f"{company_name}/"
+            # Object names are "{company_name}/{%Y%m%d_%H%M%S}_{filename}" as issued by create_upload_urls
+            basename = blob_name[len(prefix):]
+            if not blob_name.startswith(prefix) or len(basename) < 17 or basename[15] != "_":
+                return jsonify({"error": f"unexpected object path: {blob_name}"}), 400
+            timestamp, filename = basename[:15], basename[16:]
+
+            if not bucket.blob(blob_name).exists():
+                return jsonify({"error": f"{blob_name} was not uploaded"}), 400
+            uploads.append((filename, blob_name, timestamp))
+
+        if not upload_issuances.complete(payload["upload_id"]):
+            return jsonify({"error": "upload already completed"}), 409
+
+        _expect_outputs(company_name, [(filename, timestamp) for filename, _, timestamp in uploads])
+
+        publish_futures = []
+        responses = []
+        for filename, blob_name, timestamp in uploads:
+            future, response = _publish_upload(company_name, filename, blob_name, timestamp)
+            publish_futures.append(future)
+            responses.append(response)
+
+        for future in publish_futures:
+            future.result()
+
+        return jsonify({"files": responses}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 
 @functions_framework.http
 def upload_pitchdeck(request):
     """
-    HTTP Cloud Function to upload multiple pitch decks/audio files to GCS and 
+    HTTP Cloud Function to upload multiple pitch decks/audio files to GCS and
     publish metadata to the correct Pub/Sub topic.
+    A submission split across several requests passes the optional form fields
+    submission_timestamp (%Y%m%d_%H%M%S, shared by all its files so they form
+    one job) and submission_files (JSON list of every filename in it).
     """
     try:
         company_name = request.form.get("company_name")
@@ -28,58 +386,53 @@ def upload_pitchdeck(request):
         if "file" not in request.files:
             return jsonify({"error": "file(s) required"}), 400
 
+        submission_timestamp = request.form.get("submission_timestamp")
+        if submission_timestamp:
+            try:
+                datetime.datetime.strptime(submission_timestamp, "%Y%m%d_%H%M%S")
+            except ValueError:
+                return jsonify({"error": "submission_timestamp must be %Y%m%d_%H%M%S"}), 400
+        submission_files = None
+        if request.form.get("submission_files"):
+            try:
+                submission_files = json.loads(request.form["submission_files"])
+            except ValueError:
+                submission_files = None
+            if not isinstance(submission_files, list) or not all(isinstance(f, str) for f in submission_files):
+                return jsonify({"error": "submission_files must be a JSON list of filenames"}), 400
+            if not submission_timestamp:
+                return jsonify({"error": "submission_files requires submission_timestamp"}), 400
+
         # Multiple files support
         files = request.files.getlist("file")
 
-        responses = []
-        audio_ext = (".mp3", ".wav", ".m4a", ".mp4")
-
+        # One timestamp per request (or per submission): its files form one job
+        timestamp = submission_timestamp or datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        uploads = []
         for file in files:
             filename = file.filename.lower()
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
             blob_name = f"{company_name}/{timestamp}_{filename}"
+            uploads.append((file, filename, blob_name, timestamp))
 
-            # Upload to GCS
-            bucket = storage_client.bucket(BUCKET_NAME)
-            blob = bucket.blob(blob_name)
-            blob.upload_from_file(file, content_type=file.content_type)
-
-            job_id = f"{company_name}_{timestamp}"
-
-            # Route based on file type
-            if filename.endswith(audio_ext):
-                topic_path = TOPIC_AUDIO
-                job_type = "AUDIO"
-            else:
-                topic_path = TOPIC_DOC
-                job_type = "DOCUMENT"
-
-            # Pub/Sub message
-            message = {
-                "job_id": job_id,
-                "bucket": BUCKET_NAME,
-                "path": blob_name,
-                "filename": filename,
-                "company_name": company_name,
-                "timestamp": timestamp,
-                "job_type": job_type,
-            }
-
-            publisher.publish(
-                topic_path,
-                data=json.dumps(message).encode("utf-8")
-            ).result()
-
-            responses.append({
-                "job_id": job_id,
-                "job_type": job_type,
-                "message": f"{filename} uploaded and published to {job_type} pipeline",
-                "path": blob_name
-            })
+        _expect_outputs(
+            company_name,
+            [(filename, timestamp) for _, filename, _, timestamp in uploads],
+            submission_files,
+        )
+
+        # Upload to GCS concurrently; each file is published as soon as its upload finishes
+        with futures.ThreadPoolExecutor(max_workers=max(1, min(UPLOAD_WORKERS, len(uploads)))) as executor:
+            results = [executor.submit(_upload_and_publish, company_name, *upload) for upload in uploads]
+            results = [result.result() for result in results]
+
+        # Collect the batched publishes at the end instead of blocking per file
+        publish_futures = [future for future, _ in results]
+        responses = [response for _, response in results]
+        for future in publish_futures:
+            future.result()
 
         # Wrap responses in a dictionary so UI can safely call .get()
         return jsonify({"files": responses}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-
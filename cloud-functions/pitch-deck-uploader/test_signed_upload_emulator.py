@@ -0,0 +1,174 @@
+"""
+Direct-upload round trip against a local GCS emulator.
+
+Start an emulator first, e.g.
+    docker run -d -p 4443:4443 fsouza/fake-gcs-server -scheme http \
+        -public-host localhost:4443
+then run
+    STORAGE_EMULATOR_HOST=http://localhost:4443 python -m pytest test_signed_upload_emulator.py
+(or run the file directly). Without STORAGE_EMULATOR_HOST the test is skipped.
+
+test_complete_upload_refuses_unissued_paths runs anywhere: with the bucket
+mocked, it checks that complete_upload only publishes paths issued by
+create_upload_urls, and only once.
+
+test_signed_upload_round_trip needs the emulator. It creates the bucket, asks create_upload_urls for an upload URL, uploads
+a file the way templates/index.html does (POST with x-goog-resumable: start, then
+PUT to the Location header), and calls complete_upload with Pub/Sub stubbed out
+and the Firestore issuance record kept in memory. It also checks that paths not
+issued by create_upload_urls, and a second completion, are refused.
+"""
+
+import json
+import os
+import unittest
+from concurrent.futures import Future
+from unittest import mock
+
+import requests
+from flask import Flask, request
+
+
+class RecordingPublisher:
+    def __init__(self, *args, **kwargs):
+        self.messages = []
+
+    def publish(self, topic, data):
+        self.messages.append((topic, json.loads(data)))
+        future = Future()
+        future.set_result("message-id")
+        return future
+
+
+class MemoryIssuances:
+    """UploadIssuances with its Firestore documents kept in a dict."""
+
+    def __init__(self, base):
+        self.docs = {}
+        base._get = lambda upload_id: self.docs.get(upload_id)
+        base._put = lambda upload_id, data: self.docs.__setitem__(upload_id, dict(data))
+        base._mark_completed = self.mark_completed
+
+    def mark_completed(self, upload_id):
+        doc = self.docs.get(upload_id)
+        if doc is None or doc["completed"]:
+            return False
+        doc["completed"] = True
+        return True
+
+
+def complete(uploader, app, payload):
+    with app.test_request_context(method="POST", json=payload):
+        response, status = uploader.complete_upload(request)
+    return response.get_json(), status
+
+
+def load_uploader():
+    """Import main with Pub/Sub recorded and Firestore (and, without an emulator, GCS) mocked."""
+    patches = [
+        mock.patch("google.cloud.pubsub_v1.PublisherClient", RecordingPublisher),
+        mock.patch("google.cloud.firestore.Client"),
+    ]
+    if not os.environ.get("STORAGE_EMULATOR_HOST"):
+        patches.append(mock.patch("google.cloud.storage.Client"))
+    for patch in patches:
+        patch.start()
+    try:
+        import main as uploader
+    finally:
+        for patch in patches:
+            patch.stop()
+    MemoryIssuances(uploader.upload_issuances)
+    uploader.publisher.messages.clear()
+    return uploader
+
+
+def test_complete_upload_refuses_unissued_paths():
+    uploader = load_uploader()
+    app = Flask(__name__)
+    payload = {"company_name": "UnitCo", "files": [{"filename": "Deck.pdf", "content_type": "application/pdf"}]}
+    with mock.patch.object(uploader, "_resumable_upload_url", return_value="https://upload.example/"), \
+            app.test_request_context(method="POST", json=payload):
+        response, status = uploader.create_upload_urls(request)
+    assert status == 200, response.get_json()
+    upload_id = response.get_json()["upload_id"]
+    path = response.get_json()["files"][0]["path"]
+
+    with mock.patch.object(uploader, "storage_client") as storage_client, \
+            mock.patch.object(uploader, "_expect_outputs"):
+        storage_client.bucket.return_value.blob.return_value.exists.return_value = True
+        body, status = complete(uploader, app, {
+            "company_name": "UnitCo", "upload_id": upload_id,
+            "files": [{"path": "UnitCo/20240101_000000_other.pdf"}],
+        })
+        assert status == 403, body
+        body, status = complete(uploader, app, {"company_name": "OtherCo", "upload_id": upload_id,
+                                                "files": [{"path": path}]})
+        assert status == 403, body
+
+        ok = {"company_name": "UnitCo", "upload_id": upload_id, "files": [{"path": path}]}
+        body, status = complete(uploader, app, ok)
+        assert status == 200, body
+        assert complete(uploader, app, ok)[1] == 403
+    assert [message["path"] for _, message in uploader.publisher.messages] == [path]
+
+
+def test_signed_upload_round_trip():
+    if not os.environ.get("STORAGE_EMULATOR_HOST"):
+        raise unittest.SkipTest("STORAGE_EMULATOR_HOST is not set")
+
+    uploader = load_uploader()
+    bucket = uploader.storage_client.bucket(uploader.BUCKET_NAME)
+    if not bucket.exists():
+        uploader.storage_client.create_bucket(uploader.BUCKET_NAME)
+
+    app = Flask(__name__)
+    payload = {"company_name": "EmulatorCo", "files": [{"filename": "Deck.pdf", "content_type": "application/pdf"}]}
+    with app.test_request_context(method="POST", json=payload):
+        response, status = uploader.create_upload_urls(request)
+    assert status == 200, response.get_json()
+    upload_id = response.get_json()["upload_id"]
+    target = response.get_json()["files"][0]
+
+    content = b"%PDF-1.4 emulator test deck"
+    start = requests.post(
+        target["upload_url"],
+        headers={"Content-Type": target["content_type"], "x-goog-resumable": "start"},
+    )
+    start.raise_for_status()
+    requests.put(start.headers["Location"], data=content).raise_for_status()
+
+    # An object that exists but was never issued under this upload_id
+    bucket.blob("EmulatorCo/20240101_000000_other.pdf").upload_from_string(b"%PDF-1.4 not issued")
+    body, status = complete(uploader, app, {
+        "company_name": "EmulatorCo", "upload_id": upload_id,
+        "files": [{"path": "EmulatorCo/20240101_000000_other.pdf"}],
+    })
+    assert status == 403, body
+    body, status = complete(uploader, app, {"company_name": "EmulatorCo", "files": [{"path": target["path"]}]})
+    assert status == 403, body
+
+    payload = {"company_name": "EmulatorCo", "upload_id": upload_id, "files": [{"path": target["path"]}]}
+    body, status = complete(uploader, app, payload)
+    assert status == 200, body
+    assert complete(uploader, app, payload)[1] == 403  # completed once only
+
+    assert bucket.blob(target["path"]).download_as_bytes() == content
+    topic, message = uploader.publisher.messages[0]
+    assert topic == uploader.TOPIC_DOC
+    assert message["path"] == target["path"] and message["job_type"] == "DOCUMENT"
+    assert len(uploader.publisher.messages) == 1
+    print("Direct upload round trip OK:", body)
+
+
+def main():
+    test_complete_upload_refuses_unissued_paths()
+    print("complete_upload issuance checks OK")
+    try:
+        test_signed_upload_round_trip()
+    except unittest.SkipTest as skip:
+        print(f"Skipping: {skip}")
+
+
+if __name__ == "__main__":
+    main()
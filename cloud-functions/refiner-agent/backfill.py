@@ -0,0 +1,185 @@
+"""
+Re-run the refiner's merge -> map -> insert over historical Document AI outputs.
+
+Jobs are enumerated from every {company_name}/[{source}_]document_ai_output_{job_id}.json
+in the agents bucket (or a local directory with the same layout); every deck's
+output of a job is merged into that job. Jobs are merged and mapped in a process
+pool. The rows of --batch-size jobs are written together
+through write_tables, so large batches use BigQuery load jobs. Completed job
+keys are appended to a checkpoint file after each batch is written, and a
+restarted run skips them.
+
+Local stand-ins:
+    STORAGE_EMULATOR_HOST=http://localhost:4443   GCS emulator (fake-gcs-server)
+    FIRESTORE_EMULATOR_HOST=localhost:8080        only so main.py can start
+    PUBSUB_EMULATOR_HOST=localhost:8085           only so main.py can start
+    BQ_API_ENDPOINT=http://localhost:9050         BigQuery emulator
+    --source-dir DIR                              read outputs from disk instead of GCS
+    --output-dir DIR                              write rows as NDJSON instead of BigQuery
+
+Usage:
+    python backfill.py [--bucket agents_output_collection] [--workers 4]
+                       [--batch-size 50] [--checkpoint backfill_checkpoint.txt]
+                       [--mapper auto|heuristic|gemini] [--limit N] [--restart]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import main as refiner
+
+# Older outputs have no source prefix; newer ones are named after the deck they came from
+OUTPUT_PATTERN = re.compile(r"^(?P<company>.+)/(?:[^/]*_)?document_ai_output_(?P<job_id>.+)\.json$")
+
+
+def enumerate_jobs(bucket_name=None, source_dir=None):
+    """Return [{"key", "company_name", "job_id", "paths"}] sorted by key."""
+    if source_dir:
+        names = []
+        for root, _, files in os.walk(source_dir):
+            for name in files:
+                names.append(os.path.relpath(os.path.join(root, name), source_dir).replace(os.sep, "/"))
+    else:
+        blobs = refiner.storage_client.bucket(bucket_name).list_blobs(match_glob="**/*document_ai_output_*.json")
+        names = [blob.name for blob in blobs]
+
+    jobs = {}
+    for name in names:
+        match = OUTPUT_PATTERN.match(name)
+        if not match:
+            continue
+        key = f"{match['company']}/{match['job_id']}"
+        job = jobs.setdefault(key, {"key": key, "company_name": match["company"], "job_id": match["job_id"], "paths": []})
+        job["paths"].append(name)
+    return [jobs[key] for key in sorted(jobs)]
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def append_checkpoint(path, keys):
+    with open(path, "a", encoding="utf-8") as f:
+        for key in keys:
+            f.write(key + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def process_job(job, bucket_name, source_dir, mapper):
+    """Worker: merge and map one job. Returns (key, mapped rows or None, error)."""
+    try:
+        if source_dir:
+            jsons = []
+            for path in job["paths"]:
+                with open(os.path.join(source_dir, path), "r", encoding="utf-8") as f:
+                    jsons.append(json.load(f))
+        else:
+            jsons = refiner.download_agent_outputs(bucket_name, job["paths"])
+        if not jsons:
+            return job["key"], None, "no readable outputs"
+        merged = refiner.merge_agent_outputs(jsons)
+        return job["key"], refiner.map_to_tables(merged, mapper), None
+    except Exception as e:
+        return job["key"], None, str(e)
+
+
+def write_ndjson(output_dir, mapped):
+    os.makedirs(output_dir, exist_ok=True)
+    for key, rows in mapped.items():
+        if not rows:
+            continue
+        with open(os.path.join(output_dir, f"{key}.ndjson"), "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+    return True
+
+
+def flush(batch, output_dir):
+    """Write the rows of every job in batch at once. Returns True on success."""
+    combined = {key: [] for key in refiner.BQ_TABLES}
+    for mapped in batch.values():
+        for key in combined:
+            combined[key].extend(mapped.get(key, []))
+    if output_dir:
+        return write_ndjson(output_dir, combined)
+    return refiner.write_tables(combined)
+
+
+def run(args):
+    jobs = enumerate_jobs(args.bucket, args.source_dir)
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    done = load_checkpoint(args.checkpoint)
+    pending = [job for job in jobs if job["key"] not in done]
+    print(f"{len(jobs)} jobs found, {len(jobs) - len(pending)} already done.")
+    if args.limit:
+        pending = pending[:args.limit]
+    print(f"Processing {len(pending)} jobs with {args.workers} workers.")
+    if not pending:
+        return
+
+    start = time.perf_counter()
+    processed = failed = 0
+    batch = {}
+
+    def write_batch():
+        nonlocal processed, failed
+        if flush(batch, args.output_dir):
+            append_checkpoint(args.checkpoint, batch)
+            processed += len(batch)
+        else:
+            failed += len(batch)
+            print(f"Failed to write a batch of {len(batch)} jobs; they will be retried on the next run.")
+        batch.clear()
+        elapsed = time.perf_counter() - start
+        print(f"{processed}/{len(pending)} jobs written, {failed} failed, "
+              f"{processed / elapsed if elapsed else 0:.1f} jobs/sec")
+
+    # spawn: each worker builds its own clients instead of inheriting gRPC state through fork
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as executor:
+        results = executor.map(
+            process_job,
+            pending,
+            [args.bucket] * len(pending),
+            [args.source_dir] * len(pending),
+            [args.mapper] * len(pending),
+            chunksize=max(1, min(16, len(pending) // (args.workers * 4))),
+        )
+        for key, mapped, error in results:
+            if error:
+                failed += 1
+                print(f"Failed to map {key}: {error}")
+                continue
+            batch[key] = mapped
+            if len(batch) >= args.batch_size:
+                write_batch()
+    if batch:
+        write_batch()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bucket", default=refiner.AGENTS_BUCKET, help="bucket holding agent outputs")
+    parser.add_argument("--source-dir", help="read outputs from this directory instead of GCS")
+    parser.add_argument("--output-dir", help="write rows as NDJSON files here instead of BigQuery")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--batch-size", type=int, default=50, help="jobs written per write_tables call")
+    parser.add_argument("--checkpoint", default="backfill_checkpoint.txt")
+    parser.add_argument("--mapper", choices=["auto", "heuristic", "gemini"], default="auto")
+    parser.add_argument("--limit", type=int, help="process at most this many pending jobs")
+    parser.add_argument("--restart", action="store_true", help="ignore and clear the checkpoint")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
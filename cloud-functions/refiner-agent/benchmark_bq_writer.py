@@ -0,0 +1,131 @@
+"""
+Benchmark for the refiner's BigQuery writes.
+
+A fake BigQuery client sleeps per API call. It times the four per-table writes
+of one job, first made one after another as before and then with write_tables.
+It then writes a backfill-sized batch (rows of many decks in one call) to show
+the switch from streaming inserts to one load job per table. Runs in append
+mode (BQ_WRITE_MODE=append); the MERGE path is exercised separately.
+
+Usage: python benchmark_bq_writer.py [seconds_per_call] [decks_in_backfill]
+"""
+
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from google.cloud import bigquery
+
+FIELDS = {
+    "company_metrics": ["startup_id", "company_name", "current_userbase", "capital_ask"],
+    "founder_metrics": ["startup_id", "founder_id", "name", "background"],
+    "product_tech_metrics": ["startup_id", "product_name", "product_stage"],
+    "market_metrics": ["startup_id", "competitors", "market_growth_rate"],
+}
+
+
+class FakeLoadJob:
+    def __init__(self, client, rows):
+        self.client = client
+        self.rows = rows
+        self.job_id = f"load_{id(self)}"
+        self.errors = None
+
+    def result(self):
+        time.sleep(self.client.latency * 3)  # load jobs take longer than one streaming call
+        return self
+
+
+class FakeBigQueryClient:
+    latency = 0.2
+
+    def __init__(self, *args, **kwargs):
+        self.calls = {"get_table": 0, "insert_rows_json": 0, "load_table_from_json": 0}
+        self.rows_written = 0
+        self._lock = threading.Lock()
+
+    def _call(self, name, rows=()):
+        with self._lock:
+            self.calls[name] += 1
+            self.rows_written += len(rows)
+
+    def get_table(self, table_id):
+        self._call("get_table")
+        time.sleep(self.latency)
+        name = table_id.split(".")[-1]
+        return SimpleNamespace(table_id=table_id, schema=[bigquery.SchemaField(f, "STRING") for f in FIELDS[name]])
+
+    def insert_rows_json(self, table, rows):
+        self._call("insert_rows_json", rows)
+        time.sleep(self.latency)
+        return []
+
+    def load_table_from_json(self, rows, table, job_config=None):
+        self._call("load_table_from_json", rows)
+        return FakeLoadJob(self, rows)
+
+
+def mapped_rows(deck_count):
+    mapped = {key: [] for key in FIELDS}
+    for i in range(deck_count):
+        job_id = f"Deck{i}_20250101_120000"
+        mapped["company_metrics"].append({"startup_id": job_id, "company_name": f"Deck{i}", "capital_ask": "1M"})
+        mapped["founder_metrics"].append({"startup_id": job_id, "founder_id": f"{job_id}_founder_1", "name": "A"})
+        mapped["product_tech_metrics"].append({"startup_id": job_id, "product_name": "P", "ignored": "x"})
+        mapped["market_metrics"].append({"startup_id": job_id, "competitors": "B, C"})
+    return mapped
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    FakeBigQueryClient.latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2
+    decks = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    with mock.patch("google.cloud.storage.Client"), \
+            mock.patch("google.cloud.bigquery.Client", FakeBigQueryClient), \
+            mock.patch("google.cloud.pubsub_v1.PublisherClient"), \
+            mock.patch("google.cloud.firestore.Client"):
+        import main as refiner
+    refiner.bq_upsert.BQ_WRITE_MODE = "append"
+
+    one_job = mapped_rows(1)
+
+    def serial(mapped):
+        for key, table_id in refiner.BQ_TABLES.items():
+            refiner.insert_rows_into_bq(table_id, mapped[key])
+
+    with mock.patch("builtins.print"):
+        cold_serial = timed(serial, one_job)
+        refiner.schema_registry.invalidate()
+        cold_concurrent = timed(refiner.write_tables, one_job)
+        warm_concurrent = timed(refiner.write_tables, one_job)
+
+        client = refiner.bq_client
+        before = dict(client.calls)
+        backfill = mapped_rows(decks)
+        with mock.patch.object(refiner, "BQ_LOAD_JOB_MIN_ROWS", decks):
+            backfill_s = timed(refiner.write_tables, backfill)
+        backfill_calls = {k: client.calls[k] - before[k] for k in client.calls}
+
+    print(f"one job, serial writes:           {cold_serial:.2f}s")
+    print(f"one job, write_tables (cold):     {cold_concurrent:.2f}s")
+    print(f"one job, write_tables (cached):   {warm_concurrent:.2f}s")
+    print(f"backfill of {decks} decks ({decks * 4} rows): {backfill_s:.2f}s, "
+          f"{backfill_calls['load_table_from_json']} load jobs, "
+          f"{backfill_calls['insert_rows_json']} streaming inserts")
+    print("streaming the same decks one job at a time would take "
+          f"{decks * len(FIELDS)} insert_rows_json calls")
+
+    assert cold_concurrent < cold_serial / 2
+    assert backfill_calls == {"get_table": 0, "insert_rows_json": 0, "load_table_from_json": len(FIELDS)}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark for loading a job's agent outputs in the refiner.
+
+A fake storage client holds synthetic Document AI outputs in memory and sleeps
+per request to simulate GCS latency. The old path (download_to_filename,
+json.load and delete, one blob after another) is timed against
+download_agent_outputs. The peak traced memory of parsing one large output is
+also compared with and without the incremental parser.
+
+Usage: python benchmark_download_outputs.py [blob_count] [seconds_per_blob]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+
+
+class FakeBlob:
+    def __init__(self, store, name, latency):
+        self.store = store
+        self.name = name
+        self.latency = latency
+
+    def _fetch(self):
+        time.sleep(self.latency)
+        return bytes(bytearray(self.store[self.name]))  # a real download allocates a fresh copy
+
+    def download_as_bytes(self):
+        return self._fetch()
+
+    def download_to_filename(self, filename):
+        with open(filename, "wb") as f:
+            f.write(self._fetch())
+
+    def open(self, mode="rb", chunk_size=None):
+        time.sleep(self.latency)
+        return ChunkedReader(self.store[self.name], chunk_size or 1024 * 1024)
+
+
+class ChunkedReader:
+    """Hands out fresh chunks like BlobReader does, without exposing the stored buffer."""
+
+    def __init__(self, data, chunk_size):
+        self.data = data
+        self.chunk_size = chunk_size
+        self.pos = 0
+
+    def read(self, size=-1):
+        size = self.chunk_size if size is None or size < 0 else min(size, self.chunk_size)
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += len(chunk)
+        return chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeBucket:
+    def __init__(self, store, latency):
+        self.store = store
+        self.latency = latency
+
+    def blob(self, name):
+        return FakeBlob(self.store, name, self.latency)
+
+
+class FakeStorageClient:
+    store = {}
+    latency = 0.2
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def bucket(self, name):
+        return FakeBucket(self.store, self.latency)
+
+
+def make_output(job_id, parts, fields_per_part):
+    return json.dumps({
+        "job_id": job_id,
+        "company_name": "BenchCo",
+        "parts_count": parts,
+        "results": [
+            {
+                "part_filename": f"deck.pdf_part_{p + 1}.pdf",
+                "schema_fields": {f"company_metrics:field_{i}": f"value {p}-{i} " * 4 for i in range(fields_per_part)},
+            }
+            for p in range(parts)
+        ],
+    }).encode("utf-8")
+
+
+def legacy_load(refiner, bucket_name, blob_names):
+    jsons = []
+    for name in blob_names:
+        fd, tmp_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        refiner.storage_client.bucket(bucket_name).blob(name).download_to_filename(tmp_path)
+        with open(tmp_path, "r", encoding="utf-8") as f:
+            jsons.append(json.load(f))
+        os.remove(tmp_path)
+    return jsons
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def parse_peak(refiner, blob_name):
+    tracemalloc.start()
+    refiner.download_and_load_json("bench", blob_name)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def main():
+    blob_count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    FakeStorageClient.latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+    with mock.patch("google.cloud.storage.Client", FakeStorageClient), \
+            mock.patch("google.cloud.bigquery.Client"), \
+            mock.patch("google.cloud.pubsub_v1.PublisherClient"), \
+            mock.patch("google.cloud.firestore.Client"):
+        import main as refiner
+
+    names = [f"BenchCo/agent_{i}_output_job1.json" for i in range(blob_count)]
+    for name in names:
+        FakeStorageClient.store[name] = make_output("job1", parts=4, fields_per_part=200)
+
+    with mock.patch("builtins.print"):
+        legacy, legacy_s = timed(legacy_load, refiner, "bench", names)
+        current, current_s = timed(refiner.download_agent_outputs, "bench", names)
+    assert current == legacy, "outputs must load identically and in order"
+    print(f"{blob_count} outputs, {FakeStorageClient.latency:.2f}s per blob")
+    print(f"serial temp-file loads: {legacy_s:.2f}s")
+    print(f"concurrent in-memory:   {current_s:.2f}s ({legacy_s / current_s:.1f}x)")
+    assert current_s < legacy_s / 2
+
+    FakeStorageClient.latency = 0
+    FakeStorageClient.store["BenchCo/large_output_job1.json"] = make_output("job1", parts=40, fields_per_part=2000)
+    size_mb = len(FakeStorageClient.store["BenchCo/large_output_job1.json"]) / 1024 / 1024
+    streaming_peak = parse_peak(refiner, "BenchCo/large_output_job1.json") if refiner.ijson else None
+    with mock.patch.object(refiner, "ijson", None):
+        buffered_peak = parse_peak(refiner, "BenchCo/large_output_job1.json")
+    print(f"{size_mb:.1f} MB output, peak while parsing: download_as_bytes + json.loads {buffered_peak:.1f} MB", end="")
+    print(f", ijson {streaming_peak:.1f} MB" if streaming_peak is not None else " (ijson not installed)")
+    if streaming_peak is not None:
+        assert streaming_peak <= buffered_peak
+
+
+if __name__ == "__main__":
+    main()
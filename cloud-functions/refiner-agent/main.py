@@ -4,7 +4,7 @@ import time
 import json
 import base64 
 import re
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 from google.cloud import firestore
 
@@ -12,6 +12,10 @@ import functions_framework
 from google.cloud import storage, bigquery
 from google.cloud import pubsub_v1
 from google.api_core.exceptions import NotFound
+from google.auth.credentials import AnonymousCredentials
+
+import bq_upsert
+from schema_registry import SchemaRegistry
 
 # === CONFIG ===
 PROJECT_ID = os.environ.get("PROJECT_ID", "molten-enigma-472206-i4")
@@ -22,6 +26,12 @@ FIRESTORE_COLLECTION = "jobs"
 FIRESTORE_DB = "ai-evaluation-firestore"
 firestore_client = firestore.Client(project=PROJECT_ID, database=FIRESTORE_DB)
 
+# Optional incremental JSON parser; without it outputs are parsed with json.loads
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 # Optional Vertex AI imports - if you use Vertex AI Python library
 try:
     from google.cloud import aiplatform
@@ -33,28 +43,70 @@ except Exception:
 PROJECT_ID = os.environ.get("PROJECT_ID", "molten-enigma-472206-i4")
 LOCATION = os.environ.get("LOCATION", "us")   # region for Vertex AI if used
 AGENTS_BUCKET = os.environ.get("AGENTS_BUCKET", "agents_output_collection")
-SLEEP_SECONDS = int(os.environ.get("SLEEP_SECONDS", "12"))  # 2 minutes default
+SLEEP_SECONDS = int(os.environ.get("SLEEP_SECONDS", "12"))  # fixed wait for jobs without a manifest
+
+# Fan-in: the uploader records how many Document AI outputs a job expects and
+# document-ai-invoker records each arrival in job_manifests/{job_id}. The merge runs
+# as soon as the last one lands; FANIN_TIMEOUT_SECONDS bounds the wait for stragglers.
+JOB_MANIFEST_COLLECTION = os.environ.get("JOB_MANIFEST_COLLECTION", "job_manifests")
+FANIN_TIMEOUT_SECONDS = int(os.environ.get("FANIN_TIMEOUT_SECONDS", "120"))
+FANIN_POLL_SECONDS = float(os.environ.get("FANIN_POLL_SECONDS", "2"))
+
+# Agent outputs of a job are downloaded concurrently, straight into memory
+DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", "8"))
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
 
 # BigQuery tables (project.dataset.table)
 BQ_COMPANY_METRICS = "molten-enigma-472206-i4.financial_analysis.company_metrics"
 BQ_FOUNDER_METRICS = "molten-enigma-472206-i4.financial_analysis.founder_metrics"
 BQ_PRODUCT_TECH_METRICS = "molten-enigma-472206-i4.financial_analysis.product_tech_metrics"
 BQ_MARKET_METRICS = "molten-enigma-472206-i4.financial_analysis.market_metrics"
+BQ_TABLES = {
+    "company_metrics": BQ_COMPANY_METRICS,
+    "founder_metrics": BQ_FOUNDER_METRICS,
+    "product_tech_metrics": BQ_PRODUCT_TECH_METRICS,
+    "market_metrics": BQ_MARKET_METRICS,
+}
+
+# Point BigQuery at a local emulator (e.g. bigquery-emulator); GCS and Firestore use
+# the client libraries' own STORAGE_EMULATOR_HOST / FIRESTORE_EMULATOR_HOST
+BQ_API_ENDPOINT = os.environ.get("BQ_API_ENDPOINT")
+
+# Appends only (BQ_WRITE_MODE=append, or tables without upsert keys; see bq_upsert):
+# "auto" streams small batches and switches to load jobs at BQ_LOAD_JOB_MIN_ROWS rows;
+# "stream" or "load" force one method
+BQ_WRITE_METHOD = os.environ.get("BQ_WRITE_METHOD", "auto").lower()
+BQ_LOAD_JOB_MIN_ROWS = int(os.environ.get("BQ_LOAD_JOB_MIN_ROWS", "500"))
 
 # Initialize clients
 storage_client = storage.Client(project=PROJECT_ID)
-bq_client = bigquery.Client(project=PROJECT_ID)
+if BQ_API_ENDPOINT:
+    bq_client = bigquery.Client(
+        project=PROJECT_ID,
+        credentials=AnonymousCredentials(),
+        client_options={"api_endpoint": BQ_API_ENDPOINT},
+    )
+else:
+    bq_client = bigquery.Client(project=PROJECT_ID)
+schema_registry = SchemaRegistry(bq_client)
 publisher = pubsub_v1.PublisherClient()  # if you need to republish results (optional)
 
 
 # ---------------------------
 # Helper: list matching files
 # ---------------------------
+GLOB_SPECIAL_CHARS = set("*?[]{}\\")
+
+
 def list_agent_files(bucket_name: str, company_name: str, job_id: str) -> List[str]:
     """List GCS object names matching pattern: {company_name}/*_{job_id}.json"""
     prefix = f"{company_name}/"
     bucket = storage_client.bucket(bucket_name)
-    blobs = bucket.list_blobs(prefix=prefix)
+    if GLOB_SPECIAL_CHARS.isdisjoint(company_name + job_id):
+        # Filter server-side so the listing only returns this job's outputs
+        blobs = bucket.list_blobs(prefix=prefix, match_glob=f"{prefix}**_{job_id}.json")
+    else:
+        blobs = bucket.list_blobs(prefix=prefix)
     pattern = re.compile(rf".*_{re.escape(job_id)}\.json$")
     matches = []
     for b in blobs:
@@ -63,19 +115,100 @@ def list_agent_files(bucket_name: str, company_name: str, job_id: str) -> List[s
     return matches
 
 
+# ---------------------------
+# Fan-in: wait for this job's outputs
+# ---------------------------
+def _manifest_complete(manifest: Dict[str, Any]) -> bool:
+    finished = set(manifest.get("arrived", [])) | set(manifest.get("failed", []))
+    return len(finished) >= manifest.get("expected", 0)
+
+
+def _unmerged_outputs(manifest: Dict[str, Any]) -> List[str]:
+    merged = set(manifest.get("merged_outputs", []))
+    return [o for o in manifest.get("outputs", []) if o not in merged]
+
+
+@firestore.transactional
+def _claim_merge(transaction, manifest_ref, force: bool):
+    """
+    Atomically take the merge for the manifest's current outputs. Returns every
+    output to merge, or None if the job is not complete (and not forced) or another
+    invocation already merged these outputs.
+    """
+    manifest = manifest_ref.get(transaction=transaction).to_dict() or {}
+    if not _unmerged_outputs(manifest):
+        return None
+    if not force and not _manifest_complete(manifest):
+        return None
+    outputs = manifest.get("outputs", [])
+    transaction.update(manifest_ref, {"merged_outputs": outputs, "merged_at": firestore.SERVER_TIMESTAMP})
+    return outputs
+
+
+def wait_for_job_outputs(job_id: str):
+    """
+    Wait on the job's fan-in manifest until every expected producer has arrived,
+    or until FANIN_TIMEOUT_SECONDS passes. Returns the output object names this
+    invocation should merge, [] if another invocation took the merge, or None if
+    the job has no manifest (caller falls back to the fixed sleep and a listing).
+    """
+    manifest_ref = firestore_client.collection(JOB_MANIFEST_COLLECTION).document(job_id)
+    deadline = time.monotonic() + FANIN_TIMEOUT_SECONDS
+    try:
+        while True:
+            snapshot = manifest_ref.get()
+            if not snapshot.exists:
+                return None
+            manifest = snapshot.to_dict()
+            if not _unmerged_outputs(manifest):
+                return []
+
+            timed_out = time.monotonic() >= deadline
+            if timed_out or _manifest_complete(manifest):
+                outputs = _claim_merge(firestore_client.transaction(), manifest_ref, timed_out)
+                if outputs is not None:
+                    if timed_out and not _manifest_complete(manifest):
+                        print(f"Fan-in for {job_id} timed out after {FANIN_TIMEOUT_SECONDS}s; "
+                              f"merging {len(outputs)} of {manifest.get('expected')} expected outputs.")
+                    return outputs
+                continue
+            time.sleep(FANIN_POLL_SECONDS)
+    except Exception as e:
+        print(f"Could not read job manifest for {job_id}: {e}")
+        return None
+
+
 # -------------------------
 # Helper: download & load
 # -------------------------
 def download_and_load_json(bucket_name: str, blob_name: str) -> Dict[str, Any]:
-    fd, tmp_path = tempfile.mkstemp(suffix=".json")
-    os.close(fd)
+    """
+    Load one JSON object from GCS without a temp file. With ijson the blob is
+    parsed while it streams in, so the raw bytes are never held next to the
+    parsed object; otherwise the bytes are downloaded and parsed once.
+    """
     bucket = storage_client.bucket(bucket_name)
     blob = bucket.blob(blob_name)
-    blob.download_to_filename(tmp_path)
-    with open(tmp_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    os.remove(tmp_path)
-    return data
+    if ijson is not None:
+        with blob.open("rb", chunk_size=DOWNLOAD_CHUNK_SIZE) as f:
+            return next(ijson.items(f, "", use_float=True))
+    return json.loads(blob.download_as_bytes())
+
+
+def download_agent_outputs(bucket_name: str, blob_names: List[str]) -> List[Dict[str, Any]]:
+    """Download and parse blob_names concurrently; failed blobs are logged and skipped, order is kept."""
+    def load(blob_name):
+        print(f"Downloading {blob_name} ...")
+        try:
+            return download_and_load_json(bucket_name, blob_name)
+        except Exception as ex:
+            print(f"Failed to download/load {blob_name}: {ex}")
+            return None
+
+    if not blob_names:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(DOWNLOAD_WORKERS, len(blob_names)))) as executor:
+        return [j for j in executor.map(load, blob_names) if j is not None]
 
 
 # -------------------------
@@ -228,21 +361,84 @@ Output only the JSON.
     return mapped
 
 
+def map_to_tables(merged: Dict[str, Any], mapper: str = "auto") -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Map a merged job output to table rows. "auto" tries Gemini and falls back to
+    the heuristic mapper; "gemini" or "heuristic" use only that mapper.
+    """
+    if mapper == "heuristic":
+        return heuristic_map_to_tables(merged)
+    if mapper == "gemini":
+        return call_gemini_mapping(merged)
+
+    # Try to call Gemini (Vertex AI) to map; fallback to heuristic
+    try:
+        mapped = call_gemini_mapping(merged)
+        print("Mapping via Gemini succeeded.")
+    except Exception as e:
+        print(f"Gemini mapping failed or not available: {e}. Falling back to heuristic mapper.")
+        mapped = heuristic_map_to_tables(merged)
+    return mapped
+
+
 # -------------------------
 # Insert into BigQuery
 # -------------------------
-# -------------------------
-# Insert into BigQuery
-# -------------------------
+def _stream_rows(table_schema, full_table_id: str, rows: list):
+    errors = bq_client.insert_rows_json(table_schema.table, rows)
+    if errors:
+        # The table may have changed underneath the cached schema; refetch next time
+        schema_registry.invalidate(full_table_id)
+        print(f"Errors when inserting into {full_table_id}: {errors}")
+        return False
+    print(f"Inserted {len(rows)} rows into {full_table_id}.")
+    return True
+
+
+def _load_rows(table_schema, full_table_id: str, rows: list):
+    """Append rows with a load job (NDJSON built in memory) instead of the streaming API."""
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        schema=table_schema.table.schema,
+    )
+    job = bq_client.load_table_from_json(rows, table_schema.table, job_config=job_config)
+    try:
+        job.result()
+    except Exception as e:
+        schema_registry.invalidate(full_table_id)
+        print(f"Errors when loading into {full_table_id}: {job.errors or e}")
+        return False
+    print(f"Loaded {len(rows)} rows into {full_table_id} (load job {job.job_id}).")
+    return True
+
+
+def _merge_rows(table_schema, full_table_id: str, rows: list):
+    """Upsert rows on the table's key columns so a reprocessed startup keeps one row."""
+    try:
+        affected = bq_upsert.upsert_rows(bq_client, table_schema.table, rows)
+    except Exception as e:
+        schema_registry.invalidate(full_table_id)
+        print(f"Errors when merging into {full_table_id}: {e}")
+        return False
+    print(f"Merged {len(rows)} rows into {full_table_id} ({affected} rows affected).")
+    return True
+
+
 def insert_rows_into_bq(table_name: str, rows: list):
     """
-    Inserts a list of rows into the specified BigQuery table.
+    Writes a list of rows into the specified BigQuery table.
     Only keeps fields that exist in the table schema.
     Handles both plain table names and fully-qualified table IDs.
+    Rows are upserted on startup_id (plus founder_id for founder_metrics) unless
+    BQ_WRITE_MODE=append. Appends of at least BQ_LOAD_JOB_MIN_ROWS rows go through
+    a load job, which is free of streaming-insert charges and leaves the rows
+    immediately updatable by DML.
+    Returns False if the write failed.
     """
     if not rows:
         print(f"No rows to insert for table {table_name}")
-        return
+        return True
 
     # Ensure table_name is fully-qualified
     if table_name.count(".") == 2:
@@ -252,24 +448,29 @@ def insert_rows_into_bq(table_name: str, rows: list):
         full_table_id = f"molten-enigma-472206-i4.financial_analysis.{table_name}"
 
     try:
-        # Fetch table schema to filter allowed fields
-        table_ref = bq_client.get_table(full_table_id)
-        allowed_fields = {field.name for field in table_ref.schema}
+        # Cached table schema to filter allowed fields
+        table_schema = schema_registry.get(full_table_id)
+        allowed_fields = table_schema.fields
 
         # Keep only allowed fields
         cleaned_rows = [{k: v for k, v in row.items() if k in allowed_fields} for row in rows]
 
-        # Insert into BigQuery
-        errors = bq_client.insert_rows_json(table_ref, cleaned_rows)
-        if errors:
-            print(f"Errors when inserting into {full_table_id}: {errors}")
-        else:
-            print(f"Inserted {len(cleaned_rows)} rows into {full_table_id}.")
+        if bq_upsert.can_upsert(table_schema.table):
+            return _merge_rows(table_schema, full_table_id, cleaned_rows)
+        if BQ_WRITE_METHOD == "load" or (BQ_WRITE_METHOD == "auto" and len(cleaned_rows) >= BQ_LOAD_JOB_MIN_ROWS):
+            return _load_rows(table_schema, full_table_id, cleaned_rows)
+        return _stream_rows(table_schema, full_table_id, cleaned_rows)
 
     except Exception as e:
         print(f"Exception inserting into {full_table_id}: {e}")
+        return False
 
 
+def write_tables(mapped: Dict[str, List[Dict[str, Any]]]) -> bool:
+    """Write the mapped rows of every output table concurrently. Returns True if every write succeeded."""
+    writes = [(table_id, mapped.get(key, [])) for key, table_id in BQ_TABLES.items()]
+    with ThreadPoolExecutor(max_workers=len(writes)) as executor:
+        return all(executor.map(lambda write: insert_rows_into_bq(*write), writes))
 
 
 # -------------------------
@@ -306,12 +507,18 @@ def refiner_agent(cloud_event):
             print("Missing job_id or company_name; skipping.")
             return ("", 200)
 
-        print(f"Refiner received job_id={job_id}, company={company_name}. Sleeping {SLEEP_SECONDS}s to wait for other processors.")
-        time.sleep(SLEEP_SECONDS)
+        print(f"Refiner received job_id={job_id}, company={company_name}. Waiting for the job's producers.")
+        matches = wait_for_job_outputs(job_id)
+        if matches is None:
+            # Jobs uploaded without a manifest: wait a fixed time, then list this job's outputs
+            print(f"No job manifest for {job_id}; sleeping {SLEEP_SECONDS}s to wait for other processors.")
+            time.sleep(SLEEP_SECONDS)
+            print("Listing agent output files in GCS...")
+            matches = list_agent_files(bucket_name, company_name, job_id)
+        elif not matches:
+            print(f"Outputs of {job_id} were already merged by another invocation; nothing to do.")
+            return ("", 200)
 
-        # list files
-        print("Listing agent output files in GCS...")
-        matches = list_agent_files(bucket_name, company_name, job_id)
         if not matches:
             print(f"No matching files found for {company_name}/*_{job_id}.json in bucket {bucket_name}")
             return ("", 200)
@@ -319,32 +526,16 @@ def refiner_agent(cloud_event):
         print(f"Found {len(matches)} files: {matches}")
 
         # download all
-        jsons = []
-        for bname in matches:
-            print(f"Downloading {bname} ...")
-            try:
-                j = download_and_load_json(bucket_name, bname)
-                jsons.append(j)
-            except Exception as ex:
-                print(f"Failed to download/load {bname}: {ex}")
+        jsons = download_agent_outputs(bucket_name, matches)
 
         merged = merge_agent_outputs(jsons)
         print("Merged JSON prepared.")
 
-        # Try to call Gemini (Vertex AI) to map; fallback to heuristic
-        try:
-            mapped = call_gemini_mapping(merged)
-            print("Mapping via Gemini succeeded.")
-        except Exception as e:
-            print(f"Gemini mapping failed or not available: {e}. Falling back to heuristic mapper.")
-            mapped = heuristic_map_to_tables(merged)
+        mapped = map_to_tables(merged)
 
         # Insert into BigQuery
         print("Inserting into BigQuery...")
-        insert_rows_into_bq(BQ_COMPANY_METRICS, mapped.get("company_metrics", []))
-        insert_rows_into_bq(BQ_FOUNDER_METRICS, mapped.get("founder_metrics", []))
-        insert_rows_into_bq(BQ_PRODUCT_TECH_METRICS, mapped.get("product_tech_metrics", []))
-        insert_rows_into_bq(BQ_MARKET_METRICS, mapped.get("market_metrics", []))
+        write_tables(mapped)
 
         print(f"Refiner job {job_id} completed successfully.")
 
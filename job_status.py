@@ -0,0 +1,142 @@
+"""Shared job-status tracking for the web app.
+
+A single Firestore ``on_snapshot`` listener on the ``jobs`` collection feeds an
+in-memory status table; every browser waiting on a job subscribes to that table
+instead of polling Firestore on its own. Without a Firestore client the hub
+still works as a local in-memory stand-in driven through ``publish``.
+
+Subscribers hear about status changes. Listeners also hear about a job whose
+document was written again with the same status (a completed job merged a
+second time), told apart by the document's update_time.
+"""
+
+import datetime
+import logging
+import queue
+import threading
+from collections import OrderedDict
+
+PENDING_STATUS = "pending"
+TERMINAL_STATUSES = {"completed", "failed"}
+
+
+class JobStatusHub:
+    """Fans job status changes out to all subscribers of a job_id."""
+
+    def __init__(self, db=None, collection="jobs", lookback_hours=24, max_tracked=10000):
+        self._db = db
+        self._collection = collection
+        self._lookback = datetime.timedelta(hours=lookback_hours)
+        self._max_tracked = max_tracked
+        self._lock = threading.Lock()
+        self._statuses = OrderedDict()
+        self._versions = {}  # job_id -> update_time of the last published document
+        self._subscribers = {}
+        self._listeners = []
+        self._watch = None
+
+    # ---------- Firestore listener ----------
+
+    def start(self):
+        """Attach the shared snapshot listener (no-op without Firestore or if already running)."""
+        if self._db is None or self._watch is not None:
+            return
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        # Only recent jobs matter to waiting browsers; this keeps the initial snapshot small.
+        since = datetime.datetime.now(datetime.timezone.utc) - self._lookback
+        try:
+            query = self._db.collection(self._collection).where(filter=FieldFilter("timestamp", ">=", since))
+            self._watch = query.on_snapshot(self._on_snapshot)
+            logging.info(f"Watching Firestore collection '{self._collection}' for job status changes")
+        except Exception as e:
+            logging.error(f"Failed to start Firestore job listener: {e}")
+            self._watch = None
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _on_snapshot(self, docs, changes, read_time):
+        for change in changes:
+            if change.type.name == "REMOVED":
+                continue
+            data = change.document.to_dict() or {}
+            status = data.get("status")
+            if status:
+                version = change.document.update_time or data.get("timestamp")
+                self.publish(change.document.id, status, version)
+
+    # ---------- Status table ----------
+
+    def publish(self, job_id, status, version=None):
+        """
+        Record a status for job_id. Subscribers are notified if the status
+        changed; listeners also when version (the document's update_time) did.
+        """
+        with self._lock:
+            previous = self._statuses.get(job_id)
+            previous_version = self._versions.get(job_id)
+            self._statuses[job_id] = status
+            self._statuses.move_to_end(job_id)
+            if version is not None:
+                self._versions[job_id] = version
+            while len(self._statuses) > self._max_tracked:
+                evicted, _ = self._statuses.popitem(last=False)
+                self._versions.pop(evicted, None)
+            subscribers = list(self._subscribers.get(job_id, ()))
+            listeners = list(self._listeners)
+
+        rewritten = version is not None and version != previous_version
+        if previous == status and not rewritten:
+            return
+        if previous != status:
+            for q in subscribers:
+                q.put(status)
+        for callback in listeners:
+            try:
+                callback(job_id, status, previous)
+            except Exception as e:
+                logging.error(f"Job status listener failed for job_id={job_id}: {e}")
+
+    def get_status(self, job_id):
+        """Return the last known status, reading the Firestore document on a cold miss."""
+        with self._lock:
+            status = self._statuses.get(job_id)
+        if status is not None or self._db is None:
+            return status or PENDING_STATUS
+
+        doc = self._db.collection(self._collection).document(job_id).get()
+        if not doc.exists:
+            return PENDING_STATUS
+        status = (doc.to_dict() or {}).get("status") or PENDING_STATUS
+        if status in TERMINAL_STATUSES:
+            with self._lock:
+                self._statuses.setdefault(job_id, status)
+        return status
+
+    # ---------- Subscriptions ----------
+
+    def subscribe(self, job_id):
+        """Return a queue that receives every new status published for job_id."""
+        q = queue.Queue()
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append(q)
+        return q
+
+    def unsubscribe(self, job_id, q):
+        with self._lock:
+            waiting = self._subscribers.get(job_id, [])
+            if q in waiting:
+                waiting.remove(q)
+            if not waiting:
+                self._subscribers.pop(job_id, None)
+
+    def add_listener(self, callback):
+        """
+        Register callback(job_id, status, previous_status) for every status
+        change and every rewrite of a job's document (status may equal previous_status).
+        """
+        with self._lock:
+            self._listeners.append(callback)
@@ -0,0 +1,118 @@
+"""Idempotent BigQuery writes: staging table + MERGE keyed on startup_id.
+
+Rows are de-duplicated per key in Python, loaded into a short-lived staging
+table next to the target and merged in one DML statement. Re-processing a
+startup updates its existing row instead of appending another one.
+founder_metrics is keyed on (startup_id, founder_id) and every other table on
+startup_id. Matched rows only take the columns the new rows provide; NULLs and
+empty arrays never overwrite stored values.
+
+BQ_WRITE_MODE=append restores plain appends. Tables without the key columns
+are always appended to.
+
+The same module is shipped with each deployable unit that writes metric rows
+(refiner-agent, process-audio-pitch-deck, startup_investment_analyst); keep the
+copies identical.
+"""
+
+import datetime
+import os
+import uuid
+
+from google.cloud import bigquery
+
+BQ_WRITE_MODE = os.environ.get("BQ_WRITE_MODE", "merge").lower()
+STAGING_TABLE_TTL = datetime.timedelta(hours=1)  # staging tables expire even if cleanup fails
+
+DEFAULT_UPSERT_KEYS = ("startup_id",)
+UPSERT_KEYS = {
+    "founder_metrics": ("startup_id", "founder_id"),
+}
+
+
+def upsert_keys(table):
+    """Key columns for a Table, by table name."""
+    return UPSERT_KEYS.get(table.table_id, DEFAULT_UPSERT_KEYS)
+
+
+def can_upsert(table):
+    """True when merge mode is on and the table has every key column."""
+    names = {field.name for field in table.schema}
+    return BQ_WRITE_MODE == "merge" and all(key in names for key in upsert_keys(table))
+
+
+def _is_empty(value):
+    return value is None or value == []
+
+
+def dedupe_rows(rows, keys):
+    """
+    Collapse rows sharing the same key values, later non-empty values winning.
+    Rows missing a key value cannot match anything and are kept as they are.
+    """
+    merged = {}
+    unkeyed = []
+    for row in rows:
+        key = tuple(row.get(k) for k in keys)
+        if any(_is_empty(v) or v == "" for v in key):
+            unkeyed.append(dict(row))
+            continue
+        current = merged.setdefault(key, {})
+        current.update({k: v for k, v in row.items() if not _is_empty(v) or k not in current})
+    return list(merged.values()) + unkeyed
+
+
+def build_merge_sql(target_id, staging_id, fields, keys):
+    """MERGE statement upserting staging rows (with the given SchemaFields) into target_id."""
+    columns = [field.name for field in fields]
+    on = " AND ".join(f"T.`{k}` = S.`{k}`" for k in keys)
+    updates = []
+    for field in fields:
+        if field.name in keys:
+            continue
+        if field.mode == "REPEATED":
+            updates.append(f"`{field.name}` = IF(ARRAY_LENGTH(S.`{field.name}`) > 0, S.`{field.name}`, T.`{field.name}`)")
+        else:
+            updates.append(f"`{field.name}` = COALESCE(S.`{field.name}`, T.`{field.name}`)")
+    column_list = ", ".join(f"`{c}`" for c in columns)
+    values = ", ".join(f"S.`{c}`" for c in columns)
+    sql = f"MERGE `{target_id}` T\nUSING `{staging_id}` S\nON {on}\n"
+    if updates:
+        sql += "WHEN MATCHED THEN UPDATE SET\n  " + ",\n  ".join(updates) + "\n"
+    sql += f"WHEN NOT MATCHED THEN INSERT ({column_list}) VALUES ({values})"
+    return sql
+
+
+def upsert_rows(client, table, rows, keys=None):
+    """
+    Upsert rows (dicts already filtered to the table's columns) into table, a
+    bigquery.Table with its schema. Returns the number of target rows affected;
+    raises the underlying API error on failure.
+    """
+    keys = tuple(keys or upsert_keys(table))
+    rows = dedupe_rows(rows, keys)
+    if not rows:
+        return 0
+
+    provided = set(keys)
+    for row in rows:
+        provided.update(row)
+    fields = [field for field in table.schema if field.name in provided]
+
+    target_id = f"{table.project}.{table.dataset_id}.{table.table_id}"
+    staging_id = f"{table.project}.{table.dataset_id}._staging_{table.table_id}_{uuid.uuid4().hex[:12]}"
+    staging = bigquery.Table(staging_id, schema=fields)
+    staging.expires = datetime.datetime.now(datetime.timezone.utc) + STAGING_TABLE_TTL
+    client.create_table(staging)
+    try:
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+            schema=fields,
+        )
+        client.load_table_from_json(rows, staging, job_config=job_config).result()
+        job = client.query(build_merge_sql(target_id, staging_id, fields, keys))
+        job.result()
+        return job.num_dml_affected_rows or 0
+    finally:
+        client.delete_table(staging_id, not_found_ok=True)
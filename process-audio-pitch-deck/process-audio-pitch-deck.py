@@ -9,6 +9,9 @@ import google.generativeai as genai
 from google.cloud import bigquery, storage
 import functions_framework
 
+import bq_upsert
+from schema_registry import SchemaRegistry
+
 # -------------------------------
 # Environment & Config
 # -------------------------------
@@ -20,6 +23,7 @@ BQ_TABLES = os.getenv("BQ_TABLES", "").split(",")
 
 storage_client = storage.Client(project=BQ_PROJECT)
 bq_client = bigquery.Client(project=BQ_PROJECT)
+schema_registry = SchemaRegistry(bq_client)
 
 # -------------------------------
 # Helpers (reuse from your raw code)
@@ -45,8 +49,7 @@ def get_dataset_schema(project_id, dataset_id, allowed_tables):
         if not table.strip():
             continue
         table_ref = bq_client.dataset(dataset_id, project=project_id).table(table)
-        table_obj = bq_client.get_table(table_ref)
-        schema_map[table] = [field.name for field in table_obj.schema]
+        schema_map[table] = schema_registry.get(table_ref).field_names
     return schema_map
 
 def build_prompt(schema_map):
@@ -115,7 +118,8 @@ def insert_into_bigquery(project_id, dataset_id, schema_map, extracted_data):
     for table, fields in schema_map.items():
         row = {}
         table_ref = bq_client.dataset(dataset_id, project=project_id).table(table)
-        table_obj = bq_client.get_table(table_ref)
+        table_schema = schema_registry.get(table_ref)
+        table_fields = table_schema.fields
 
         for field in fields:
             if field in skip_fields:
@@ -130,7 +134,7 @@ def insert_into_bigquery(project_id, dataset_id, schema_map, extracted_data):
             else:
                 value = extracted_data.get(field, None)
 
-            schema_field = next((f for f in table_obj.schema if f.name == field), None)
+            schema_field = table_fields.get(field)
             if not schema_field:
                 continue
 
@@ -185,8 +189,19 @@ def insert_into_bigquery(project_id, dataset_id, schema_map, extracted_data):
         print(f"   ➤ Table: {project_id}.{dataset_id}.{table}")
         print(f"   ➤ Row data: {row}")
 
+        if bq_upsert.can_upsert(table_schema.table):
+            # Upsert on startup_id (+ founder_id) so reprocessing keeps one row per startup
+            try:
+                bq_upsert.upsert_rows(bq_client, table_schema.table, [row])
+                print(f"✅ Merged into {table}")
+            except Exception as e:
+                schema_registry.invalidate(table_ref)
+                print(f"❌ Merge error in {table}: {e}")
+            continue
+
         errors = bq_client.insert_rows_json(table_ref, [row])
         if errors:
+            schema_registry.invalidate(table_ref)
             print(f"❌ Insert error in {table}: {errors}")
         else:
             print(f"✅ Inserted into {table}")
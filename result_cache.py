@@ -0,0 +1,102 @@
+"""Read-through cache for pages rendered from BigQuery.
+
+Entries are keyed by page namespace and startup_id, expire after a TTL and are
+dropped early when the job for that startup completes (see JobStatusHub
+listeners in app.py). The default backend is an in-process LRU; any object
+with ``get(key)``, ``set(key, value, ttl_seconds)`` and ``delete(key)`` (e.g. a
+Memorystore/Redis wrapper) can be passed instead.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL_SECONDS = int(os.environ.get("RESULT_CACHE_TTL_SECONDS", "900"))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "512"))
+
+
+class LRUBackend:
+    """Thread-safe in-process LRU store with per-entry expiry."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl_seconds):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ResultCache:
+    """Read-through cache keyed by (namespace, startup_id) with hit/miss counters."""
+
+    def __init__(self, backend=None, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.backend = backend if backend is not None else LRUBackend()
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._namespaces = set()
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @staticmethod
+    def _key(namespace, startup_id):
+        return f"{namespace}:{startup_id}"
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get_or_load(self, namespace, startup_id, loader):
+        """Return the cached value or call loader(); None results are not cached."""
+        with self._lock:
+            self._namespaces.add(namespace)
+        key = self._key(namespace, startup_id)
+        value = self.backend.get(key)
+        if value is not None:
+            self._count("hits")
+            return value
+
+        self._count("misses")
+        value = loader()
+        if value is not None:
+            self.backend.set(key, value, self.ttl_seconds)
+        return value
+
+    def invalidate(self, startup_id):
+        """Drop every cached page for startup_id."""
+        with self._lock:
+            namespaces = list(self._namespaces)
+            self._counters["invalidations"] += 1
+        for namespace in namespaces:
+            self.backend.delete(self._key(namespace, startup_id))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        if hasattr(self.backend, "__len__"):
+            stats["entries"] = len(self.backend)
+        return stats
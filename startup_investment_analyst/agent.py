@@ -7,11 +7,9 @@ from datetime import datetime
 from google.adk import Agent
 from google.adk.agents import ParallelAgent, SequentialAgent
 from google.adk.tools import FunctionTool
-from google.cloud import bigquery
-from google.cloud import storage
 from google.genai import types
 
-from .shared_libraries import constants
+from .shared_libraries import clients, constants
 from .sub_agents.checker.agent import checker_agent
 from .sub_agents.financial.agent import financial_agent
 from .sub_agents.market_intel.agent import market_intel_agent
@@ -27,18 +25,37 @@ from .sub_agents.synthesis.agent import synthesis_agent
 def insert_into_bigquery(table_id: str, rows_to_insert: list[dict]) -> dict:
     """
     Inserts a list of dictionary rows into a BigQuery table.
+    Rows are upserted on startup_id, so re-running an analysis replaces the
+    startup's previous row instead of adding another one.
     - table_id: The full ID of the table (e.g., "project.dataset.table").
     - rows_to_insert: A list of dictionaries, where each key is a column name.
     """
+    # bq_upsert pulls in google.cloud.bigquery; keep it off the agent's import path
+    from .shared_libraries import bq_upsert
+
     try:
-        bigquery_client = bigquery.Client()
-        errors = bigquery_client.insert_rows_json(table_id, rows_to_insert)
+        bigquery_client = clients.get_bigquery_client()
+        schema_registry = clients.get_schema_registry()
+        if bigquery_client is None or schema_registry is None:
+            return {"status": "error", "message": "BigQuery client not initialized."}
+        # Cached table schema; unknown fields are dropped on both write paths
+        table_schema = schema_registry.get(table_id)
+        allowed = table_schema.fields
+        rows = [{k: v for k, v in row.items() if k in allowed} for row in rows_to_insert]
+        if bq_upsert.can_upsert(table_schema.table):
+            bq_upsert.upsert_rows(bigquery_client, table_schema.table, rows)
+            return {"status": "success", "message": f"Successfully upserted {len(rows)} rows."}
+        errors = bigquery_client.insert_rows_json(table_schema.table, rows)
         if not errors:
-            return {"status": "success", "message": f"Successfully inserted {len(rows_to_insert)} rows."}
+            return {"status": "success", "message": f"Successfully inserted {len(rows)} rows."}
         else:
             return {"status": "error", "message": f"Encountered errors: {errors}"}
     except Exception as e:
         print(f"Error inserting rows into BigQuery: {e}")
+        # The table may have changed; fetch its schema again on the next call
+        registry = clients.get_schema_registry()
+        if registry is not None:
+            registry.invalidate(table_id)
         return {"status": "error", "message": str(e)}
 
 bigquery_writer_tool = FunctionTool(
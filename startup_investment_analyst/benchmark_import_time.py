@@ -0,0 +1,76 @@
+"""
+Cold-import budget for startup_investment_analyst.agent.
+
+Each run uses a fresh interpreter with ``-X importtime``. google.adk and
+google.genai are imported first, so the measured cumulative time of
+startup_investment_analyst.agent only covers this package and whatever it pulls
+in beyond the framework. The benchmark fails if the best of --runs exceeds the
+budget, or if importing the agent loads a module that should only load on first
+use (BigQuery, Cloud Storage, BeautifulSoup, lxml, pyahocorasick).
+
+Usage: python -m startup_investment_analyst.benchmark_import_time [--budget-ms 500] [--runs 3]
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+# Loaded lazily by the tools and clients; importing the agent must not pull them in
+DEFERRED_MODULES = ("google.cloud.bigquery", "google.cloud.storage", "bs4", "lxml", "ahocorasick")
+
+PROBE = """
+import sys
+import google.adk, google.adk.agents, google.adk.tools, google.genai.types
+before = set(sys.modules)
+import startup_investment_analyst.agent
+print("NEW_MODULES=" + __import__("json").dumps(sorted(set(sys.modules) - before)))
+"""
+
+
+def measure_once():
+    """Return (cumulative_ms, newly imported module names) for one cold import."""
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=repo_root, capture_output=True, text=True, check=True,
+    )
+    cumulative_ms = None
+    for line in proc.stderr.splitlines():
+        # "import time:      self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == "startup_investment_analyst.agent":
+            cumulative_ms = int(parts[1].strip()) / 1000
+    new_modules = []
+    for line in proc.stdout.splitlines():
+        if line.startswith("NEW_MODULES="):
+            new_modules = json.loads(line[len("NEW_MODULES="):])
+    return cumulative_ms, new_modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-import budget for the agent package.")
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("IMPORT_BUDGET_MS", "500")))
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if importlib.util.find_spec("google.adk") is None:
+        print("google-adk is not installed; skipping import-time benchmark.")
+        return
+
+    best_ms, new_modules = None, []
+    for _ in range(args.runs):
+        cumulative_ms, new_modules = measure_once()
+        best_ms = cumulative_ms if best_ms is None else min(best_ms, cumulative_ms)
+
+    eager = [m for m in new_modules if any(m == d or m.startswith(d + ".") for d in DEFERRED_MODULES)]
+    print(f"startup_investment_analyst.agent: {best_ms:.1f}ms (best of {args.runs}, budget {args.budget_ms:.0f}ms)")
+    print(f"{len(new_modules)} modules imported beyond google.adk")
+    assert not eager, f"imported eagerly: {eager[:10]}"
+    assert best_ms <= args.budget_ms, f"cold import {best_ms:.1f}ms exceeds budget {args.budget_ms:.0f}ms"
+
+
+if __name__ == "__main__":
+    main()
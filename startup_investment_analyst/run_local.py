@@ -1,7 +1,6 @@
 import os
 import sys
-from google.cloud import bigquery
-from .shared_libraries import constants
+from .shared_libraries import bq_queries, clients, constants
 
 # Ensure credentials are set
 # if constants.SERVICE_ACCOUNT_PATH:
@@ -9,28 +8,24 @@ from .shared_libraries import constants
 
 
 def check_startup(startup_id: str):
-	client = bigquery.Client(project=constants.PROJECT_ID)
+	client = clients.get_bigquery_client()
+	if client is None:
+		raise RuntimeError("BigQuery client could not be initialized")
 	missing = {}
 	present_tables = []
 
-	for key, table in constants.TABLES.items():
-		query = f"""
-			SELECT * FROM `{constants.PROJECT_ID}.{constants.BQ_DATASET}.{table}`
-			WHERE startup_id = @startup_id
-			LIMIT 1
-		"""
-		job = client.query(query, job_config=bigquery.QueryJobConfig(
-			query_parameters=[bigquery.ScalarQueryParameter("startup_id", "STRING", startup_id)]
-		))
-		rows = [dict(r) for r in job.result()]
-		if rows:
+	rows, errors, timings_ms = bq_queries.fetch_startup_rows(client, startup_id)
+	for table in constants.TABLES.values():
+		if table in errors:
+			raise errors[table]
+		if table in rows:
 			present_tables.append(table)
-			row = rows[0]
+			row = rows[table]
 			missing_fields = [k for k, v in row.items() if v in (None, "") or (isinstance(v, list) and len(v) == 0)]
 			if missing_fields:
 				missing[table] = missing_fields
 
-	return {"startup_id": startup_id, "present_tables": present_tables, "missing_fields": missing}
+	return {"startup_id": startup_id, "present_tables": present_tables, "missing_fields": missing, "timings_ms": timings_ms}
 
 
 if __name__ == "__main__":
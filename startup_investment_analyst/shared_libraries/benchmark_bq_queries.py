@@ -0,0 +1,71 @@
+"""
+Wall-clock benchmark for fetching a startup's rows from every metrics table.
+
+A fake BigQuery client sleeps per query. The tables are read one after another
+(the loop checker_fetch_data_runner used to run) and then with
+bq_queries.fetch_startup_rows.
+
+Usage: python -m startup_investment_analyst.shared_libraries.benchmark_bq_queries [seconds_per_query]
+"""
+
+import re
+import sys
+import time
+
+from . import bq_queries, constants
+
+TABLE_RE = re.compile(r"FROM `[^`]+\.([^`.]+)`")
+
+
+class FakeQueryJob:
+    def __init__(self, table_name, latency):
+        self.table_name = table_name
+        self.latency = latency
+
+    def result(self):
+        time.sleep(self.latency)
+        if self.table_name == "product_tech_metrics":
+            return []  # a table without a row for this startup
+        return [{"startup_id": "s1", "table": self.table_name, "value": None}]
+
+
+class FakeBigQueryClient:
+    latency = 0.4
+
+    def query(self, sql, job_config=None):
+        return FakeQueryJob(TABLE_RE.search(sql).group(1), self.latency)
+
+
+def serial_fetch(client, startup_id):
+    rows = {}
+    for table_name in constants.TABLES.values():
+        result = list(client.query(bq_queries.latest_row_sql(table_name)).result())
+        if result:
+            rows[table_name] = result[0]
+    return rows
+
+
+def main():
+    FakeBigQueryClient.latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.4
+    client = FakeBigQueryClient()
+    # bq_queries imports google.cloud.bigquery lazily; load it up front so only queries are timed
+    import google.cloud.bigquery  # noqa: F401
+
+    start = time.perf_counter()
+    serial = serial_fetch(client, "s1")
+    serial_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows, errors, timings_ms = bq_queries.fetch_startup_rows(client, "s1")
+    concurrent_s = time.perf_counter() - start
+
+    assert rows == serial and not errors
+    assert list(timings_ms) == list(constants.TABLES.values())
+    print(f"{len(constants.TABLES)} tables, {FakeBigQueryClient.latency:.2f}s per query")
+    print(f"serial:     {serial_s:.2f}s")
+    print(f"concurrent: {concurrent_s:.2f}s  per table (ms): {timings_ms}")
+    assert concurrent_s < serial_s / 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Bytes scanned by the per-startup read before and after the table layout migration.
+
+FakeBigQueryClient keeps rows in memory and models storage as blocks of
+BLOCK_ROWS rows. Unclustered tables keep rows in arrival order, so every lookup
+reads every block. Clustered tables keep rows sorted by their clustering
+columns, so a lookup only reads the blocks whose key range holds the startup.
+The fake's dry runs report that pruned figure. Real BigQuery dry runs report
+the unpruned upper bound for clustered tables; run
+``table_schemas.py --estimate`` for billed numbers.
+
+The script loads every table with several reprocessing rounds of rows, runs
+ensure_tables(apply=True) and compares query_bytes before and after. It then
+checks that a table with rows in its streaming buffer is skipped, not migrated.
+
+Usage: python -m startup_investment_analyst.shared_libraries.benchmark_table_layout [startups] [rounds]
+"""
+
+import json
+import re
+import sys
+
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+from . import table_schemas
+
+BLOCK_ROWS = 256
+LOOKUP_RE = re.compile(r"FROM `([^`]+)` WHERE startup_id = @startup_id")
+INSERT_RE = re.compile(r"INSERT INTO `([^`]+)` SELECT \* FROM `([^`]+)`")
+RENAME_RE = re.compile(r"ALTER TABLE `([^`]+)` RENAME TO `([^`]+)`")
+
+
+class FakeQueryJob:
+    def __init__(self, total_bytes_processed=0):
+        self.total_bytes_processed = total_bytes_processed
+
+    def result(self):
+        return []
+
+
+class FakeBigQueryClient:
+    def __init__(self):
+        self.tables = {}
+        self.rows = {}
+
+    def get_table(self, table_id):
+        if table_id not in self.tables:
+            raise NotFound(f"Table {table_id} not found")
+        return self.tables[table_id]
+
+    def create_table(self, table):
+        table_id = f"{table.project}.{table.dataset_id}.{table.table_id}"
+        self.tables[table_id] = table
+        self.rows[table_id] = []
+        return table
+
+    def update_table(self, table, fields):
+        return table
+
+    def _blocks(self, table_id):
+        rows = self.rows[table_id]
+        cluster = self.tables[table_id].clustering_fields
+        if cluster:
+            rows = sorted(rows, key=lambda r: tuple(r.get(c) or "" for c in cluster))
+        return [rows[i:i + BLOCK_ROWS] for i in range(0, len(rows), BLOCK_ROWS)]
+
+    def _scanned(self, table_id, startup_id):
+        clustered = self.tables[table_id].clustering_fields
+        scanned = 0
+        for block in self._blocks(table_id):
+            ids = [r["startup_id"] for r in block]
+            if clustered and not (min(ids) <= startup_id <= max(ids)):
+                continue  # block pruned by its clustering key range
+            scanned += sum(len(json.dumps(r)) for r in block)
+        return scanned
+
+    def query(self, sql, job_config=None):
+        lookup = LOOKUP_RE.search(sql)
+        if lookup:
+            startup_id = job_config.query_parameters[0].value
+            return FakeQueryJob(self._scanned(lookup.group(1), startup_id))
+        insert = INSERT_RE.search(sql)
+        if insert:
+            self.rows[insert.group(1)].extend(self.rows[insert.group(2)])
+            return FakeQueryJob()
+        rename = RENAME_RE.search(sql)
+        if rename:
+            old_id = rename.group(1)
+            new_id = f"{old_id.rsplit('.', 1)[0]}.{rename.group(2)}"
+            old = self.tables.pop(old_id)
+            table = bigquery.Table(new_id, schema=old.schema)
+            table.time_partitioning = old.time_partitioning
+            table.clustering_fields = old.clustering_fields
+            self.tables[new_id] = table
+            self.rows[new_id] = self.rows.pop(old_id)
+            return FakeQueryJob()
+        raise ValueError(f"unsupported query: {sql}")
+
+
+def load_unclustered(client, startups, rounds):
+    for spec in table_schemas.TABLE_SPECS.values():
+        client.create_table(bigquery.Table(spec.table_id, schema=spec.schema()))
+        for r in range(rounds):  # every reprocessing round appended another row per startup
+            for i in range(startups):
+                row = {c: f"{c} value {i}-{r}" for c in spec.columns}
+                row["startup_id"] = f"Startup{i:05d}_20250101_120000"
+                if "founder_id" in row:
+                    row["founder_id"] = f"{row['startup_id']}_founder_1"
+                client.rows[spec.table_id].append(row)
+
+
+def lookup_bytes(client, startup_id):
+    return {
+        key: table_schemas.query_bytes(client, table_schemas.lookup_sql(spec), startup_id)
+        for key, spec in table_schemas.TABLE_SPECS.items()
+    }
+
+
+def main():
+    startups = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    client = FakeBigQueryClient()
+    load_unclustered(client, startups, rounds)
+    startup_id = f"Startup{startups // 2:05d}_20250101_120000"
+
+    before = lookup_bytes(client, startup_id)
+    steps = table_schemas.ensure_tables(client, apply=True)
+    assert {action for _, _, action in steps} == {"migrate"}
+    assert {action for _, _, action in table_schemas.plan(client)} == {"ok"}, "layout must be in place after apply"
+    after = lookup_bytes(client, startup_id)
+
+    print(f"{startups} startups x {rounds} rounds per table")
+    for key in table_schemas.TABLE_SPECS:
+        print(f"{key:22s} {before[key]:>10,d} -> {after[key]:>8,d} bytes per lookup")
+    total_before, total_after = sum(before.values()), sum(after.values())
+    print(f"{'results page total':22s} {total_before:>10,d} -> {total_after:>8,d} bytes ({total_before / total_after:.0f}x less)")
+    assert total_after * 10 < total_before
+
+    # A table still holding streamed rows is left alone: BigQuery would refuse the rename half-way
+    client = FakeBigQueryClient()
+    load_unclustered(client, 10, 1)
+    streamed = table_schemas.TABLE_SPECS["company_metrics"]
+    client.tables[streamed.table_id]._properties["streamingBuffer"] = {
+        "estimatedRows": "5", "oldestEntryTime": "1735732800000",
+    }
+    table_schemas.ensure_tables(client, apply=True)
+    actions = {spec.name: action for spec, _, action in table_schemas.plan(client)}
+    assert actions.pop(streamed.name) == "migrate" and set(actions.values()) == {"ok"}, actions
+    assert not any("__layout_" in table_id for table_id in client.tables), "nothing created for the skipped table"
+
+
+if __name__ == "__main__":
+    main()
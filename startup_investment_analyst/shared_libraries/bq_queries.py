@@ -0,0 +1,60 @@
+"""Concurrent per-startup reads across the financial_analysis tables.
+
+Each table's ``WHERE startup_id = @startup_id LIMIT 1`` query is submitted and
+awaited on its own thread. Fetching every table then takes about as long as
+the slowest single query instead of the sum of all of them. Per-table wall
+time is recorded so slow tables show up in the logs. google.cloud.bigquery is
+imported on first query so importing the checker tool stays cheap.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import constants
+
+
+def latest_row_sql(table_name):
+    return f"""
+        SELECT * FROM `{constants.PROJECT_ID}.{constants.BQ_DATASET}.{table_name}`
+        WHERE startup_id = @startup_id
+        LIMIT 1
+    """
+
+
+def _fetch_one(client, table_name, job_config):
+    start = time.perf_counter()
+    try:
+        job = client.query(latest_row_sql(table_name), job_config=job_config)
+        rows = [dict(r) for r in job.result()]
+        return table_name, (rows[0] if rows else None), None, time.perf_counter() - start
+    except Exception as e:
+        return table_name, None, e, time.perf_counter() - start
+
+
+def fetch_startup_rows(client, startup_id, table_names=None):
+    """
+    Fetch one row per table for startup_id, all tables concurrently.
+    Returns (rows, errors, timings_ms): rows maps table -> row dict for tables
+    that have one, errors maps table -> exception, timings_ms maps every table
+    -> wall time in milliseconds. Dicts follow the order of table_names.
+    """
+    table_names = list(table_names or constants.TABLES.values())
+    rows, errors, timings_ms = {}, {}, {}
+    if not table_names:
+        return rows, errors, timings_ms
+
+    # Imported here, once, rather than concurrently from every worker thread
+    from google.cloud import bigquery
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ScalarQueryParameter("startup_id", "STRING", startup_id)]
+    )
+    with ThreadPoolExecutor(max_workers=len(table_names)) as executor:
+        results = executor.map(lambda name: _fetch_one(client, name, job_config), table_names)
+        for table_name, row, error, elapsed in results:
+            timings_ms[table_name] = round(elapsed * 1000, 1)
+            if error is not None:
+                errors[table_name] = error
+            elif row is not None:
+                rows[table_name] = row
+    return rows, errors, timings_ms
@@ -0,0 +1,105 @@
+"""Process-wide BigQuery and Cloud Storage clients.
+
+Clients are built on first use, not at import time, and are then shared by
+every tool and agent in the process. Each client has its own authorized HTTP
+session with a larger connection pool than the requests default of 10. Calls
+reuse warm TLS connections, and concurrent fan-out (see bq_queries) does not
+exhaust the pool.
+
+A client that fails to build (e.g. missing credentials) is reported and
+``None`` is returned; the next call tries again. The schema registry shared by
+BigQuery writers is built the same way, on top of the BigQuery client.
+
+Environment:
+    HTTP_POOL_CONNECTIONS  host pools kept per session (default 8)
+    HTTP_POOL_MAXSIZE      connections kept per host (default 32)
+"""
+
+import os
+import threading
+
+from . import constants
+
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "8"))
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "32"))
+
+_lock = threading.RLock()
+_clients = {}
+
+
+def _pooled_session(scopes):
+    """AuthorizedSession over application default credentials with a tuned pool."""
+    import google.auth
+    from google.auth.transport.requests import AuthorizedSession
+    from requests.adapters import HTTPAdapter
+
+    credentials, _ = google.auth.default(scopes=scopes)
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _build_bigquery():
+    from google.cloud import bigquery
+
+    session = _pooled_session(bigquery.Client.SCOPE)
+    return bigquery.Client(project=constants.PROJECT_ID, credentials=session.credentials, _http=session)
+
+
+def _build_storage():
+    from google.cloud import storage
+
+    if os.environ.get("STORAGE_EMULATOR_HOST"):
+        # The emulator needs the library's anonymous credentials, not ADC
+        return storage.Client(project=constants.PROJECT_ID)
+    session = _pooled_session(storage.Client.SCOPE)
+    return storage.Client(project=constants.PROJECT_ID, credentials=session.credentials, _http=session)
+
+
+def _build_schema_registry():
+    from .schema_registry import SchemaRegistry
+
+    client = get_bigquery_client()
+    if client is None:
+        raise RuntimeError("BigQuery client not initialized")
+    return SchemaRegistry(client)
+
+
+_BUILDERS = {
+    "bigquery": _build_bigquery,
+    "storage": _build_storage,
+    "schema_registry": _build_schema_registry,
+}
+
+
+def _get(kind):
+    client = _clients.get(kind)
+    if client is not None:
+        return client
+    with _lock:  # reentrant: the schema registry builds the BigQuery client
+        client = _clients.get(kind)
+        if client is None:
+            try:
+                client = _BUILDERS[kind]()
+            except Exception as e:
+                print(f"Error initializing {kind} client: {e}")
+                return None
+            _clients[kind] = client
+    return client
+
+
+def get_bigquery_client():
+    """Shared bigquery.Client, or None if it cannot be created."""
+    return _get("bigquery")
+
+
+def get_storage_client():
+    """Shared storage.Client, or None if it cannot be created."""
+    return _get("storage")
+
+
+def get_schema_registry():
+    """Shared SchemaRegistry over the BigQuery client, or None if it cannot be created."""
+    return _get("schema_registry")
@@ -0,0 +1,75 @@
+"""Run-scoped cache of the startup rows fetched by the checker stage.
+
+The checker stores every table row it read under the ``temp:`` session state
+key, which lives for one invocation only. The parallel analysis tools then read
+company_metrics and friends from there instead of querying BigQuery again. A
+miss falls back to BigQuery, and hits and misses are counted per process.
+
+Rows are made JSON-safe before they go into state (Decimal -> float,
+date/datetime -> ISO string, bytes -> base64) so the session can be persisted.
+"""
+
+import base64
+import datetime
+import decimal
+import threading
+
+STATE_KEY = "temp:startup_data"
+
+_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0}
+
+
+def _json_safe(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    return value
+
+
+def store(tool_context, startup_id, rows, queried_tables):
+    """
+    Record the rows fetched for startup_id. rows maps table -> row; tables in
+    queried_tables without a row are stored as known-empty, so readers can skip
+    BigQuery for them too.
+    """
+    tool_context.state[STATE_KEY] = {
+        "startup_id": startup_id,
+        "tables": {table: _json_safe(rows[table]) if table in rows else None for table in queried_tables},
+    }
+
+
+def lookup(tool_context, startup_id, table_name, columns=None):
+    """
+    Return (hit, row). On a hit, row is the stored row restricted to columns
+    ({} if the checker found no row). On a miss, row is None and the caller
+    queries BigQuery.
+    """
+    context = None
+    try:
+        context = tool_context.state.get(STATE_KEY)
+    except Exception:
+        pass
+    hit = bool(context) and context.get("startup_id") == startup_id and table_name in context.get("tables", {})
+    with _lock:
+        _counters["hits" if hit else "misses"] += 1
+    if not hit:
+        return False, None
+
+    row = context["tables"][table_name] or {}
+    if columns is not None:
+        row = {column: row.get(column) for column in columns} if row else {}
+    return True, row
+
+
+def stats():
+    """Context hits (BigQuery queries avoided) and misses for this process."""
+    with _lock:
+        return {"queries_avoided": _counters["hits"], "queries_made": _counters["misses"]}
@@ -0,0 +1,82 @@
+"""Process-wide cache of BigQuery table schemas.
+
+Schemas are fetched with ``client.get_table`` at most once per table per TTL,
+bounded by an LRU size limit, and indexed by column name so callers can look a
+``SchemaField`` up directly instead of scanning ``table.schema``.
+
+The same module is shipped with each deployable unit that writes to or reads
+from BigQuery (web app, refiner-agent, process-audio-pitch-deck,
+startup_investment_analyst); keep the copies identical.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL_SECONDS = int(os.environ.get("BQ_SCHEMA_TTL_SECONDS", "600"))
+DEFAULT_MAX_TABLES = int(os.environ.get("BQ_SCHEMA_MAX_TABLES", "64"))
+
+
+def table_key(table_ref):
+    """Normalize a table id string, TableReference or Table to 'project.dataset.table'."""
+    if isinstance(table_ref, str):
+        return table_ref
+    return f"{table_ref.project}.{table_ref.dataset_id}.{table_ref.table_id}"
+
+
+class TableSchema:
+    """A fetched Table plus a name -> SchemaField index."""
+
+    def __init__(self, table):
+        self.table = table
+        self.fields = {field.name: field for field in table.schema}
+
+    @property
+    def field_names(self):
+        return list(self.fields)
+
+    @property
+    def descriptions(self):
+        return {name: field.description for name, field in self.fields.items()}
+
+
+class SchemaRegistry:
+    """TTL + LRU cache of TableSchema objects for one BigQuery client."""
+
+    def __init__(self, client, ttl_seconds=DEFAULT_TTL_SECONDS, max_tables=DEFAULT_MAX_TABLES):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.max_tables = max_tables
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, TableSchema)
+
+    def get(self, table_ref):
+        """Return the TableSchema for table_ref, fetching it on a miss or after expiry."""
+        key = table_key(table_ref)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        schema = TableSchema(self.client.get_table(table_ref))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, schema)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_tables:
+                self._entries.popitem(last=False)
+        return schema
+
+    def invalidate(self, table_ref=None):
+        """Drop one table's cached schema, or every table when table_ref is None."""
+        with self._lock:
+            if table_ref is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(table_key(table_ref), None)
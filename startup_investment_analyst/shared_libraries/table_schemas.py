@@ -0,0 +1,296 @@
+"""Declared layout of the financial_analysis tables, with a create/migrate CLI.
+
+Every reader filters on ``startup_id``, so each table is partitioned by
+ingestion time (DAY) and clustered on ``startup_id``. founder_metrics is
+clustered on ``(startup_id, founder_id)``. With clustering, BigQuery only reads
+the blocks holding the requested startup instead of scanning the whole table.
+
+Existing tables cannot be re-partitioned in place. They are migrated by
+creating a laid-out copy, copying the rows, renaming the old table to a
+timestamped backup and renaming the copy into place. Run migrations during a
+quiet period: rows written during the copy stay in the backup. BigQuery cannot
+rename a table whose streaming buffer still holds rows, so a table that
+recently received streaming inserts (e.g. the refiner's small appends) is
+skipped until the buffer has drained. Stop the writers and wait; that can take
+up to 90 minutes.
+
+Usage:
+    python -m startup_investment_analyst.shared_libraries.table_schemas [--apply] [--tables t1,t2]
+        [--estimate STARTUP_ID]
+"""
+
+import argparse
+import datetime
+
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+from . import constants
+
+PARTITION_TYPE = bigquery.TimePartitioningType.DAY
+
+
+class TableSpec:
+    """Name, clustering columns and the declared columns (SchemaFields) of one table."""
+
+    def __init__(self, name, cluster_fields=("startup_id",), fields=()):
+        self.name = name
+        self.cluster_fields = list(cluster_fields)
+        self.fields = list(fields)
+
+    @property
+    def table_id(self):
+        return f"{constants.PROJECT_ID}.{constants.BQ_DATASET}.{self.name}"
+
+    @property
+    def columns(self):
+        return [field.name for field in self.fields]
+
+    def schema(self):
+        """Schema used when the table does not exist yet; existing tables keep theirs."""
+        return list(self.fields)
+
+
+def _string(name, mode="NULLABLE"):
+    return bigquery.SchemaField(name, "STRING", mode=mode)
+
+
+def _float(name):
+    return bigquery.SchemaField(name, "FLOAT")
+
+
+def _integer(name):
+    return bigquery.SchemaField(name, "INTEGER")
+
+
+def _records(name, *fields):
+    return bigquery.SchemaField(name, "RECORD", mode="REPEATED", fields=fields)
+
+
+# Columns and types as in the live tables: the fields the checker prompt reads,
+# the numbers the financial and operational tools compute with, and the
+# text columns the refiner's map_to_tables writes from Document AI output.
+# Mirrors constants.TABLES plus the startups and final_deal_note tables read by the web app.
+TABLE_SPECS = {
+    "company_metrics": TableSpec(
+        constants.TABLES["company_metrics"],
+        fields=(
+            _string("startup_id"),
+            _string("company_name"),
+            _float("growth_rate"),
+            _records(
+                "funding_rounds",
+                _string("round_type"),
+                _float("amount"),
+                bigquery.SchemaField("date", "DATE"),
+            ),
+            _float("burn_rate"),
+            _float("profit_margin"),
+            _string("background_check"),
+            _float("customer_acquisition_cost"),
+            _string("geographical_locations", mode="REPEATED"),
+            _float("pe_ratio"),
+            _float("ebitda"),
+            _float("hiring_trend"),
+            _integer("team_size"),
+            _records(
+                "traffic_stats",
+                _string("metric_name"),
+                _float("value"),
+                bigquery.SchemaField("date", "DATE"),
+            ),
+            _float("app_store_rating"),
+            _float("play_store_rating"),
+            _float("amazon_store_rating"),
+            _float("capital_required"),
+            _records("social_media_followers", _string("platform"), _integer("followers_count")),
+            # Written by the refiner as extracted text
+            _string("current_userbase"),
+            _string("key_problems_solved"),
+            _string("capital_ask"),
+        ),
+    ),
+    "founder_metrics": TableSpec(
+        constants.TABLES["founder_metrics"],
+        cluster_fields=("startup_id", "founder_id"),
+        fields=[
+            _string(name)
+            for name in ("startup_id", "founder_id", "name", "background", "track_record", "domain_expertise",
+                         "linkedin_url")
+        ],
+    ),
+    "product_tech_metrics": TableSpec(
+        constants.TABLES["product_tech_metrics"],
+        fields=(
+            _string("startup_id"),
+            _string("product_name"),
+            _string("product_stage"),
+            _string("product_summary"),
+            _string("patents", mode="REPEATED"),
+            _string("usp"),
+            _integer("sku_count"),
+            _string("supply_chain_notes"),
+            _string("tech_stack", mode="REPEATED"),
+        ),
+    ),
+    "market_metrics": TableSpec(
+        constants.TABLES["market_metrics"],
+        fields=(
+            _string("startup_id"),
+            _string("startup_name"),
+            # Written by the refiner as extracted text ("$4.2B", "18% CAGR")
+            _string("total_addressable_market"),
+            _string("service_addressable_market"),
+            _string("market_growth_rate"),
+            _float("sustainability_score"),
+            _string("competitors", mode="REPEATED"),
+            _string("first_mover_advantage"),
+            _float("market_penetration"),
+        ),
+    ),
+    "startups": TableSpec(
+        "startups",
+        fields=(
+            _string("startup_id"),
+            _string("name"),
+            _string("headquarters"),
+            _string("founder"),
+            _integer("founded_year"),
+            bigquery.SchemaField("created_on", "DATE"),
+            _string("sector"),
+            _string("sub_sector"),
+            _string("linkedin_url"),
+            _string("website"),
+            _string("job_id"),
+        ),
+    ),
+    "final_deal_note": TableSpec("final_deal_note", fields=(_string("startup_id"), _string("summary"))),
+}
+
+
+def apply_layout(table, spec):
+    """Set ingestion-time partitioning and clustering on a bigquery.Table."""
+    table.time_partitioning = bigquery.TimePartitioning(type_=PARTITION_TYPE)
+    table.clustering_fields = spec.cluster_fields
+    return table
+
+
+def layout_action(table, spec):
+    """'create', 'migrate', 'recluster' or 'ok' for an existing Table (or None)."""
+    if table is None:
+        return "create"
+    partitioning = table.time_partitioning
+    if partitioning is None or partitioning.type_ != PARTITION_TYPE or partitioning.field is not None:
+        return "migrate"
+    if list(table.clustering_fields or []) != spec.cluster_fields:
+        return "recluster"
+    return "ok"
+
+
+def plan(client, specs=None):
+    """[(spec, table_or_None, action)] for the given TableSpecs (default: all)."""
+    steps = []
+    for spec in specs or TABLE_SPECS.values():
+        try:
+            table = client.get_table(spec.table_id)
+        except NotFound:
+            table = None
+        steps.append((spec, table, layout_action(table, spec)))
+    return steps
+
+
+def create_table(client, spec):
+    return client.create_table(apply_layout(bigquery.Table(spec.table_id, schema=spec.schema()), spec))
+
+
+def recluster_table(client, table, spec):
+    """Clustering can change in place; it applies to data written from then on."""
+    table.clustering_fields = spec.cluster_fields
+    return client.update_table(table, ["clustering_fields"])
+
+
+def migrate_table(client, table, spec):
+    """
+    Copy an existing table into a partitioned, clustered table of the same name. Returns the backup id.
+    Raises RuntimeError, before changing anything, while the table's streaming buffer holds rows.
+    """
+    buffer = table.streaming_buffer
+    if buffer is not None:
+        raise RuntimeError(
+            f"{spec.table_id} has about {buffer.estimated_rows} rows in its streaming buffer "
+            f"(oldest from {buffer.oldest_entry_time}); BigQuery cannot rename it until the buffer drains. "
+            "Stop streaming inserts into it and retry later (up to 90 minutes)."
+        )
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d%H%M%S")
+    staging_id = f"{spec.table_id}__layout_{stamp}"
+    backup_name = f"{spec.name}__backup_{stamp}"
+
+    client.create_table(apply_layout(bigquery.Table(staging_id, schema=table.schema), spec))
+    client.query(f"INSERT INTO `{staging_id}` SELECT * FROM `{spec.table_id}`").result()
+    client.query(f"ALTER TABLE `{spec.table_id}` RENAME TO `{backup_name}`").result()
+    client.query(f"ALTER TABLE `{staging_id}` RENAME TO `{spec.name}`").result()
+    return f"{constants.PROJECT_ID}.{constants.BQ_DATASET}.{backup_name}"
+
+
+def ensure_tables(client, specs=None, apply=False):
+    """Print the plan and, with apply=True, carry it out. Returns the plan."""
+    steps = plan(client, specs)
+    for spec, table, action in steps:
+        print(f"{spec.table_id}: {action}")
+        if not apply or action == "ok":
+            continue
+        if action == "create":
+            create_table(client, spec)
+        elif action == "recluster":
+            recluster_table(client, table, spec)
+        else:
+            try:
+                backup_id = migrate_table(client, table, spec)
+            except RuntimeError as e:
+                print(f"  skipped: {e}")
+                continue
+            print(f"  migrated; previous table kept as {backup_id}")
+    return steps
+
+
+def lookup_sql(spec):
+    """The per-startup read every page and tool issues against this table."""
+    return f"SELECT * FROM `{spec.table_id}` WHERE startup_id = @startup_id LIMIT 1"
+
+
+def query_bytes(client, sql, startup_id, dry_run=True):
+    """
+    Bytes processed by a startup_id-parameterised query. A dry run is free but
+    reports the unpruned upper bound for clustered tables; dry_run=False runs the
+    query and returns what was actually processed.
+    """
+    job_config = bigquery.QueryJobConfig(
+        dry_run=dry_run,
+        use_query_cache=False,
+        query_parameters=[bigquery.ScalarQueryParameter("startup_id", "STRING", startup_id)],
+    )
+    job = client.query(sql, job_config=job_config)
+    if not dry_run:
+        job.result()
+    return job.total_bytes_processed or 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create or migrate financial_analysis tables to the declared layout.")
+    parser.add_argument("--apply", action="store_true", help="carry out the plan (default: print it only)")
+    parser.add_argument("--tables", help="comma-separated subset of: " + ", ".join(TABLE_SPECS))
+    parser.add_argument("--estimate", metavar="STARTUP_ID", help="report bytes processed by the per-startup read")
+    args = parser.parse_args(argv)
+
+    specs = [TABLE_SPECS[key] for key in args.tables.split(",")] if args.tables else None
+    client = bigquery.Client(project=constants.PROJECT_ID)
+    ensure_tables(client, specs, apply=args.apply)
+
+    if args.estimate:
+        for spec in specs or TABLE_SPECS.values():
+            scanned = query_bytes(client, lookup_sql(spec), args.estimate, dry_run=False)
+            print(f"{spec.name}: {scanned} bytes processed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 import os
 from google.adk import Agent
-from google.cloud import bigquery
 from ...shared_libraries import constants
 from . import prompt
 
@@ -0,0 +1,166 @@
+"""
+Harness for researcher_tool's concurrent fan-out against local HTTP stand-ins.
+
+One server plays DuckDuckGo's HTML endpoint and returns canned results. Six
+more play article sites (one port each, so each is its own host for the rate
+limiter) and serve pages with a title and meta description. Latency is
+injected on every response. The last result of every search is one shared
+article. Four checks:
+
+    fan-out   all searches and fetches complete well under the old serial time
+    pacing    searches to the one search host respect the token bucket
+    deadline  a site that never answers in time leaves a partial result
+    batch     research_batch searches each distinct query and fetches each
+              distinct URL once across the cohort
+
+Usage: python -m startup_investment_analyst.sub_agents.researcher.test_researcher_fanout
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+from ...tools import bq_connector, http_cache, http_fetch
+
+SEARCH_LATENCY = 0.3
+ARTICLE_LATENCY = 0.3
+OLD_SEARCH_SLEEP = 0.5  # the fixed sleep researcher_tool used between searches
+SITES = 6
+
+
+class StandIn(BaseHTTPRequestHandler):
+    latency = 0.0
+    arrivals = None  # list of monotonic arrival times, set per server
+    article_ports = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body):
+        time.sleep(self.latency)
+        data = body.encode("utf-8")
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client gave up at its deadline
+
+    def do_POST(self):
+        self.arrivals.append(time.monotonic())
+        length = int(self.headers.get("Content-Length", 0))
+        query = parse_qs(self.rfile.read(length).decode("utf-8")).get("q", [""])[0]
+        slug = query.replace(" ", "-")
+        links = []
+        for i in range(4):
+            port = self.article_ports[i % len(self.article_ports)]
+            path = "common" if i == 3 else f"{slug}-{i}"
+            links.append(
+                f'<div class="result"><h2 class="result__title">'
+                f'<a href="http://127.0.0.1:{port}/article/{path}">{query} result {i}</a></h2></div>'
+            )
+        self._send("<html><body>" + "".join(links) + "</body></html>")
+
+    def do_GET(self):
+        self.arrivals.append(time.monotonic())
+        name = self.path.rsplit("/", 1)[-1]
+        self._send(
+            f"<html><head><title>{name}</title>"
+            f'<meta name="description" content="Story about {name}"></head>'
+            f"<body><p>Body of {name}</p></body></html>"
+        )
+
+
+def start_server(latency):
+    handler = type("Handler", (StandIn,), {"latency": latency, "arrivals": []})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, handler
+
+
+def tool_context(startup_id="s1"):
+    return SimpleNamespace(user_content=SimpleNamespace(parts=[SimpleNamespace(text=startup_id)]))
+
+
+def run_tool():
+    http_fetch.rate_limiter = http_fetch.HostRateLimiter()
+    start = time.perf_counter()
+    output = bq_connector.researcher_tool(tool_context())
+    return output, time.perf_counter() - start
+
+
+def main():
+    sites = [start_server(ARTICLE_LATENCY) for _ in range(SITES)]
+    StandIn.article_ports = [server.server_address[1] for server, _ in sites]
+    search_server, search_handler = start_server(SEARCH_LATENCY)
+    bq_connector.DUCKDUCKGO_HTML = f"http://127.0.0.1:{search_server.server_address[1]}/html/"
+    bq_connector._get_company_name = lambda startup_id: "Acme"
+    http_cache.RESEARCH_CACHE_ENABLED = False  # every run must reach the stand-ins
+
+    queries = len(bq_connector._build_queries("Acme"))
+    serial_s = queries * (SEARCH_LATENCY + OLD_SEARCH_SLEEP) + bq_connector.MAX_ENRICHED_ARTICLES * ARTICLE_LATENCY
+
+    # fan-out
+    output, elapsed = run_tool()
+    assert not output["partial"], output["timings_ms"]
+    assert len(output["articles"]) == bq_connector.MAX_ENRICHED_ARTICLES
+    assert all(a.get("page_title") for a in output["articles"])
+    assert len(output["timings_ms"]["search"]) == queries
+    assert len(output["timings_ms"]["fetch"]) == bq_connector.MAX_ENRICHED_ARTICLES
+    print(f"fan-out:  {elapsed:.2f}s (serial estimate {serial_s:.2f}s)")
+    print(f"  fetch timings (ms): {sorted(output['timings_ms']['fetch'].values())}")
+    assert elapsed < serial_s / 2
+
+    # pacing: the k-th search after the burst arrives no sooner than k / rate after the first
+    arrivals = sorted(search_handler.arrivals)
+    burst = int(http_fetch.HOST_BURST)
+    offsets = [round(t - arrivals[0], 2) for t in arrivals]
+    print(f"pacing:   search arrival offsets (s), burst {burst}: {offsets}")
+    for k in range(burst, len(arrivals)):
+        # 0.1s slack: arrival times include connection setup, token grants do not
+        assert offsets[k] >= (k - burst + 1) / http_fetch.HOST_RATE - 0.1, offsets
+
+    # deadline: one site is far slower than the budget
+    slow_port = StandIn.article_ports[0]
+    sites[0][1].latency = 30.0
+    bq_connector.RESEARCH_DEADLINE_SECONDS = 4.0
+    output, elapsed = run_tool()
+    slow = [a for a in output["articles"] if f":{slow_port}/" in a["url"]]
+    print(f"deadline: {elapsed:.2f}s with budget {bq_connector.RESEARCH_DEADLINE_SECONDS}s, "
+          f"{len(output['timings_ms']['fetch'])}/{len(output['articles'])} pages fetched")
+    assert output["partial"]
+    assert elapsed < bq_connector.RESEARCH_DEADLINE_SECONDS + 0.5
+    assert slow and not any(a.get("page_title") for a in slow)
+
+    # batch: three startups, two in the same domain, one listed twice
+    sites[0][1].latency = ARTICLE_LATENCY
+    http_fetch.rate_limiter = http_fetch.HostRateLimiter(rate=50, burst=50)
+    names = {"s1": "Acme", "s2": "Beta", "s3": "Gamma"}
+    bq_connector._get_company_names = lambda ids: {i: names[i] for i in ids}
+    search_handler.arrivals.clear()
+    for _, handler in sites:
+        handler.arrivals.clear()
+    single_keys = set(output)
+    results = bq_connector.research_batch(
+        ["s1", "s2", "s3", "s1"], domains={"s1": "fintech", "s2": "Fintech ", "s3": "health"}
+    )
+    fetches = sum(len(handler.arrivals) for _, handler in sites)
+    print(f"batch:    {len(search_handler.arrivals)} searches, {fetches} page fetches for {len(results)} startups")
+    assert sorted(results) == ["s1", "s2", "s3"]
+    assert all(set(result) == single_keys and not result["partial"] for result in results.values())
+    assert [results[s]["company_name"] for s in ("s1", "s2", "s3")] == ["Acme", "Beta", "Gamma"]
+    # 4 company queries each + 2 per distinct domain; 5 own pages each + the shared one
+    assert len(search_handler.arrivals) == 3 * 4 + 2 * 2
+    assert fetches == 3 * 5 + 1
+
+    for server, _ in sites + [(search_server, search_handler)]:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
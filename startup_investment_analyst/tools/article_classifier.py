@@ -0,0 +1,174 @@
+"""Keyword category and title-sentiment scoring for researcher articles.
+
+ArticleClassifier holds the keyword lists of the researcher's former
+_categorize and _sentiment_from_titles helpers, prepared once, and scores an
+article's category and title sentiment together. Matching is the same as
+before: case-insensitive substring matches. Categories are tried in priority
+order and the first with a hit wins, falling back to "news". A title counts as
+positive or negative if it contains any of the respective words.
+
+With pyahocorasick installed (the package's "speedups" extra) and a keyword
+configuration of AUTOMATON_MIN_KEYWORDS or more, all keywords, category and
+sentiment alike, go into one Aho-Corasick automaton. Each article is then a
+single scan whose cost does not grow with the number of keywords. Otherwise
+each keyword is a substring test. In CPython that is faster than a combined
+regex, and for the default lists about as fast as the automaton.
+"""
+
+import importlib.util
+
+# find_spec only locates pyahocorasick (optional speed-up); it is imported when
+# the first automaton is built
+AUTOMATON_AVAILABLE = importlib.util.find_spec("ahocorasick") is not None
+
+DEFAULT_CATEGORIES = (
+    ("funding", ("funding", "raised", "seed", "series a", "series b", "invest")),
+    ("reviews", ("review", "rating", "customer", "users say", "pros", "cons")),
+    ("competitors", ("competitor", "alternative", "vs ", "compare", "rival")),
+    ("market", ("market", "industry", "trend", "growth", "report")),
+)
+DEFAULT_CATEGORY = "news"
+POSITIVE_WORDS = ("wins", "growth", "partnership", "launch", "raises", "award", "record")
+NEGATIVE_WORDS = ("lawsuit", "decline", "loss", "breach", "hack", "cut", "layoff")
+# Below this many keywords, substring scans are as fast as the automaton (see benchmark_article_classifier)
+AUTOMATON_MIN_KEYWORDS = 64
+
+
+def article_text(article):
+    return f"{article.get('title','')} {article.get('snippet','')} {article.get('page_description','')}".lower()
+
+
+def sentiment_label(positive, negative):
+    if positive - negative > 1:
+        return "positive"
+    if negative - positive > 1:
+        return "negative"
+    return "neutral"
+
+
+class ArticleClassifier:
+    """
+    categories: (name, keywords) pairs in priority order. Keywords are matched
+    lowercase as substrings of title + snippet + page_description.
+    """
+
+    def __init__(self, categories=DEFAULT_CATEGORIES, default_category=DEFAULT_CATEGORY,
+                 positive=POSITIVE_WORDS, negative=NEGATIVE_WORDS, use_automaton=None):
+        self.categories = [(name, tuple(k.lower() for k in keywords)) for name, keywords in categories]
+        self.default_category = default_category
+        self.positive = tuple(k.lower() for k in positive)
+        self.negative = tuple(k.lower() for k in negative)
+        if use_automaton is None:
+            keyword_count = sum(len(k) for _, k in self.categories) + len(self.positive) + len(self.negative)
+            use_automaton = AUTOMATON_AVAILABLE and keyword_count >= AUTOMATON_MIN_KEYWORDS
+        self._automaton = self._build_automaton() if use_automaton else None
+
+    def _build_automaton(self):
+        import ahocorasick
+
+        # keyword -> (priority of its category or None, in positive list, in negative list)
+        entries = {}
+        for priority, (_, keywords) in enumerate(self.categories):
+            for keyword in keywords:
+                current = entries.get(keyword, (None, False, False))
+                best = priority if current[0] is None else min(current[0], priority)
+                entries[keyword] = (best, current[1], current[2])
+        for keyword in self.positive:
+            current = entries.get(keyword, (None, False, False))
+            entries[keyword] = (current[0], True, current[2])
+        for keyword in self.negative:
+            current = entries.get(keyword, (None, False, False))
+            entries[keyword] = (current[0], current[1], True)
+
+        automaton = ahocorasick.Automaton()
+        for keyword, value in entries.items():
+            automaton.add_word(keyword, value)
+        automaton.make_automaton()
+        return automaton
+
+    def classify(self, article):
+        """Return (category, title is positive, title is negative) for one article."""
+        title = article.get("title", "").lower()
+        if self._automaton is None:
+            return self._classify_scan(article_text(article), title)
+
+        # article_text starts with the lowercased title, so hits ending inside it are title hits
+        text = article_text(article)
+        title_end = len(title) - 1 if text.startswith(title) else -1
+        best, positive, negative = None, False, False
+        for end, (priority, pos, neg) in self._automaton.iter(text):
+            if priority is not None and (best is None or priority < best):
+                best = priority
+            if end <= title_end:
+                positive = positive or pos
+                negative = negative or neg
+            elif best == 0:
+                break  # past the title with the top category already found
+        if title_end < 0 and title:
+            # lowercasing changed the title's length; check it on its own
+            positive = any(k in title for k in self.positive)
+            negative = any(k in title for k in self.negative)
+        category = self.categories[best][0] if best is not None else self.default_category
+        return category, positive, negative
+
+    def _classify_scan(self, text, title):
+        category = self.default_category
+        for name, keywords in self.categories:
+            if any(k in text for k in keywords):
+                category = name
+                break
+        return category, any(k in title for k in self.positive), any(k in title for k in self.negative)
+
+    def empty_buckets(self):
+        buckets = {name: [] for name, _ in self.categories}
+        buckets.setdefault(self.default_category, [])
+        return buckets
+
+    def analyze(self, articles):
+        """Categorized buckets and title sentiment for a list of articles, in one pass."""
+        buckets = self.empty_buckets()
+        positive = negative = 0
+        if self._automaton is not None:
+            for article in articles:
+                category, pos, neg = self.classify(article)
+                buckets[category].append(article)
+                positive += pos
+                negative += neg
+            return buckets, sentiment_label(positive, negative)
+
+        # Substring scans, inlined: per-call overhead dominates for short keyword lists
+        categories, default = self.categories, self.default_category
+        positive_words, negative_words = self.positive, self.negative
+        for article in articles:
+            title = article.get("title", "")
+            text = f"{title} {article.get('snippet','')} {article.get('page_description','')}".lower()
+            for name, keywords in categories:
+                if any(k in text for k in keywords):
+                    buckets[name].append(article)
+                    break
+            else:
+                buckets[default].append(article)
+            title = title.lower()
+            for k in positive_words:
+                if k in title:
+                    positive += 1
+                    break
+            for k in negative_words:
+                if k in title:
+                    negative += 1
+                    break
+        return buckets, sentiment_label(positive, negative)
+
+    def categorize(self, articles):
+        return self.analyze(articles)[0]
+
+    def sentiment(self, titles):
+        positive = negative = 0
+        for title in titles:
+            title = (title or "").lower()
+            positive += any(k in title for k in self.positive)
+            negative += any(k in title for k in self.negative)
+        return sentiment_label(positive, negative)
+
+
+default_classifier = ArticleClassifier()
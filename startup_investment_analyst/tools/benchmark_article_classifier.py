@@ -0,0 +1,116 @@
+"""
+Benchmark: researcher article categorization and title sentiment in bulk.
+
+The previous _categorize / _sentiment_from_titles pair, copied below, runs over
+10k and 100k generated articles. So does ArticleClassifier.analyze, with the
+Aho-Corasick automaton when pyahocorasick is installed and with substring scans.
+Categories and sentiment must match exactly. The benchmark also runs each
+implementation with a 200-keyword configuration, where the automaton's single
+scan matters most.
+
+Usage: python -m startup_investment_analyst.tools.benchmark_article_classifier [sizes...]
+"""
+
+import random
+import re
+import sys
+import time
+
+from . import article_classifier
+from .article_classifier import ArticleClassifier
+
+WORDS = (
+    "the company said today its new product launched across europe with partners after a strong quarter "
+    "and plans to hire engineers while regulators review data rules in several countries"
+).split()
+
+
+def legacy_categorize(articles):
+    cats = {"funding": [], "reviews": [], "competitors": [], "news": [], "market": []}
+    for a in articles:
+        text = f"{a.get('title','')} {a.get('snippet','')} {a.get('page_description','')}".lower()
+        if any(k in text for k in ["funding", "raised", "seed", "series a", "series b", "invest"]):
+            cats["funding"].append(a)
+        elif any(k in text for k in ["review", "rating", "customer", "users say", "pros", "cons"]):
+            cats["reviews"].append(a)
+        elif any(k in text for k in ["competitor", "alternative", "vs ", "compare", "rival"]):
+            cats["competitors"].append(a)
+        elif any(k in text for k in ["market", "industry", "trend", "growth", "report"]):
+            cats["market"].append(a)
+        else:
+            cats["news"].append(a)
+    return cats
+
+
+def legacy_sentiment(titles):
+    pos = len([t for t in titles if re.search(r"wins|growth|partnership|launch|raises|award|record", t.lower() or "")])
+    neg = len([t for t in titles if re.search(r"lawsuit|decline|loss|breach|hack|cut|layoff", t.lower() or "")])
+    if pos - neg > 1:
+        return "positive"
+    if neg - pos > 1:
+        return "negative"
+    return "neutral"
+
+
+def generate(n, seed=7):
+    rng = random.Random(seed)
+    keywords = [k for _, ks in article_classifier.DEFAULT_CATEGORIES for k in ks]
+    keywords += list(article_classifier.POSITIVE_WORDS + article_classifier.NEGATIVE_WORDS)
+
+    def sentence(words):
+        parts = [rng.choice(WORDS) for _ in range(words)]
+        for _ in range(rng.choice((0, 0, 1, 2))):
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(keywords).upper() if rng.random() < 0.2 else rng.choice(keywords))
+        return " ".join(parts)
+
+    return [
+        {"title": sentence(8).title(), "snippet": sentence(25), "page_description": sentence(40), "url": f"https://e.com/{i}"}
+        for i in range(n)
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def large_config():
+    rng = random.Random(3)
+    vocab = sorted({"".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(5, 9))) for _ in range(400)})
+    categories = [(name, tuple(keywords) + tuple(vocab[i * 45:(i + 1) * 45]))
+                  for i, (name, keywords) in enumerate(article_classifier.DEFAULT_CATEGORIES)]
+    return categories
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    variants = [("substring scan", False)] + ([("aho-corasick", True)] if article_classifier.AUTOMATON_AVAILABLE else [])
+    for n in sizes:
+        articles = generate(n)
+        (legacy_cats, legacy_sent), legacy_s = timed(
+            lambda: (legacy_categorize(articles), legacy_sentiment([a.get("title", "") for a in articles]))
+        )
+        print(f"{n} articles")
+        print(f"  legacy (categorize + sentiment)  {legacy_s:6.2f}s")
+        for name, use_automaton in variants:
+            classifier = ArticleClassifier(use_automaton=use_automaton)
+            (cats, sent), elapsed = timed(lambda: classifier.analyze(articles))
+            assert sent == legacy_sent
+            assert {k: [a["url"] for a in v] for k, v in cats.items()} == \
+                {k: [a["url"] for a in v] for k, v in legacy_cats.items()}
+            print(f"  {name + ' (one pass)':<32} {elapsed:6.2f}s  {legacy_s / elapsed:4.1f}x")
+
+        categories = large_config()
+        keyword_count = sum(len(k) for _, k in categories)
+        results = []
+        for name, use_automaton in variants:
+            classifier = ArticleClassifier(categories, use_automaton=use_automaton)
+            (cats, _), elapsed = timed(lambda: classifier.analyze(articles))
+            results.append({k: len(v) for k, v in cats.items()})
+            print(f"  {name + f' ({keyword_count} keywords)':<32} {elapsed:6.2f}s")
+        assert all(r == results[0] for r in results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Micro-benchmark: BeautifulSoup full-page parse vs the streaming head extractor.
+
+Each page in the corpus goes through the extraction _fetch_metadata used to do:
+decode the whole page and build a BeautifulSoup tree. It then goes through
+html_meta.HeadExtractor, fed in 16 KiB chunks as the page would stream in,
+with each available parser. Outputs must match. The benchmark reports total
+time, peak traced memory and bytes consumed.
+
+Without --corpus, pages are generated: a head with inline scripts and styles,
+then a long article body, in three flavours (meta description, og:description
+only, no description so the first <p> is used).
+
+Usage: python -m startup_investment_analyst.tools.benchmark_html_meta [--corpus DIR] [--pages 30] [--repeat 2]
+"""
+
+import argparse
+import glob
+import os
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from . import html_meta
+
+CHUNK = 16 * 1024
+
+
+def bs4_extract(html_bytes):
+    """The extraction _fetch_metadata performed on the full response text."""
+    soup = BeautifulSoup(html_bytes.decode("utf-8", errors="replace"), "html.parser")
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    desc = ""
+    meta_desc = soup.find("meta", attrs={"name": "description"}) or soup.find("meta", attrs={"property": "og:description"})
+    if meta_desc and meta_desc.get("content"):
+        desc = meta_desc.get("content").strip()
+    if not desc:
+        p = soup.find("p")
+        desc = p.get_text(" ", strip=True)[:300] if p else ""
+    return {"page_title": title, "page_description": desc}, len(html_bytes)
+
+
+def streaming_extract(html_bytes, parser):
+    extractor = html_meta.HeadExtractor(parser)
+    for start in range(0, len(html_bytes), CHUNK):
+        if extractor.feed(html_bytes[start:start + CHUNK], "utf-8"):
+            break
+    return extractor.result(), extractor.bytes_read
+
+
+def synthetic_page(i):
+    head_meta = [
+        f'<meta name="description" content="Acme {i} raises a Series B to expand">',
+        f'<meta property="og:description" content="Acme {i} expands into new markets">',
+        "",
+    ][i % 3]
+    script = "<script>" + "var tracking = {id: 1, events: []};\n" * 600 + "</script>"
+    style = "<style>" + ".article p { margin: 0 0 1em; line-height: 1.5 }\n" * 300 + "</style>"
+    nav = "<nav>" + "".join(f'<a href="/section/{n}">Section {n}</a>' for n in range(200)) + "</nav>"
+    paragraphs = "".join(
+        f"<p>Paragraph {n} of story {i}: the company reported <b>strong</b> growth &amp; new customers.</p>"
+        for n in range(3000)
+    )
+    return (
+        f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Acme {i} &ndash; News</title>"
+        f"{head_meta}{style}{script}</head><body>{nav}<article>{paragraphs}</article></body></html>"
+    ).encode("utf-8")
+
+
+def run(name, extract, pages, repeat):
+    best, results, consumed = None, [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results, consumed = [], 0
+        for page in pages:
+            result, read = extract(page)
+            results.append(result)
+            consumed += read
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    for page in pages[:10]:
+        extract(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<22} {best * 1000:8.1f}ms  peak {peak / 1e6:6.2f}MB (10 pages)  read {consumed / 1e6:7.2f}MB")
+    return best, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare HTML metadata extractors.")
+    parser.add_argument("--corpus", help="directory of saved .html pages")
+    parser.add_argument("--pages", type=int, default=30, help="synthetic pages when no corpus is given")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.corpus, "**", "*.htm*"), recursive=True)):
+            with open(path, "rb") as f:
+                pages.append(f.read())
+    else:
+        pages = [synthetic_page(i) for i in range(args.pages)]
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / 1e6:.1f}MB")
+
+    baseline_s, expected = run("beautifulsoup (full)", bs4_extract, pages, args.repeat)
+    parsers = ["html.parser"] + (["lxml"] if html_meta.lxml_etree() is not None else [])
+    for name in parsers:
+        elapsed, results = run(f"streaming {name}", lambda page: streaming_extract(page, name), pages, args.repeat)
+        mismatches = [i for i, (a, b) in enumerate(zip(expected, results)) if a != b]
+        if args.corpus:
+            # Real pages can differ in edge cases (e.g. markup inside <title>); report rather than fail
+            print(f"  {len(mismatches)} of {len(pages)} pages differ from beautifulsoup")
+        else:
+            assert not mismatches, (mismatches[:3], expected[mismatches[0]], results[mismatches[0]])
+            assert elapsed < baseline_s / 5
+        print(f"  {baseline_s / elapsed:.0f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark for the researcher's on-disk response cache.
+
+A local stand-in serves article pages with injected latency, an ETag and
+Last-Modified. The same URLs are fetched through http_fetch.fetch_text four
+times: cold, warm (fresh hits), after expiry (revalidated by 304), and with a
+size bound small enough to force LRU eviction. The cache file lives in a
+temporary directory. Two checks follow: a body cut short by max_bytes must not
+be served for a full fetch of the same URL, and a locked or failing cache must
+not fail a fetch.
+
+Usage: python -m startup_investment_analyst.tools.benchmark_http_cache [pages] [latency_seconds]
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import http_cache, http_fetch
+
+
+class ArticleServer(BaseHTTPRequestHandler):
+    latency = 0.2
+    full_responses = 0
+    not_modified = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = f"<html><head><title>{self.path}</title></head><body>{'x' * 4000}</body></html>".encode()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            type(self).not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        type(self).full_responses += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", "Mon, 06 Oct 2025 10:00:00 GMT")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def fetch_all(urls, ttl):
+    start = time.perf_counter()
+    pages = [http_fetch.fetch_text("GET", url, timeout=5, ttl=ttl) for url in urls]
+    return pages, time.perf_counter() - start
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    ArticleServer.latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    http_fetch.rate_limiter = http_fetch.HostRateLimiter(rate=1000, burst=1000)  # measure the cache, not pacing
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ArticleServer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # Differently written URLs for the same page share an entry
+    urls = [f"HTTP://127.0.0.1:{server.server_address[1]}/article/{i}?b=2&a=1#top" for i in range(pages)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        http_cache._cache = http_cache.HttpCache(os.path.join(tmp, "cache.sqlite3"))
+
+        cold, cold_s = fetch_all(urls, ttl=3600)
+        warm, warm_s = fetch_all([u.replace("HTTP", "http").replace("?b=2&a=1#top", "?a=1&b=2") for u in urls], ttl=3600)
+        assert warm == cold and ArticleServer.full_responses == pages
+        print(f"cold:        {cold_s:.2f}s for {pages} pages")
+        print(f"warm:        {warm_s:.3f}s ({cold_s / warm_s:.0f}x faster)")
+
+        http_cache._cache._conn().execute("UPDATE responses SET expires_at = 0")
+        revalidated, revalidate_s = fetch_all(urls, ttl=3600)
+        assert revalidated == cold and ArticleServer.not_modified == pages and ArticleServer.full_responses == pages
+        print(f"revalidated: {revalidate_s:.2f}s ({ArticleServer.not_modified} x 304, no bodies re-sent)")
+
+        stats = http_cache._cache.stats()
+        print(f"stats:       {stats}")
+        assert stats["hits"] == pages and stats["revalidated"] == pages and stats["misses"] == pages
+
+        http_cache._cache.max_bytes = stats["bytes"] // 2
+        http_cache._cache.evict()
+        stats = http_cache._cache.stats()
+        print(f"evicted to {stats['entries']} entries, {stats['bytes']} bytes (bound {http_cache._cache.max_bytes})")
+        assert stats["bytes"] <= http_cache._cache.max_bytes and stats["evicted"] > 0
+
+        # A prefix read is cached under its own key; a full read still gets the whole page
+        http_cache._cache.max_bytes = http_cache.RESEARCH_CACHE_MAX_BYTES
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        prefix, _ = http_fetch.fetch_bytes("GET", f"{base}/article/partial", timeout=5, max_bytes=100)
+        full, _ = http_fetch.fetch_bytes("GET", f"{base}/article/partial", timeout=5)
+        again, _ = http_fetch.fetch_bytes("GET", f"{base}/article/partial", timeout=5, max_bytes=100)
+        assert len(prefix) == 100 and len(full) > 100 and full.endswith(b"</html>") and again == prefix
+        print(f"prefix:      {len(prefix)} bytes cached apart from the {len(full)}-byte page")
+
+        # Another writer holds the database; the cache read fails too. Fetches still succeed
+        blocker = sqlite3.connect(http_cache._cache.path, isolation_level=None)
+        blocker.execute("BEGIN EXCLUSIVE")
+        http_cache._cache._conn().execute("PRAGMA busy_timeout = 50")
+        real_get = http_cache._cache.get
+        http_cache._cache.get = lambda key: (_ for _ in ()).throw(sqlite3.OperationalError("database is locked"))
+        try:
+            locked, _ = fetch_all([f"{base}/article/locked"], ttl=3600)
+        finally:
+            http_cache._cache.get = real_get
+            blocker.execute("ROLLBACK")
+            blocker.close()
+        errors = http_cache._cache.stats()["errors"]
+        assert locked[0].endswith("</html>") and errors == 2, errors
+        print(f"locked:      fetch served from the network, {errors} cache errors skipped")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
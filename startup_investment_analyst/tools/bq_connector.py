@@ -6,38 +6,40 @@
 """Defines tools for Researcher Agent (investor-focused research)."""
 
 import os
-import re
 import time
-import requests
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import List, Dict
-from google.cloud import bigquery
 from google.adk.tools import FunctionTool, ToolContext
-from ..shared_libraries import constants
+from ..shared_libraries import clients, constants
+from . import article_classifier, html_meta, http_cache, http_fetch
 
 # Set service account if provided
 # if constants.SERVICE_ACCOUNT_PATH:
 #     os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", constants.SERVICE_ACCOUNT_PATH)
 
-# BigQuery client
-try:
-    bq_client = bigquery.Client(project=constants.PROJECT_ID)
-except Exception as e:
-    print(f"Error initializing BigQuery client: {e}")
-    bq_client = None
+DUCKDUCKGO_HTML = os.environ.get("RESEARCH_SEARCH_URL", "https://html.duckduckgo.com/html/")
 
-DUCKDUCKGO_HTML = "https://html.duckduckgo.com/html/"
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36"
-}
+SEARCH_TIMEOUT = 15
+FETCH_TIMEOUT = 12
+MAX_ENRICHED_ARTICLES = 6
+# Lifetimes in the on-disk response cache (tools/http_cache.py)
+SEARCH_CACHE_TTL = int(os.environ.get("RESEARCH_SEARCH_TTL_SECONDS", "3600"))
+PAGE_CACHE_TTL = int(os.environ.get("RESEARCH_PAGE_TTL_SECONDS", "86400"))
+RESEARCH_MAX_WORKERS = int(os.environ.get("RESEARCH_MAX_WORKERS", "8"))
+# Overall budget per researcher_tool call; whatever finished by then is returned
+RESEARCH_DEADLINE_SECONDS = float(os.environ.get("RESEARCH_DEADLINE_SECONDS", "25"))
+RESEARCH_BATCH_DEADLINE_SECONDS = float(os.environ.get("RESEARCH_BATCH_DEADLINE_SECONDS", "600"))
 
 # -----------------------
 # Helper functions
 # -----------------------
 
 def _get_company_name(startup_id: str) -> str:
+    bq_client = clients.get_bigquery_client()
     if not bq_client:
         return ""
+    from google.cloud import bigquery
+
     q = f"""
         SELECT name 
         FROM `{constants.PROJECT_ID}.{constants.BQ_DATASET}.startups`
@@ -50,23 +52,52 @@ def _get_company_name(startup_id: str) -> str:
     return rows[0]["name"] if rows else ""
 
 
-def _build_queries(name: str) -> List[str]:
+def _get_company_names(startup_ids: List[str]) -> Dict[str, str]:
+    """startup_id -> name for every id found, in a single query."""
+    bq_client = clients.get_bigquery_client()
+    if not bq_client or not startup_ids:
+        return {}
+    from google.cloud import bigquery
+
+    q = f"""
+        SELECT startup_id, ANY_VALUE(name) AS name
+        FROM `{constants.PROJECT_ID}.{constants.BQ_DATASET}.startups`
+        WHERE startup_id IN UNNEST(@startup_ids)
+        GROUP BY startup_id
+    """
+    job = bq_client.query(q, job_config=bigquery.QueryJobConfig(
+        query_parameters=[bigquery.ArrayQueryParameter("startup_ids", "STRING", list(startup_ids))]
+    ))
+    return {row["startup_id"]: row["name"] for row in job.result()}
+
+
+def _build_queries(name: str, domain: str = None) -> List[str]:
+    """Search queries for a company; with a domain, the market and guideline queries are per domain."""
     name = name or "startup"
+    subject = domain or name
     return [
         f"{name} funding news",
         f"{name} product review",
         f"{name} competitors",
         f"{name} recent news",
-        f"{name} market analysis",
-        f"government guidelines for {name} domain",
+        f"{subject} market analysis",
+        f"government guidelines for {subject} domain",
     ]
 
 
-def _search_duckduckgo(query: str, max_results: int = 5) -> List[Dict]:
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _search_duckduckgo(query: str, max_results: int = 5, deadline: float = None) -> List[Dict]:
+    # bs4 is imported on first search, not with the agent package
+    from bs4 import BeautifulSoup
+
     try:
-        resp = requests.post(DUCKDUCKGO_HTML, data={"q": query}, headers=HEADERS, timeout=15)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
+        html = http_fetch.fetch_text(
+            "POST", DUCKDUCKGO_HTML, SEARCH_TIMEOUT, deadline, ttl=SEARCH_CACHE_TTL, data={"q": query}
+        )
+        soup = BeautifulSoup(html, "html.parser")
         results = []
         for res in soup.select(".result__title a"):
             title = res.get_text(strip=True)
@@ -83,68 +114,44 @@ def _search_duckduckgo(query: str, max_results: int = 5) -> List[Dict]:
         return []
 
 
-def _fetch_metadata(url: str) -> Dict:
+def _fetch_metadata(url: str, deadline: float = None) -> Dict:
     if not url:
         return {}
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=12)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
-        title = soup.title.get_text(strip=True) if soup.title else ""
-        desc = ""
-        meta_desc = soup.find("meta", attrs={"name": "description"}) or soup.find("meta", attrs={"property": "og:description"})
-        if meta_desc and meta_desc.get("content"):
-            desc = meta_desc.get("content").strip()
-        if not desc:
-            p = soup.find("p")
-            desc = p.get_text(" ", strip=True)[:300] if p else ""
-        return {"page_title": title, "page_description": desc}
+        # Streams the page and stops once the title and description are known
+        extractor = html_meta.HeadExtractor()
+        http_fetch.fetch_bytes(
+            "GET", url, FETCH_TIMEOUT, deadline, ttl=PAGE_CACHE_TTL,
+            until=extractor.feed, max_bytes=html_meta.MAX_METADATA_BYTES,
+        )
+        return extractor.result()
     except Exception:
         return {}
 
 
-def _categorize(articles: List[Dict]) -> Dict[str, List[Dict]]:
-    cats = {"funding": [], "reviews": [], "competitors": [], "news": [], "market": []}
-    for a in articles:
-        text = f"{a.get('title','')} {a.get('snippet','')} {a.get('page_description','')}".lower()
-        if any(k in text for k in ["funding", "raised", "seed", "series a", "series b", "invest"]):
-            cats["funding"].append(a)
-        elif any(k in text for k in ["review", "rating", "customer", "users say", "pros", "cons"]):
-            cats["reviews"].append(a)
-        elif any(k in text for k in ["competitor", "alternative", "vs ", "compare", "rival"]):
-            cats["competitors"].append(a)
-        elif any(k in text for k in ["market", "industry", "trend", "growth", "report"]):
-            cats["market"].append(a)
-        else:
-            cats["news"].append(a)
-    return cats
-
-
-def _sentiment_from_titles(titles: List[str]) -> str:
-    pos = len([t for t in titles if re.search(r"wins|growth|partnership|launch|raises|award|record", t.lower() or "")])
-    neg = len([t for t in titles if re.search(r"lawsuit|decline|loss|breach|hack|cut|layoff", t.lower() or "")])
-    if pos - neg > 1:
-        return "positive"
-    if neg - pos > 1:
-        return "negative"
-    return "neutral"
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, round((time.perf_counter() - start) * 1000, 1)
 
-# -----------------------
-# FunctionTool wrapper
-# -----------------------
 
-def researcher_tool(tool_context: ToolContext):
-    """Main tool entry for researcher agent."""
-    startup_id = tool_context.user_content.parts[0].text.strip()
-    company_name = _get_company_name(startup_id) if startup_id else startup_id
-
-    queries = _build_queries(company_name or startup_id)
+def _fan_out(executor, fn, items, deadline):
+    """
+    Run fn(item, deadline) for every item on executor. Returns (results, timings_ms)
+    keyed by item, holding only the calls that finished before the deadline.
+    """
+    futures = {item: executor.submit(_timed, fn, item, deadline) for item in items}
+    wait(futures.values(), timeout=max(0.0, http_fetch.remaining(deadline)))
+    results, timings_ms = {}, {}
+    for item, future in futures.items():
+        if future.done() and not future.cancelled() and future.exception() is None:
+            results[item], timings_ms[item] = future.result()
+        else:
+            future.cancel()
+    return results, timings_ms
 
-    articles: List[Dict] = []
-    for q in queries:
-        articles.extend(_search_duckduckgo(q, max_results=4))
-        time.sleep(0.5)
 
+def _unique_articles(articles: List[Dict]) -> List[Dict]:
     seen = set()
     unique_articles = []
     for a in articles:
@@ -152,17 +159,14 @@ def researcher_tool(tool_context: ToolContext):
         if u and u not in seen:
             seen.add(u)
             unique_articles.append(a)
+    return unique_articles
 
-    enriched = []
-    for a in unique_articles[:6]:
-        meta = _fetch_metadata(a.get("url"))
-        enriched.append({**a, **meta})
-
-    categorized = _categorize(enriched)
-    sentiment = _sentiment_from_titles([a.get("title", "") for a in enriched])
 
+def _research_result(company_name: str, enriched: List[Dict], partial: bool, search_ms: Dict, fetch_ms: Dict) -> Dict:
+    """The researcher_tool output for one company."""
+    categorized, sentiment = article_classifier.default_classifier.analyze(enriched)
     return {
-        "company_name": company_name or startup_id,
+        "company_name": company_name,
         "public_sentiment": sentiment,
         "articles": enriched,
         "recent_news": categorized.get("news", [])[:5],
@@ -170,10 +174,121 @@ def researcher_tool(tool_context: ToolContext):
         "product_reviews": categorized.get("reviews", [])[:5],
         "competitors": categorized.get("competitors", [])[:8],
         "market_trends": categorized.get("market", [])[:5],
-        "summary": f"Collected {len(enriched)} public references for {company_name or startup_id}.",
+        "summary": f"Collected {len(enriched)} public references for {company_name}.",
+        "partial": partial,
+        "timings_ms": {"search": search_ms, "fetch": fetch_ms},
     }
 
 
+def _log_cache_stats(caller: str):
+    # A locked or broken cache file must not fail the research run after it finished
+    stats = http_fetch._cache_call(http_cache.get_cache(), "stats")
+    if stats is not None:
+        print(f"{caller}: response cache {stats}")
+
+
+# -----------------------
+# FunctionTool wrapper
+# -----------------------
+
+def researcher_tool(tool_context: ToolContext):
+    """Main tool entry for researcher agent."""
+    startup_id = tool_context.user_content.parts[0].text.strip()
+    company_name = _get_company_name(startup_id) if startup_id else startup_id
+
+    queries = _build_queries(company_name or startup_id)
+    deadline = http_fetch.deadline_in(RESEARCH_DEADLINE_SECONDS)
+
+    # Searches, then page fetches, run concurrently; per-host pacing comes from http_fetch's rate limiter
+    executor = ThreadPoolExecutor(max_workers=RESEARCH_MAX_WORKERS)
+    try:
+        searches, search_ms = _fan_out(
+            executor, lambda q, d: _search_duckduckgo(q, max_results=4, deadline=d), queries, deadline
+        )
+        articles: List[Dict] = []
+        for q in queries:  # keep query order so dedupe and truncation match the serial version
+            articles.extend(searches.get(q, []))
+
+        top = _unique_articles(articles)[:MAX_ENRICHED_ARTICLES]
+        metadata, fetch_ms = _fan_out(executor, _fetch_metadata, [a["url"] for a in top], deadline)
+    finally:
+        # Don't wait for requests still running past the deadline; their timeouts are capped by it
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    enriched = [{**a, **metadata.get(a["url"], {})} for a in top]
+    # Requests cut off by the deadline come back empty, so also treat a spent budget as partial
+    partial = len(searches) < len(queries) or len(metadata) < len(top) or http_fetch.remaining(deadline) <= 0
+    if partial:
+        print(f"researcher_tool: deadline of {RESEARCH_DEADLINE_SECONDS}s reached; returning partial results")
+
+    _log_cache_stats("researcher_tool")
+    return _research_result(company_name or startup_id, enriched, partial, search_ms, fetch_ms)
+
+
+def research_batch(startup_ids: List[str], domains: Dict[str, str] = None,
+                   max_workers: int = RESEARCH_MAX_WORKERS,
+                   deadline_seconds: float = RESEARCH_BATCH_DEADLINE_SECONDS) -> Dict[str, Dict]:
+    """
+    researcher_tool for a cohort of startups. Returns startup_id -> a result of
+    the same shape as researcher_tool.
+
+    Names come from one BigQuery query. domains (startup_id -> e.g. "fintech")
+    turns the market-analysis and government-guidelines queries into per-domain
+    queries shared by every startup in that domain; the startups table has no
+    domain column, so without it those queries stay per company. Identical
+    queries (case- and whitespace-insensitive) are searched once and identical
+    URLs fetched once for the whole batch, all on one pool of max_workers.
+    """
+    startup_ids = list(dict.fromkeys(s.strip() for s in startup_ids if s and s.strip()))
+    domains = domains or {}
+    names = _get_company_names(startup_ids)
+
+    plans = {}  # startup_id -> normalized queries, in researcher_tool's order
+    query_text = {}  # normalized -> query as first written
+    for startup_id in startup_ids:
+        queries = _build_queries(names.get(startup_id) or startup_id, domains.get(startup_id))
+        plans[startup_id] = [_normalize_query(q) for q in queries]
+        for q in queries:
+            query_text.setdefault(_normalize_query(q), q)
+
+    deadline = http_fetch.deadline_in(deadline_seconds)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        searches, search_ms = _fan_out(
+            executor, lambda q, d: _search_duckduckgo(query_text[q], max_results=4, deadline=d), list(query_text), deadline
+        )
+        tops = {}
+        for startup_id, queries in plans.items():
+            articles = [a for q in queries for a in searches.get(q, [])]
+            tops[startup_id] = _unique_articles(articles)[:MAX_ENRICHED_ARTICLES]
+        urls = list(dict.fromkeys(a["url"] for top in tops.values() for a in top))
+        metadata, fetch_ms = _fan_out(executor, _fetch_metadata, urls, deadline)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    deadline_spent = http_fetch.remaining(deadline) <= 0
+    results = {}
+    for startup_id, top in tops.items():
+        queries = plans[startup_id]
+        partial = deadline_spent or any(q not in searches for q in queries) or any(a["url"] not in metadata for a in top)
+        results[startup_id] = _research_result(
+            names.get(startup_id) or startup_id,
+            [{**a, **metadata.get(a["url"], {})} for a in top],
+            partial,
+            {query_text[q]: search_ms[q] for q in queries if q in search_ms},
+            {a["url"]: fetch_ms[a["url"]] for a in top if a["url"] in fetch_ms},
+        )
+
+    requested_queries = sum(len(q) for q in plans.values())
+    requested_urls = sum(len(top) for top in tops.values())
+    print(f"research_batch: {len(startup_ids)} startups, {requested_queries} queries -> {len(query_text)} searches, "
+          f"{requested_urls} pages -> {len(urls)} fetches")
+    if deadline_spent:
+        print(f"research_batch: deadline of {deadline_seconds}s reached; returning partial results")
+    _log_cache_stats("research_batch")
+    return results
+
+
 # Wrap as a FunctionTool
 research_tool = FunctionTool(researcher_tool)
 
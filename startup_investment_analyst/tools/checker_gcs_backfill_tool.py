@@ -1,28 +1,12 @@
 import os
 import json
-from google.cloud import bigquery, storage
 from google.adk.tools import FunctionTool, ToolContext
-from ..shared_libraries import constants
+from ..shared_libraries import clients, constants
 
 # Set credentials
 # if constants.SERVICE_ACCOUNT_PATH:
 #     os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", constants.SERVICE_ACCOUNT_PATH)
 
-# BigQuery client
-try:
-    bq_client = bigquery.Client(project=constants.PROJECT_ID)
-except Exception as e:
-    print(f"Error initializing BigQuery client: {e}")
-    bq_client = None
-
-# Storage client
-try:
-    storage_client = storage.Client(project=constants.PROJECT_ID)
-except Exception as e:
-    print(f"Error initializing GCS client: {e}")
-    storage_client = None
-
-
 async def checker_gcs_backfill_runner(tool_context: ToolContext) -> dict[str]:
     """
     Download GCS file, extract fields, and update BigQuery.
@@ -37,8 +21,11 @@ async def checker_gcs_backfill_runner(tool_context: ToolContext) -> dict[str]:
     missing_fields_summary = json.loads(parts[2].text.strip())
     print("Line 38")
 
+    bq_client = clients.get_bigquery_client()
+    storage_client = clients.get_storage_client()
     if not bq_client or not storage_client:
         return {"error": "BigQuery or GCS client not initialized."}
+    from google.cloud import bigquery
 
     # --- Fetch GCS content ---
     bucket_name = constants.GCS_BUCKET
@@ -1,22 +1,12 @@
 import os
 from typing import Dict, Any
-from google.cloud import bigquery
 from google.adk.tools import FunctionTool, ToolContext
-from ..shared_libraries import constants
+from ..shared_libraries import bq_queries, clients, constants, data_context
 
 # Set credentials
 # if constants.SERVICE_ACCOUNT_PATH:
 #     os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", constants.SERVICE_ACCOUNT_PATH)
 
-# BigQuery client
-try:
-    bq_client = bigquery.Client(project=constants.PROJECT_ID)
-    print("✅ BigQuery client initialized")
-except Exception as e:
-    print(f"❌ Error initializing BigQuery client: {e}")
-    bq_client = None
-
-
 # Updated function signature to accept startup_id directly
 def checker_fetch_data_runner(startup_id: str, tool_context: ToolContext) -> Dict[str, Any]:
     """
@@ -24,37 +14,33 @@ def checker_fetch_data_runner(startup_id: str, tool_context: ToolContext) -> Dic
     """
     # The agent will now pass the startup_id directly as an argument.
     # No need to extract it from tool_context.user_content.parts
+    bq_client = clients.get_bigquery_client()
     if not bq_client or not startup_id:
         return {"error": "BigQuery client not initialized or startup_id missing."}
     
     print(f"🔍 Fetching data for startup_id: {startup_id}")
     startup_data = {}
 
+    # All tables are queried concurrently
+    rows, errors, timings_ms = bq_queries.fetch_startup_rows(bq_client, startup_id)
+    # Share the rows with the downstream tools of this run; failed tables are left out so they retry
+    data_context.store(
+        tool_context, startup_id, rows, [t for t in constants.TABLES.values() if t not in errors]
+    )
     for table_name in constants.TABLES.values():
-        try:
-            query = f"""
-                SELECT * FROM `{constants.PROJECT_ID}.{constants.BQ_DATASET}.{table_name}`
-                WHERE startup_id = @startup_id
-                LIMIT 1
-            """
-            job = bq_client.query(query, job_config=bigquery.QueryJobConfig(
-                query_parameters=[bigquery.ScalarQueryParameter("startup_id", "STRING", startup_id)]
-            ))
-            rows = [dict(r) for r in job.result()]
-
-            if rows:
-                startup_data[table_name] = rows[0]
-                print(f"✅ Data fetched from {table_name}")
-
-        except Exception as e:
-            print(f"⚠️ Error fetching data from {table_name}: {e}")
-            startup_data[table_name] = {"error": str(e)}
+        if table_name in rows:
+            startup_data[table_name] = rows[table_name]
+            print(f"✅ Data fetched from {table_name} in {timings_ms[table_name]}ms")
+        elif table_name in errors:
+            print(f"⚠️ Error fetching data from {table_name}: {errors[table_name]}")
+            startup_data[table_name] = {"error": str(errors[table_name])}
 
     print(startup_data)
 
     return {
         "startup_id": startup_id,
         "data": startup_data,
+        "timings_ms": timings_ms,
         "message": f"Fetched data from {len(startup_data)} table(s)."
     }
 
@@ -3,43 +3,41 @@
 
 import os
 from typing import Dict, Any
-from google.cloud import bigquery
 from google.adk.tools import ToolContext, FunctionTool
-from ..shared_libraries import constants
+from ..shared_libraries import clients, constants, data_context
+
+FINANCIAL_COLUMNS = ["growth_rate", "burn_rate", "profit_margin", "customer_acquisition_cost", "ebitda", "team_size"]
 
 # Set service account if provided
 # if constants.SERVICE_ACCOUNT_PATH:
 #     os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", constants.SERVICE_ACCOUNT_PATH)
 
-# Initialize BigQuery client
-try:
-    bq_client = bigquery.Client(project=constants.PROJECT_ID)
-except Exception as e:
-    print(f"Error initializing BigQuery client: {e}")
-    bq_client = None
-
-
 async def financial_tool_runner(tool_context: ToolContext) -> Dict[str, Any]:
     """
     Tool wrapper for FinancialAgent.
     Reads financial metrics from BigQuery and produces investor-focused analysis.
     """
     startup_id = tool_context.user_content.parts[0].text.strip()
-    if not bq_client or not startup_id:
-        return {"error": "BigQuery client not initialized or startup_id missing."}
+    # Row already fetched by the checker in this run?
+    hit, metrics = data_context.lookup(tool_context, startup_id, "company_metrics", FINANCIAL_COLUMNS)
+    if not hit:
+        bq_client = clients.get_bigquery_client()
+        if not bq_client or not startup_id:
+            return {"error": "BigQuery client not initialized or startup_id missing."}
+        from google.cloud import bigquery
 
-    # Fetch financial metrics
-    query = f"""
-        SELECT growth_rate, burn_rate, profit_margin, customer_acquisition_cost, ebitda, team_size
-        FROM `{constants.PROJECT_ID}.{constants.BQ_DATASET}.company_metrics`
-        WHERE startup_id = @startup_id
-        LIMIT 1
-    """
-    job = bq_client.query(query, job_config=bigquery.QueryJobConfig(
-        query_parameters=[bigquery.ScalarQueryParameter("startup_id", "STRING", startup_id)]
-    ))
-    rows = [dict(r) for r in job.result()]
-    metrics = rows[0] if rows else {}
+        # Fetch financial metrics
+        query = f"""
+            SELECT {", ".join(FINANCIAL_COLUMNS)}
+            FROM `{constants.PROJECT_ID}.{constants.BQ_DATASET}.company_metrics`
+            WHERE startup_id = @startup_id
+            LIMIT 1
+        """
+        job = bq_client.query(query, job_config=bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter("startup_id", "STRING", startup_id)]
+        ))
+        rows = [dict(r) for r in job.result()]
+        metrics = rows[0] if rows else {}
 
     # Compute investment score
     score = 50
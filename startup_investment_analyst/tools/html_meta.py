@@ -0,0 +1,246 @@
+"""Streaming title/description extraction for researcher article pages.
+
+The researcher needs three things from a page: the <title>, the meta
+description (name="description", else og:description) and, when the
+description is missing or empty, the first <p>. HeadExtractor takes the body
+chunk by chunk as it downloads. It reports done as soon as the head is closed
+and a description is known, or once the first paragraph has closed, and at
+RESEARCH_MAX_PAGE_BYTES at the latest. The rest of the page is never
+downloaded or parsed.
+
+lxml's HTMLPullParser is used when lxml is installed and the standard library's
+HTMLParser otherwise (RESEARCH_HTML_PARSER=lxml|html.parser forces one). lxml
+is imported by the first extractor that uses it, keeping it off the agent's
+import path. The
+output matches what _fetch_metadata used to read from a full BeautifulSoup tree:
+{"page_title": ..., "page_description": ...}, the paragraph fallback cut to 300
+characters.
+"""
+
+import codecs
+import importlib.util
+import os
+import re
+from html.parser import HTMLParser
+
+MAX_METADATA_BYTES = int(os.environ.get("RESEARCH_MAX_PAGE_BYTES", str(256 * 1024)))
+# find_spec only locates lxml (optional speed-up); it is imported in lxml_etree()
+HTML_PARSER = os.environ.get(
+    "RESEARCH_HTML_PARSER", "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+)
+PARAGRAPH_CHARS = 300
+
+META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([A-Za-z0-9_.:-]+)""", re.IGNORECASE)
+
+
+_etree = None  # lxml.etree once imported; False if lxml is not installed
+
+
+def lxml_etree():
+    """lxml.etree, imported on first call; None when lxml is not installed."""
+    global _etree
+    if _etree is None:
+        try:
+            from lxml import etree
+        except ImportError:
+            etree = False
+        _etree = etree
+    return _etree or None
+
+
+def _title_text(pieces):
+    # BeautifulSoup get_text(strip=True): strip every string, join without separator
+    return "".join(piece.strip() for piece in pieces)
+
+
+def _paragraph_text(pieces):
+    # BeautifulSoup get_text(" ", strip=True)
+    return " ".join(piece.strip() for piece in pieces if piece.strip())[:PARAGRAPH_CHARS]
+
+
+class _State:
+    """What has been seen so far; shared by both parser backends."""
+
+    def __init__(self):
+        self.title = None
+        self.name_description = None
+        self.og_description = None
+        self.paragraph = None
+        self.head_done = False
+
+    def meta(self, attrs):
+        if attrs.get("name") == "description":
+            if self.name_description is None:
+                self.name_description = attrs.get("content") or ""
+        elif attrs.get("property") == "og:description":
+            if self.og_description is None:
+                self.og_description = attrs.get("content") or ""
+
+    @property
+    def description(self):
+        meta = self.name_description if self.name_description is not None else self.og_description
+        return (meta or "").strip()
+
+    @property
+    def done(self):
+        return self.paragraph is not None or (self.head_done and bool(self.description))
+
+    def result(self):
+        return {
+            "page_title": self.title or "",
+            "page_description": self.description or (self.paragraph or ""),
+        }
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, state):
+        super().__init__(convert_charrefs=True)
+        self.state = state
+        self._title = None  # pieces while inside the first <title>
+        self._paragraph = None  # pieces while inside the first <p>
+        self._in_text = False  # text arriving in several feeds belongs to one piece
+
+    def handle_comment(self, data):
+        self._in_text = False
+
+    def handle_starttag(self, tag, attrs):
+        self._in_text = False
+        if tag == "title" and self.state.title is None and self._title is None:
+            self._title = []
+        elif tag == "meta":
+            self.state.meta(dict(attrs))
+        elif tag == "body":
+            self.state.head_done = True
+        elif tag == "p":
+            if self._paragraph is not None:
+                self._close_paragraph()  # a <p> implicitly closes an open one
+            elif self.state.paragraph is None:
+                self._paragraph = []
+
+    def handle_endtag(self, tag):
+        self._in_text = False
+        if tag == "title" and self._title is not None:
+            self.state.title = _title_text(self._title)
+            self._title = None
+        elif tag == "head":
+            self.state.head_done = True
+        elif tag == "p" and self._paragraph is not None:
+            self._close_paragraph()
+
+    def handle_data(self, data):
+        for pieces in (self._title, self._paragraph):
+            if pieces is None:
+                continue
+            if self._in_text and pieces:
+                pieces[-1] += data
+            else:
+                pieces.append(data)
+        self._in_text = True
+
+    def finish(self):
+        """Treat a <title> or <p> still open at the end of the input as closed."""
+        if self._title is not None:
+            self.handle_endtag("title")
+        if self._paragraph is not None:
+            self._close_paragraph()
+
+    def _close_paragraph(self):
+        self.state.paragraph = _paragraph_text(self._paragraph)
+        self._paragraph = None
+
+
+class HeadExtractor:
+    """
+    Feed a page's bytes with feed(chunk, encoding) until it returns True, then
+    call result(). encoding is the charset from the response headers, if any;
+    without one a <meta charset> in the first chunk is used, then UTF-8.
+    """
+
+    def __init__(self, parser=None, max_bytes=MAX_METADATA_BYTES):
+        self.parser = parser or HTML_PARSER
+        if self.parser == "lxml" and lxml_etree() is None:
+            self.parser = "html.parser"
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+        self.state = _State()
+        self._backend = None
+        self._decoder = None
+        self._lxml_paragraph = None
+
+    def _start(self, chunk, encoding):
+        if encoding is None:
+            match = META_CHARSET.search(chunk[:4096])
+            encoding = match.group(1).decode("ascii") if match else "utf-8"
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            encoding = "utf-8"
+        if self.parser == "lxml":
+            self._backend = lxml_etree().HTMLPullParser(events=("start", "end"), encoding=encoding)
+        else:
+            self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            self._backend = _StdlibParser(self.state)
+
+    def feed(self, chunk, encoding=None):
+        """Parse the next chunk. Returns True once enough has been read."""
+        if self.done:
+            return True
+        chunk = chunk[:self.max_bytes - self.bytes_read]
+        self.bytes_read += len(chunk)
+        if self._backend is None:
+            self._start(chunk, encoding)
+        if self.parser == "lxml":
+            self._backend.feed(chunk)
+            self._read_lxml_events()
+        else:
+            self._backend.feed(self._decoder.decode(chunk))
+        return self.done
+
+    def _read_lxml_events(self):
+        state = self.state
+        for event, element in self._backend.read_events():
+            tag = element.tag
+            if not isinstance(tag, str):
+                continue  # comments, processing instructions
+            if event == "start":
+                if tag == "meta":
+                    state.meta(element.attrib)
+                elif tag == "body":
+                    state.head_done = True
+                elif tag == "p" and state.paragraph is None and self._lxml_paragraph is None:
+                    self._lxml_paragraph = element
+            elif tag == "title" and state.title is None:
+                state.title = _title_text(element.itertext())
+            elif tag == "head":
+                state.head_done = True
+            elif element is self._lxml_paragraph:
+                state.paragraph = _paragraph_text(element.itertext())
+                self._lxml_paragraph = None
+
+    @property
+    def done(self):
+        return self.state.done or self.bytes_read >= self.max_bytes
+
+    def result(self):
+        if not self.state.done and self._backend is not None:
+            # Cut off by the byte cap or end of page: flush what the parser still holds
+            if self.parser == "lxml":
+                try:
+                    self._backend.close()
+                except lxml_etree().XMLSyntaxError:
+                    pass
+                self._read_lxml_events()
+            else:
+                self._backend.feed(self._decoder.decode(b"", final=True))
+                self._backend.close()
+                self._backend.finish()
+        return self.state.result()
+
+
+def extract(html_bytes, encoding=None, parser=None, chunk_size=16 * 1024):
+    """Run a HeadExtractor over bytes already in memory."""
+    extractor = HeadExtractor(parser)
+    for start in range(0, len(html_bytes), chunk_size):
+        if extractor.feed(html_bytes[start:start + chunk_size], encoding):
+            break
+    return extractor.result()
@@ -0,0 +1,211 @@
+"""On-disk cache for the researcher's search result pages and article pages.
+
+Responses are stored in SQLite and keyed by method, normalized URL and
+normalized form body. Normalizing lowercases the scheme and host, drops default
+ports and fragments, sorts query parameters, and lowercases and collapses
+whitespace in the search text. So "Acme  Funding news" and "acme funding news"
+share an entry.
+
+Fresh entries are served without touching the network. Stale entries that
+carry an ETag or Last-Modified are revalidated with a conditional request; a
+304 refreshes them in place. When the network fails, a stale entry is served
+rather than nothing. Least recently used entries are evicted once the cache
+exceeds its size bound. A body cut short by the reader (see
+http_fetch.fetch_bytes) is stored under prefix_key(key), never under the key of
+the full response.
+
+Environment:
+    RESEARCH_CACHE_ENABLED    "false" disables the cache (default true)
+    RESEARCH_CACHE_PATH       SQLite file (default <tmp>/researcher_http_cache.sqlite3)
+    RESEARCH_CACHE_MAX_BYTES  total body bytes kept (default 64 MiB)
+"""
+
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+RESEARCH_CACHE_ENABLED = os.environ.get("RESEARCH_CACHE_ENABLED", "true").lower() == "true"
+RESEARCH_CACHE_PATH = os.environ.get(
+    "RESEARCH_CACHE_PATH", os.path.join(tempfile.gettempdir(), "researcher_http_cache.sqlite3")
+)
+RESEARCH_CACHE_MAX_BYTES = int(os.environ.get("RESEARCH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    encoding TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+"""
+
+
+def _normalize_text(value):
+    return re.sub(r"\s+", " ", str(value)).strip().lower()
+
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def cache_key(method, url, data=None):
+    """Cache key for a request; form values in data are whitespace- and case-normalized."""
+    key = f"{method.upper()} {normalize_url(url)}"
+    if data:
+        key += " " + urlencode(sorted((k, _normalize_text(v)) for k, v in dict(data).items()))
+    return key
+
+
+def prefix_key(key):
+    """Key for the leading part of a response that was not read to the end."""
+    return key + " #prefix"
+
+
+class CachedEntry:
+    def __init__(self, body, encoding, etag, last_modified, expires_at):
+        self.body = body
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self):
+        return time.time() < self.expires_at
+
+    @property
+    def text(self):
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+    def revalidation_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """SQLite-backed response cache; safe to share between threads."""
+
+    def __init__(self, path=RESEARCH_CACHE_PATH, max_bytes=RESEARCH_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "revalidated": 0, "misses": 0, "stale_served": 0, "evicted": 0, "errors": 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def count(self, outcome):
+        with self._lock:
+            self._counters[outcome] += 1
+
+    def get(self, key):
+        """The stored entry for key, fresh or stale, or None."""
+        row = self._conn().execute(
+            "SELECT body, encoding, etag, last_modified, expires_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn().execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        return CachedEntry(*row)
+
+    def put(self, key, body, encoding, etag, last_modified, ttl):
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO responses (key, body, encoding, etag, last_modified, expires_at, last_access, size)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, body, encoding, etag, last_modified, now + ttl, now, len(body)),
+        )
+        self.evict()
+
+    def refresh(self, key, ttl):
+        """Extend a revalidated entry's lifetime."""
+        now = time.time()
+        self._conn().execute(
+            "UPDATE responses SET expires_at = ?, last_access = ? WHERE key = ?", (now + ttl, now, key)
+        )
+
+    def evict(self):
+        """Drop least recently used entries until the bodies fit in 90% of max_bytes."""
+        conn = self._conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if total <= target:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._counters["evicted"] += evicted
+
+    def clear(self):
+        self._conn().execute("DELETE FROM responses")
+
+    def stats(self):
+        """Lookup outcomes for this process plus the cache's current size."""
+        entries, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["revalidated"] + counters["misses"]
+        served = counters["hits"] + counters["revalidated"]
+        counters.update({
+            "entries": entries,
+            "bytes": size,
+            "hit_rate": round(served / lookups, 3) if lookups else 0.0,
+        })
+        return counters
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """The process-wide HttpCache, or None when disabled or the file cannot be opened."""
+    global _cache
+    if not RESEARCH_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = HttpCache()
+                except (OSError, sqlite3.Error) as e:
+                    print(f"Research cache disabled, cannot open {RESEARCH_CACHE_PATH}: {e}")
+                    _cache = False  # don't retry on every request
+    return _cache or None
@@ -0,0 +1,216 @@
+"""Shared HTTP plumbing for the researcher tool.
+
+One pooled ``requests.Session`` is shared by every search and page fetch in the
+process. A per-host token bucket spaces out requests to the same host, which
+replaces the fixed sleeps between searches. Every request is bounded by both
+its own timeout and the time left before the caller's deadline.
+
+Environment:
+    RESEARCH_HOST_RATE   requests per second per host (default 2)
+    RESEARCH_HOST_BURST  requests a host may receive back to back (default 2)
+    HTTP_POOL_MAXSIZE    connections kept per host (default 32)
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+from . import http_cache
+
+HOST_RATE = float(os.environ.get("RESEARCH_HOST_RATE", "2"))
+HOST_BURST = float(os.environ.get("RESEARCH_HOST_BURST", "2"))
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "32"))
+CHUNK_SIZE = 16 * 1024
+
+CHARSET = re.compile(r"charset=[\"']?([A-Za-z0-9_.:-]+)", re.IGNORECASE)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36"
+}
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request cannot start or finish before the caller's deadline."""
+
+
+class HostRateLimiter:
+    """Token bucket per host: `rate` tokens per second, at most `burst` stored."""
+
+    def __init__(self, rate=HOST_RATE, burst=HOST_BURST):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._lock = threading.Lock()
+        self._buckets = {}  # host -> (tokens, last refill)
+
+    def acquire(self, host, deadline=None):
+        """Block until host has a token. Returns False if that would pass the deadline."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(host, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                if tokens >= 1:
+                    self._buckets[host] = (tokens - 1, now)
+                    return True
+                self._buckets[host] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+rate_limiter = HostRateLimiter()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """The process-wide requests.Session, created on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                session.headers.update(HEADERS)
+                adapter = HTTPAdapter(pool_connections=16, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def deadline_in(seconds):
+    """Monotonic deadline `seconds` from now."""
+    return time.monotonic() + seconds
+
+
+def remaining(deadline):
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def request(method, url, timeout, deadline: Optional[float] = None, **kwargs):
+    """
+    Rate-limited request on the shared session. The timeout is cut to the time
+    left before deadline; raises DeadlineExceeded if none is left, and lets
+    requests' own errors (including HTTP errors) propagate.
+    """
+    host = urlsplit(url).netloc
+    if not rate_limiter.acquire(host, deadline):
+        raise DeadlineExceeded(f"rate limit wait for {host} passes the deadline")
+    left = remaining(deadline)
+    if left is not None:
+        if left <= 0:
+            raise DeadlineExceeded(url)
+        timeout = min(timeout, left)
+    resp = get_session().request(method, url, timeout=timeout, **kwargs)
+    resp.raise_for_status()
+    return resp
+
+
+def response_charset(resp):
+    """Charset declared in the Content-Type header, or None (requests would guess ISO-8859-1)."""
+    match = CHARSET.search(resp.headers.get("Content-Type", ""))
+    return match.group(1) if match else None
+
+
+def _read_prefix(resp, until, max_bytes, deadline, encoding):
+    """Returns (body, complete); complete is False when reading stopped before the end."""
+    chunks, size = [], 0
+    for chunk in resp.iter_content(CHUNK_SIZE):
+        if max_bytes is not None:
+            chunk = chunk[:max_bytes - size]
+        chunks.append(chunk)
+        size += len(chunk)
+        if until is not None and until(chunk, encoding):
+            return b"".join(chunks), False
+        if (max_bytes is not None and size >= max_bytes) or (deadline is not None and remaining(deadline) <= 0):
+            return b"".join(chunks), False
+    return b"".join(chunks), True
+
+
+def _cache_call(cache, method, *args):
+    """cache.<method>(*args); None without a cache or when SQLite fails (e.g. "database is locked")."""
+    if cache is None:
+        return None
+    try:
+        return getattr(cache, method)(*args)
+    except sqlite3.Error as e:
+        # The cache is an optimisation: a failed read is a miss, a failed write is skipped
+        print(f"Research cache {method} failed: {e}")
+        cache.count("errors")
+        return None
+
+
+def fetch_bytes(method, url, timeout, deadline: Optional[float] = None, ttl=3600, until=None, max_bytes=None,
+                **kwargs):
+    """
+    request() through the on-disk response cache. Returns (body, charset or None).
+
+    Fresh entries skip the network. Stale ones are revalidated with their
+    ETag/Last-Modified, and served as-is if the network fails. With until or
+    max_bytes the body is streamed: until(chunk, charset) sees each chunk, from
+    the network or the cache, and returns True to stop reading; max_bytes caps
+    the download. A body cut short that way is cached under its own prefix key,
+    which only other streamed reads look at. Cache errors never fail the fetch.
+    """
+    cache = http_cache.get_cache()
+    full_key = http_cache.cache_key(method, url, kwargs.get("data"))
+    stream = until is not None or max_bytes is not None
+    keys = (full_key, http_cache.prefix_key(full_key)) if stream else (full_key,)
+    key, entry = None, None
+    for candidate in keys:
+        found = _cache_call(cache, "get", candidate)
+        if found is not None and (entry is None or (found.fresh and not entry.fresh)):
+            key, entry = candidate, found
+
+    def from_cache(outcome):
+        cache.count(outcome)
+        body = entry.body if max_bytes is None else entry.body[:max_bytes]
+        if until is not None:
+            until(body, entry.encoding)
+        return body, entry.encoding
+
+    if entry is not None and entry.fresh:
+        return from_cache("hits")
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if entry is not None:
+        headers.update(entry.revalidation_headers())
+    try:
+        resp = request(method, url, timeout, deadline, headers=headers, stream=stream, **kwargs)
+    except Exception:
+        if entry is None:
+            raise
+        return from_cache("stale_served")
+
+    with resp:
+        if resp.status_code == 304 and entry is not None:
+            _cache_call(cache, "refresh", key, ttl)
+            return from_cache("revalidated")
+        charset = response_charset(resp)
+        if stream:
+            body, complete = _read_prefix(resp, until, max_bytes, deadline, charset)
+        else:
+            body, complete = resp.content, True
+
+    if cache is not None:
+        cache.count("misses")
+        store_key = full_key if complete else http_cache.prefix_key(full_key)
+        _cache_call(
+            cache, "put", store_key, body, charset, resp.headers.get("ETag"), resp.headers.get("Last-Modified"), ttl
+        )
+    return body, charset
+
+
+def fetch_text(method, url, timeout, deadline: Optional[float] = None, ttl=3600, **kwargs):
+    """fetch_bytes() decoded with the declared charset, else UTF-8."""
+    body, charset = fetch_bytes(method, url, timeout, deadline, ttl, **kwargs)
+    return body.decode(charset or "utf-8", errors="replace")
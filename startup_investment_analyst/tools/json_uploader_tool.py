@@ -3,22 +3,13 @@ import os
 import json
 import tempfile
 from typing import Dict, Any
-from google.cloud import storage
 from google.adk.tools import FunctionTool, ToolContext
-from startup_investment_analyst.shared_libraries import constants
+from startup_investment_analyst.shared_libraries import clients, constants
 
 # Ensure GOOGLE_APPLICATION_CREDENTIALS is set
 # if constants.SERVICE_ACCOUNT_PATH:
 #     os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", constants.SERVICE_ACCOUNT_PATH)
 
-# Storage client
-try:
-    storage_client = storage.Client(project=constants.PROJECT_ID)
-except Exception as e:
-    print(f"Error initializing GCS client: {e}")
-    storage_client = None
-
-
 async def json_uploader_runner(tool_context: ToolContext) -> Dict[str, Any]:
     """
     Upload JSON content to GCS.
@@ -62,6 +53,7 @@ async def json_uploader_runner(tool_context: ToolContext) -> Dict[str, Any]:
     remote_path = f"{prefix}/{filename}" if prefix else filename
     gcs_uri = f"gs://{bucket_name}/{remote_path}"
 
+    storage_client = clients.get_storage_client()
     if not storage_client:
         return {"error": "GCS client not initialized."}
 
@@ -3,22 +3,18 @@
 
 import os
 from typing import Dict, Any
-from google.cloud import bigquery
 from google.adk.tools import ToolContext, FunctionTool
-from ..shared_libraries import constants
+from ..shared_libraries import clients, constants, data_context
+
+OPERATIONAL_COLUMNS = [
+    "team_size", "hiring_trend", "app_store_rating", "play_store_rating", "amazon_store_rating",
+    "geographical_locations", "funding_rounds", "profit_margin",
+]
 
 # Set service account if provided
 # if constants.SERVICE_ACCOUNT_PATH:
 #     os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", constants.SERVICE_ACCOUNT_PATH)
 
-# Initialize BigQuery client safely
-try:
-    bq_client = bigquery.Client(project=constants.PROJECT_ID)
-except Exception as e:
-    print(f"Error initializing BigQuery client: {e}")
-    bq_client = None
-
-
 async def operational_tool_runner(tool_context: ToolContext) -> Dict[str, Any]:
     """
     Reads operational data from BigQuery and produces an investor-friendly summary.
@@ -29,29 +25,34 @@ async def operational_tool_runner(tool_context: ToolContext) -> Dict[str, Any]:
     except Exception:
         return {"error": "startup_id not found in ToolContext."}
 
-    if not bq_client:
-        return {"error": "BigQuery client not initialized."}
     if not startup_id:
         return {"error": "startup_id is empty."}
 
-    # Fetch operational metrics
-    query = f"""
-        SELECT team_size, hiring_trend, app_store_rating, play_store_rating, amazon_store_rating,
-               geographical_locations, funding_rounds, profit_margin
-        FROM `{constants.PROJECT_ID}.{constants.BQ_DATASET}.company_metrics`
-        WHERE startup_id = @startup_id
-        LIMIT 1
-    """
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[bigquery.ScalarQueryParameter("startup_id", "STRING", startup_id)]
-    )
-
-    try:
-        job = bq_client.query(query, job_config=job_config)
-        rows = [dict(r) for r in job.result()]
-        ops = rows[0] if rows else {}
-    except Exception as e:
-        return {"error": f"Failed to fetch operational data: {e}"}
+    # Row already fetched by the checker in this run?
+    hit, ops = data_context.lookup(tool_context, startup_id, "company_metrics", OPERATIONAL_COLUMNS)
+    if not hit:
+        bq_client = clients.get_bigquery_client()
+        if not bq_client:
+            return {"error": "BigQuery client not initialized."}
+        from google.cloud import bigquery
+
+        # Fetch operational metrics
+        query = f"""
+            SELECT {", ".join(OPERATIONAL_COLUMNS)}
+            FROM `{constants.PROJECT_ID}.{constants.BQ_DATASET}.company_metrics`
+            WHERE startup_id = @startup_id
+            LIMIT 1
+        """
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bigquery.ScalarQueryParameter("startup_id", "STRING", startup_id)]
+        )
+
+        try:
+            job = bq_client.query(query, job_config=job_config)
+            rows = [dict(r) for r in job.result()]
+            ops = rows[0] if rows else {}
+        except Exception as e:
+            return {"error": f"Failed to fetch operational data: {e}"}
 
     # Compute operational score
     score = 50
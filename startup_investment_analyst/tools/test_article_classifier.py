@@ -0,0 +1,62 @@
+"""
+Check that the Aho-Corasick path of ArticleClassifier agrees with the substring
+scans. The default keyword lists are below AUTOMATON_MIN_KEYWORDS, so the
+automaton is forced here. Covers category priority, keywords that only appear in
+the snippet or page description, sentiment words outside the title, keywords
+shared between lists and titles whose length changes when lowercased.
+
+sentiment() with missing titles is checked first. The rest needs pyahocorasick
+(pip install ".[speedups]") and is skipped without it.
+
+Usage: python -m startup_investment_analyst.tools.test_article_classifier
+"""
+
+import sys
+
+from . import article_classifier
+from .article_classifier import ArticleClassifier
+
+ARTICLES = [
+    {"url": "1", "title": "Acme raises Series B", "snippet": "market report"},
+    {"url": "2", "title": "Acme launch", "snippet": "customer review of the new app"},
+    {"url": "3", "title": "Quiet week", "snippet": "", "page_description": "Acme vs Beta: which rival wins?"},
+    {"url": "4", "title": "Industry growth", "snippet": "layoff rumours"},
+    {"url": "5", "title": "Data breach and lawsuit", "snippet": "record decline"},
+    {"url": "6", "title": "İstanbul partnership award", "snippet": "seed round"},
+    {"url": "7", "title": "", "snippet": "nothing to see"},
+    {"url": "8", "title": "Acme wins award, raises funding", "snippet": "growth"},
+]
+
+
+def outcome(classifier, articles):
+    buckets, sentiment = classifier.analyze(articles)
+    per_article = [classifier.classify(article) for article in articles]
+    return {name: [a["url"] for a in bucket] for name, bucket in buckets.items()}, sentiment, per_article
+
+
+def main():
+    # Missing titles are neutral, not an error
+    assert ArticleClassifier().sentiment([None, "", "Acme raises funding", "Acme wins award"]) == "positive"
+
+    if not article_classifier.AUTOMATON_AVAILABLE:
+        print("pyahocorasick is not installed; skipping.")
+        sys.exit(0)
+
+    scan = ArticleClassifier(use_automaton=False)
+    automaton = ArticleClassifier(use_automaton=True)
+    assert scan._automaton is None and automaton._automaton is not None
+
+    for articles in (ARTICLES, ARTICLES * 3, ARTICLES[3:6]):
+        expected, got = outcome(scan, articles), outcome(automaton, articles)
+        assert got == expected, (got, expected)
+
+    # Large enough keyword lists pick the automaton on their own
+    extra = tuple(f"keyword{i}" for i in range(article_classifier.AUTOMATON_MIN_KEYWORDS))
+    categories = article_classifier.DEFAULT_CATEGORIES + (("other", extra),)
+    assert ArticleClassifier(categories)._automaton is not None
+    assert ArticleClassifier()._automaton is None
+    print(f"automaton matches substring scans on {len(ARTICLES)} articles: {outcome(automaton, ARTICLES)[:2]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Streaming multipart forwarding of uploaded files to the uploader service.
+
+Files are sent as multipart/form-data bodies generated chunk by chunk from the
+incoming ``FileStorage`` streams, so the web worker never holds a whole file in
+memory, and the files of one submission are posted concurrently over a pooled
+``requests.Session``.
+"""
+
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CHUNK_SIZE = 1024 * 1024
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", "4"))
+UPLOAD_TIMEOUT_SECONDS = int(os.environ.get("UPLOAD_TIMEOUT_SECONDS", "600"))
+
+
+def make_session(pool_size=UPLOAD_WORKERS):
+    """requests.Session whose connection pool can serve every upload worker at once."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class MultipartStream:
+    """
+    A multipart/form-data body for one file that is read lazily in chunks.
+    The total length is known up front, so requests sends a Content-Length
+    header instead of falling back to chunked transfer encoding.
+    """
+
+    def __init__(self, fields, file_field, filename, fileobj, content_type, chunk_size=CHUNK_SIZE):
+        self.boundary = uuid.uuid4().hex
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+
+        head = []
+        for name, value in fields.items():
+            head.append(
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            )
+        safe_filename = filename.replace('"', "%22").replace("\r", "").replace("\n", "")
+        head.append(
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{file_field}"; filename="{safe_filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        )
+        self._head = "".join(head).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+
+        fileobj.seek(0, os.SEEK_END)
+        self.file_size = fileobj.tell()
+        fileobj.seek(0)
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return len(self._head) + self.file_size + len(self._tail)
+
+    def __iter__(self):
+        # Rewind so a retried request resends the whole file
+        self.fileobj.seek(0)
+        yield self._head
+        while True:
+            chunk = self.fileobj.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        yield self._tail
+
+
+def forward_file(session, url, company_name, filename, fileobj, mime_type, fields=None):
+    """
+    Stream one file to the uploader API and return its JSON response.
+    fields are extra form fields sent alongside company_name.
+    """
+    body = MultipartStream({"company_name": company_name, **(fields or {})}, "file", filename, fileobj, mime_type)
+    resp = session.post(
+        url,
+        data=body,
+        headers={"Content-Type": body.content_type},
+        timeout=UPLOAD_TIMEOUT_SECONDS,
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+def forward_files(session, url, company_name, files, max_workers=UPLOAD_WORKERS, fields=None):
+    """
+    Upload (filename, fileobj, mime_type) tuples concurrently, one request each.
+    fields are sent with every request. Returns the uploader's JSON responses in
+    the same order as files.
+    """
+    if not files:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as executor:
+        futures = [
+            executor.submit(forward_file, session, url, company_name, filename, fileobj, mime_type, fields)
+            for filename, fileobj, mime_type in files
+        ]
+        return [future.result() for future in futures]